@@ -0,0 +1,154 @@
+"""
+Time-bucketed message activity per guild
+Counts are kept in memory per guild under tuple keys (dimension, entity,
+minute), so a message costs three dict increments and user and channel
+counts can never be confused. flush() writes only the guilds that had
+traffic, rolling every minute up into minute, hour and day buckets at once.
+
+Buckets are stored in time partitions, one config entry each:
+    activity["<guild_id>:<resolution>:<partition_start>"][dimension][entity_id][bucket_start] = count
+dimension is 'guild' (entity '0'), 'channel' or 'user'; times are UTC epoch
+seconds aligned to the bucket or partition size. A flush rewrites only the
+current partitions of the guilds it touches, a query reads only the
+partitions in its range, and retention drops whole partitions.
+"""
+import json
+import time
+from collections import defaultdict
+
+import config
+import config_store
+
+# resolution -> (bucket seconds, partition seconds, retention seconds)
+RESOLUTIONS = {
+    'minute': (60, 3600, 24 * 3600),
+    'hour': (3600, 86400, 30 * 86400),
+    'day': (86400, 86400, 365 * 86400),
+}
+# Per-user minute and hour series would be one series per member; users get days only
+DIMENSIONS = {
+    'guild': ('minute', 'hour', 'day'),
+    'channel': ('minute', 'hour', 'day'),
+    'user': ('day',),
+}
+PRUNE_INTERVAL = 3600
+
+def partition_key(guild_id, resolution, partition_start):
+    return f"{guild_id}:{resolution}:{partition_start}"
+
+class ActivityCounters:
+    def __init__(self):
+        # guild_id -> {(dimension, entity_id, minute_start): count}
+        self._pending = {}
+        self._last_prune = 0
+        self._stats = {'recorded': 0, 'flushes': 0, 'guilds_flushed': 0, 'partitions_written': 0,
+                       'partitions_pruned': 0, 'flush_seconds': 0.0}
+
+    def record(self, guild_id, channel_id, user_id, now=None):
+        """Count one message"""
+        minute = int(time.time() if now is None else now) // 60 * 60
+        counts = self._pending.get(guild_id)
+        if counts is None:
+            counts = self._pending[guild_id] = defaultdict(int)
+        counts[('guild', 0, minute)] += 1
+        counts[('channel', channel_id, minute)] += 1
+        counts[('user', user_id, minute)] += 1
+        self._stats['recorded'] += 1
+
+    def pending_count(self, guild_id):
+        """Messages of a guild counted but not flushed yet"""
+        counts = self._pending.get(guild_id)
+        if not counts:
+            return 0
+        return sum(count for (dimension, _, _), count in counts.items() if dimension == 'guild')
+
+    def flush(self, now=None, on_guild=None):
+        """Write every guild with pending counts; on_guild(guild_id, counts) is called for each.
+
+        Also drops expired partitions, at most every PRUNE_INTERVAL seconds.
+        Returns the number of guilds written.
+        """
+        start = time.perf_counter()
+        now = int(time.time() if now is None else now)
+        pending, self._pending = self._pending, {}
+        for guild_id, counts in pending.items():
+            self._write_guild(guild_id, counts)
+            if on_guild is not None:
+                on_guild(guild_id, counts)
+        if now - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = now
+            self.prune(now)
+        self._stats['flushes'] += 1
+        self._stats['guilds_flushed'] += len(pending)
+        self._stats['flush_seconds'] += time.perf_counter() - start
+        return len(pending)
+
+    def _write_guild(self, guild_id, counts):
+        # partition key -> [(dimension, entity key, bucket start, count)]
+        partitions = defaultdict(list)
+        for (dimension, entity_id, minute), count in counts.items():
+            for resolution in DIMENSIONS[dimension]:
+                bucket_seconds, partition_seconds, _ = RESOLUTIONS[resolution]
+                key = partition_key(guild_id, resolution, minute // partition_seconds * partition_seconds)
+                partitions[key].append((dimension, str(entity_id), str(minute // bucket_seconds * bucket_seconds), count))
+        for key, updates in partitions.items():
+            config.mutate('activity', key, lambda entry, updates=updates: _add_counts(entry, updates))
+        self._stats['partitions_written'] += len(partitions)
+
+    def prune(self, now=None):
+        """Delete partitions that ended before their resolution's retention"""
+        now = int(time.time() if now is None else now)
+        expired = []
+        for key in list(config.get_path(('activity',)) or {}):
+            parts = key.rsplit(':', 2)
+            if len(parts) != 3 or parts[1] not in RESOLUTIONS or not parts[2].isdigit():
+                continue
+            _, resolution, partition_start = parts
+            _, partition_seconds, retention = RESOLUTIONS[resolution]
+            if int(partition_start) + partition_seconds <= now - retention:
+                expired.append(key)
+        for key in expired:
+            config.delete_path(('activity', key))
+        self._stats['partitions_pruned'] += len(expired)
+        return len(expired)
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['pending_guilds'] = len(self._pending)
+        stats['pending_keys'] = sum(len(counts) for counts in self._pending.values())
+        return stats
+
+def _add_counts(entry, updates):
+    for dimension, entity_key, bucket, count in updates:
+        series = entry.setdefault(dimension, {}).setdefault(entity_key, {})
+        series[bucket] = series.get(bucket, 0) + count
+
+def query(guild_id, dimension='guild', resolution='hour', since=None, until=None, entity_id=None, store=False):
+    """Stored counts as {entity_id: [(bucket_start, count), ...]}, oldest first.
+
+    since/until are UTC epoch seconds (default: the resolution's whole
+    retention, up to now); entity_id limits the result to one channel or user.
+    store=True reads the partitions straight from config_store instead of
+    the in-memory config, for processes that do not load it (the dashboard).
+    """
+    bucket_seconds, partition_seconds, retention = RESOLUTIONS[resolution]
+    until = int(time.time() if until is None else until)
+    since = int(until - retention if since is None else since)
+    keys = [partition_key(guild_id, resolution, partition_start)
+            for partition_start in range(since // partition_seconds * partition_seconds, until + 1, partition_seconds)]
+    if store:
+        rows = config_store.load_entries('activity', keys)
+        partitions = [json.loads(rows[key]) for key in keys if key in rows]
+    else:
+        partitions = [config.get_path(('activity', key)) or {} for key in keys]
+    result = defaultdict(list)
+    for partition in partitions:
+        series_by_entity = partition.get(dimension)
+        if series_by_entity:
+            if entity_id is not None:
+                series_by_entity = {str(entity_id): series_by_entity.get(str(entity_id), {})}
+            for entity_key, series in series_by_entity.items():
+                result[entity_key].extend(
+                    (int(bucket), count) for bucket, count in series.items() if since <= int(bucket) <= until
+                )
+    return {entity_key: sorted(points) for entity_key, points in result.items() if points}
@@ -0,0 +1,109 @@
+"""
+Benchmark for server activity counters.
+
+Feeds the same messages (spread over --guilds guilds, --users users and
+five channels per guild) to the old ServerStats counters (string keys
+"guild_user" / "guild_channel", saved by scanning every key for every
+guild) and to activity_metrics.ActivityCounters, then times one save /
+flush. Also times a dashboard query (messages per hour over the last 7 days,
+per channel) and reports whether the old save attributed channel counts to
+users.
+
+Usage: python benchmarks/bench_activity.py [--messages 100000] [--guilds 10,1000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import activity_metrics
+import config
+import config_store
+
+SEED = 1234
+CHANNELS_PER_GUILD = 5
+
+def legacy_save(message_counts, guild_ids):
+    """ServerStats.save_stats_task before the counters engine, minus the config write"""
+    saved = {}
+    for guild_id in guild_ids:
+        stats = {'total_messages': 0, 'most_active_users': {}, 'most_active_channels': {}}
+        guild_key = f"{guild_id}"
+        if guild_key in message_counts:
+            stats['total_messages'] += message_counts[guild_key]
+            message_counts[guild_key] = 0
+        for key, count in list(message_counts.items()):
+            if key.startswith(f"{guild_id}_") and len(key.split('_')) == 2:
+                user_id = key.split('_')[1]
+                stats['most_active_users'][user_id] = stats['most_active_users'].get(user_id, 0) + count
+                del message_counts[key]
+        for key, count in list(message_counts.items()):
+            if key.startswith(f"{guild_id}_") and len(key.split('_')) == 2:
+                channel_id = key.split('_')[1]
+                stats['most_active_channels'][channel_id] = stats['most_active_channels'].get(channel_id, 0) + count
+                del message_counts[key]
+        saved[guild_id] = stats
+    return saved
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--guilds', default='10,1000')
+    parser.add_argument('--users', type=int, default=20_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_activity_')
+    config.CONFIG_FILE = os.path.join(workdir, 'bot_config.json')
+    config.CONFIG_BACKUP_FILE = os.path.join(workdir, 'bot_config.backup.json')
+    config_store.STORE_FILE = os.path.join(workdir, 'bot_config.db')
+    config.load_config()
+
+    print(f"{'guilds':>7} {'old record':>11} {'new record':>11} {'old save':>10} {'new flush':>10} "
+          f"{'query 7d/h':>11} {'old mixes channels':>19}")
+    now = int(time.time())
+    for guilds in [int(g) for g in args.guilds.split(',')]:
+        rng = random.Random(SEED)
+        messages = []
+        for i in range(args.messages):
+            user = rng.randrange(args.users)
+            guild_id = 10**15 + user % guilds
+            messages.append((guild_id, 10**16 + (user % guilds) * CHANNELS_PER_GUILD + rng.randrange(CHANNELS_PER_GUILD),
+                             10**17 + user, now - rng.randrange(600)))
+
+        message_counts = defaultdict(int)
+        start = time.perf_counter()
+        for guild_id, channel_id, user_id, _ in messages:
+            message_counts[f"{guild_id}"] += 1
+            message_counts[f"{guild_id}_{user_id}"] += 1
+            message_counts[f"{guild_id}_{channel_id}"] += 1
+        old_record = (time.perf_counter() - start) / len(messages)
+        guild_ids = sorted({m[0] for m in messages})
+        start = time.perf_counter()
+        saved = legacy_save(message_counts, guild_ids)
+        old_save = time.perf_counter() - start
+        mixed = any(str(channel_id) in saved[guild_id]['most_active_users'] for guild_id, channel_id, _, _ in messages[:100])
+
+        counters = activity_metrics.ActivityCounters()
+        start = time.perf_counter()
+        for guild_id, channel_id, user_id, at in messages:
+            counters.record(guild_id, channel_id, user_id, at)
+        new_record = (time.perf_counter() - start) / len(messages)
+        start = time.perf_counter()
+        counters.flush(now=now)
+        new_flush = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for guild_id in guild_ids[:100]:
+            activity_metrics.query(guild_id, 'channel', 'hour', since=now - 7 * 86400, until=now)
+        query = (time.perf_counter() - start) / min(100, len(guild_ids))
+        print(f"{guilds:>7} {old_record * 1e6:>9.2f}us {new_record * 1e6:>9.2f}us {old_save * 1000:>8.0f}ms "
+              f"{new_flush * 1000:>8.0f}ms {query * 1e6:>9.0f}us {str(mixed):>19}")
+    config.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark for AI moderation checks against a local stub of the chat API.
+
+Starts an aiohttp server that answers chat-completion requests the way the
+real API would (one "n: toxic|safe" line per numbered message, or a single
+word for the old one-message prompt), with a fixed response delay. Then
+sends the same burst of messages, arriving over --seconds, through:
+
+- legacy: the old check_toxicity, a new ClientSession and one request per
+  message, every message checked concurrently
+- queue: moderation_queue.ModerationQueue (batching, verdict cache,
+  pre-filter, concurrency and QPS budget)
+
+and reports API requests, wall time, per-check latency and whether every
+verdict matches the stub's ground truth.
+
+Usage: python benchmarks/bench_aimod_queue.py [--messages 2000] [--seconds 5] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_clients
+import moderation_queue
+
+SEED = 1234
+TOXIC_MARKER = 'toxicword'
+PHRASES = ('hello everyone', 'good game', 'anyone up for a match tonight', 'lol', 'gg', 'nice one',
+           'what time is the event', 'szia mindenki', 'koszi szepen', 'this is a toxicword message',
+           'you are such a toxicword', '!!!', '12345', 'ok')
+
+def make_messages(count, rng):
+    """Repeated chat phrases plus unique sentences, about 5% of them toxic"""
+    messages = []
+    for i in range(count):
+        if rng.random() < 0.6:
+            messages.append(rng.choice(PHRASES))
+        else:
+            words = ' '.join(rng.choice(('play', 'server', 'music', 'when', 'today', 'new')) for _ in range(5))
+            marker = f' {TOXIC_MARKER}' if rng.random() < 0.05 else ''
+            messages.append(f'{words} number {i}{marker}')
+    return messages
+
+def is_toxic(text):
+    return TOXIC_MARKER in text.lower()
+
+class StubAPI:
+    def __init__(self, delay):
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            data = await request.json()
+            prompt = data['messages'][-1]['content']
+            await asyncio.sleep(self.delay)
+            lines = []
+            for line in prompt.splitlines()[1:]:
+                number, _, text = line.partition(':')
+                if number.strip().isdigit():
+                    lines.append(f"{number.strip()}: {'toxic' if is_toxic(text) else 'safe'}")
+            answer = '\n'.join(lines) if lines else ('toxic' if is_toxic(prompt) else 'safe')
+            return web.json_response({'choices': [{'message': {'role': 'assistant', 'content': answer}}]})
+        finally:
+            self.in_flight -= 1
+
+async def legacy_check(url, api_key, text):
+    """check_toxicity() before the queue"""
+    if not api_key or len(text) < 5:
+        return False
+    try:
+        async with aiohttp.ClientSession() as session:
+            headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+            data = {
+                'model': 'gpt-3.5-turbo',
+                'messages': [
+                    {'role': 'system', 'content': 'You are a content moderation assistant. Respond with only "toxic" or "safe".'},
+                    {'role': 'user', 'content': f'Is this message toxic, hateful, or inappropriate? Message: "{text}"'}
+                ],
+                'max_tokens': 10,
+                'temperature': 0.3
+            }
+            async with session.post(url, headers=headers, json=data) as resp:
+                if resp.status == 200:
+                    result = await resp.json()
+                    return 'toxic' in result['choices'][0]['message']['content'].lower()
+    except Exception:
+        pass
+    return False
+
+async def run(check, messages, seconds):
+    """Start one check per message, spread evenly over seconds; returns (verdicts, latencies, wall)"""
+    latencies = [0.0] * len(messages)
+
+    async def one(i, text):
+        await asyncio.sleep(seconds * i / len(messages))
+        start = time.perf_counter()
+        verdict = await check(text)
+        latencies[i] = time.perf_counter() - start
+        return verdict
+
+    start = time.perf_counter()
+    verdicts = await asyncio.gather(*(one(i, text) for i, text in enumerate(messages)))
+    return verdicts, sorted(latencies), time.perf_counter() - start
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+async def main_async(args):
+    stub = StubAPI(args.delay)
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', stub.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f'http://127.0.0.1:{port}/v1/chat/completions'
+
+    messages = make_messages(args.messages, random.Random(SEED))
+    truth = [is_toxic(text) and len(text) >= 5 for text in messages]
+
+    print(f"{'path':>7} {'requests':>9} {'max conc':>9} {'wall':>7} {'p50':>8} {'p99':>8} {'correct':>8}")
+    queue = moderation_queue.ModerationQueue('stub-key', url=url)
+    for name, check in (('legacy', lambda text: legacy_check(url, 'stub-key', text)), ('queue', queue.check)):
+        stub.requests = stub.max_in_flight = 0
+        verdicts, latencies, wall = await run(check, messages, args.seconds)
+        correct = sum(v == t for v, t in zip(verdicts, truth))
+        print(f"{name:>7} {stub.requests:>9} {stub.max_in_flight:>9} {wall:>6.2f}s "
+              f"{percentile(latencies, 0.5) * 1000:>6.0f}ms {percentile(latencies, 0.99) * 1000:>6.0f}ms "
+              f"{correct:>4}/{len(messages)}")
+    stats = queue.get_stats()
+    print(f"queue: {stats['prefiltered']} pre-filtered, {stats['cache_hits']} cache hits, "
+          f"{stats['coalesced']} coalesced, {stats['batches']} batches of {stats['avg_batch']:.1f} on average")
+    http = http_clients.get_stats()[moderation_queue.UPSTREAM]
+    print(f"http: {http['connections_created']} connections opened, {http['reuse_rate']:.0%} of requests on a "
+          f"reused connection, p50 {http['p50_ms']:.0f}ms")
+    await queue.close()
+    await http_clients.close_all()
+    await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--seconds', type=float, default=5.0, help='the messages arrive over this many seconds')
+    parser.add_argument('--delay', type=float, default=0.2, help='stub API response time in seconds')
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark for bad-word matching in AutoMod.
+
+Compares the old per-message path (merge_bad_words building list(set(...))
+followed by one substring scan per word) with the compiled Aho-Corasick
+matcher, for growing custom word lists. Also reports automaton build time,
+checks that the matcher finds every planted bad word and nothing in the
+BENIGN corpus, and counts how many of the obfuscated bad words (leetspeak,
+accents, separators, stretched letters) each of them catches.
+
+Usage: python benchmarks/bench_badwords.py [--messages 2000] [--words 10,100,1000,10000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hungarian_automod import BadWordMatcher, get_bad_words_for_language
+
+SEED = 1234
+CHAT_WORDS = ('hello', 'the', 'game', 'tonight', 'lol', 'nice', 'gg', 'anyone', 'playing',
+              'szia', 'mindenki', 'ma', 'este', 'jatek', 'koszi', 'hogy', 'vagy')
+
+# Ordinary text that contains listed words or their collapsed forms; the
+# matcher must not report any of it
+BENIGN = (
+    'help me', 'nice helmet', 'the shelf', 'helicopter', 'Michelle', 'buy a pistol',
+    'a piston engine', 'a segítség', 'a s s e t', 'hello everyone', 'helloooo', 'the class passed',
+    'a new asset', 'assessment done', 'we assume so', 'cocktail party', 'Charles Dickens',
+    'scrap metal', 'a sea shell', 'grass and glass', 'szarvas a mezőn', 'szárnyas', 'a szarka',
+    'faszén grill', 'a barométer', 'a szegény ember', 'session', 'passion', 'compass',
+    '455', '4 5 5', 'I have 455 coins', 'room 455', 'Score: 455 points', 'I scored 4 5 5',
+)
+
+def legacy_has_bad_words(text, language, custom_bad_words):
+    """has_bad_words() and merge_bad_words() as they were before the matcher"""
+    base_words = get_bad_words_for_language(language)
+    bad_words = list(set(base_words + custom_bad_words)) if custom_bad_words else base_words
+    text_lower = text.lower()
+    for word in bad_words:
+        if word in text_lower:
+            return True, word
+    return False, None
+
+def make_words(count, rng):
+    return [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10))) for _ in range(count)]
+
+LEET = {'a': '4', 'e': '3', 'i': '1', 'o': '0', 's': '$'}
+ACCENTS = {'a': 'á', 'e': 'é', 'o': 'ő', 'u': 'ű', 'i': 'í'}
+
+def obfuscate(word, rng):
+    """One of the usual evasions of a word filter"""
+    kind = rng.randrange(5)
+    if kind == 0:
+        return ''.join(LEET.get(c, c) for c in word)
+    if kind == 1:
+        return ''.join(ACCENTS.get(c, c) for c in word).upper()
+    if kind == 2:
+        return rng.choice('.-_*').join(word)
+    if kind == 3:
+        return ' '.join(word)
+    i = rng.randrange(len(word))
+    return word[:i] + word[i] * rng.randint(3, 6) + word[i + 1:]
+
+def make_messages(count, custom_words, rng):
+    """Messages and, per message, whether it carries a plain / an obfuscated bad word"""
+    messages, planted, obfuscated = [], [], []
+    for _ in range(count):
+        words = [rng.choice(CHAT_WORDS) for _ in range(rng.randint(3, 20))]
+        roll = rng.random()
+        if roll < 0.05:
+            words.insert(rng.randrange(len(words)), rng.choice(custom_words))
+        elif roll < 0.10:
+            words.insert(rng.randrange(len(words)), obfuscate(rng.choice(custom_words), rng))
+        messages.append(' '.join(words))
+        planted.append(roll < 0.05)
+        obfuscated.append(0.05 <= roll < 0.10)
+    return messages, planted, obfuscated
+
+def per_message(fn, messages):
+    start = time.perf_counter()
+    results = [fn(message) for message in messages]
+    return (time.perf_counter() - start) / len(messages), results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--words', default='10,100,1000,10000')
+    parser.add_argument('--language', default='hu')
+    args = parser.parse_args()
+
+    rng = random.Random(SEED)
+    print(f"{'words':>7} {'build':>9} {'memory':>9} {'legacy/msg':>12} {'matcher/msg':>12} {'speedup':>8} "
+          f"{'hits':>6} {'evasions legacy/matcher':>24}")
+    for count in [int(c) for c in args.words.split(',')]:
+        custom = make_words(count, rng)
+        messages, planted, obfuscated = make_messages(args.messages, custom, rng)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        matcher = BadWordMatcher(list(get_bad_words_for_language(args.language)) + custom)
+        build = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        legacy, legacy_hits = per_message(lambda m: legacy_has_bad_words(m, args.language, custom)[0], messages)
+        compiled, compiled_hits = per_message(lambda m: matcher.find(m) is not None, messages)
+        if any(p and not hit for p, hit in zip(planted, compiled_hits)):
+            raise SystemExit(f"matcher misses planted bad words at {count} words")
+        false_hits = [text for text in BENIGN if matcher.find(text) is not None]
+        if false_hits:
+            raise SystemExit(f"matcher reports ordinary text at {count} words: {false_hits}")
+        evasions = sum(obfuscated)
+        caught_legacy = sum(hit for hit, o in zip(legacy_hits, obfuscated) if o)
+        caught = sum(hit for hit, o in zip(compiled_hits, obfuscated) if o)
+        print(f"{count:>7} {build * 1000:>7.1f}ms {memory / 1e6:>7.1f}MB {legacy * 1e6:>10.1f}us "
+              f"{compiled * 1e6:>10.1f}us {legacy / compiled:>7.1f}x {sum(compiled_hits):>6} "
+              f"{f'{caught_legacy}/{caught} of {evasions}':>24}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark for the config journal: update cost, compaction and crash recovery.
+
+Builds a synthetic state of roughly --size-mb MB (default 50), then measures:
+- the old save path (json.dump with indent=4 + fsync of the whole document)
+- update_path() cost on the caller side and journal append throughput
+- compaction of the journal into the SQLite snapshot
+- cold start after a crash: snapshot load + journal replay, in a fresh process,
+  against json.load of the legacy file
+
+Usage: python benchmarks/bench_config_journal.py [--size-mb 50] [--updates 20000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+import config_store
+
+def make_state(size_mb):
+    """~140 bytes per XP entry with indent=4; scale guilds until the legacy file is about size_mb"""
+    state = json.loads(json.dumps(config.DEFAULT_CONFIG))
+    users_per_guild = 1000
+    guilds = max(1, int(size_mb * 1e6 / (users_per_guild * 140)))
+    state['user_xp'] = {
+        str(1000 + g): {
+            str(10**17 + u): {'xp': u % 500, 'level': u % 30, 'total_xp': u * 7}
+            for u in range(users_per_guild)
+        }
+        for g in range(guilds)
+    }
+    return state, guilds, users_per_guild
+
+def cold_start(workdir):
+    """Time snapshot load and replay + compaction in a fresh interpreter, as after a crash"""
+    code = (
+        "import sys, time; sys.path.insert(0, %r)\n"
+        "import config, config_store\n"
+        "config.CONFIG_FILE = %r\n"
+        "config_store.STORE_FILE = %r\n"
+        "start = time.perf_counter()\n"
+        "config.load_config()\n"
+        "loaded = time.perf_counter()\n"
+        "config.enable_journal(%r)\n"
+        "print(loaded - start, time.perf_counter() - loaded)\n"
+    ) % (ROOT, os.path.join(workdir, 'missing.json'), os.path.join(workdir, 'bot_config.db'),
+         os.path.join(workdir, 'bot_config.journal'))
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    load, replay = out.stdout.strip().splitlines()[-1].split()
+    return float(load), float(replay)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=float, default=50)
+    parser.add_argument('--updates', type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_journal_')
+    legacy_file = os.path.join(workdir, 'bot_config.json')
+    config.CONFIG_FILE = os.path.join(workdir, 'missing.json')
+    config_store.STORE_FILE = os.path.join(workdir, 'bot_config.db')
+
+    state, guilds, users = make_state(args.size_mb)
+
+    start = time.perf_counter()
+    with open(legacy_file, 'w') as f:
+        json.dump(state, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    legacy_save = time.perf_counter() - start
+    legacy_bytes = os.path.getsize(legacy_file)
+    start = time.perf_counter()
+    with open(legacy_file) as f:
+        json.load(f)
+    legacy_load = time.perf_counter() - start
+    print(f"state: {guilds} guilds x {users} users, legacy file {legacy_bytes / 1e6:.1f} MB")
+    print(f"legacy save_config (indent=4 + fsync): {legacy_save * 1000:.0f} ms, {legacy_bytes / 1e6:.1f} MB written per save")
+
+    config.load_config()
+    config.save_config(state)
+    start = time.perf_counter()
+    config.flush()
+    print(f"initial snapshot into SQLite: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    config.enable_journal(os.path.join(workdir, 'bot_config.journal'))
+    rng = random.Random(1)
+    paths = [('user_xp', str(1000 + rng.randrange(guilds)), str(10**17 + rng.randrange(users)))
+             for _ in range(args.updates)]
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        config.update_path(path, {'xp': i % 500, 'level': 3, 'total_xp': i})
+    caller = (time.perf_counter() - start) / args.updates
+    print(f"update_path caller cost: {caller * 1e6:.1f} us/update")
+
+    start = time.perf_counter()
+    records = config._append_journal()
+    append = time.perf_counter() - start
+    journal_bytes = os.path.getsize(config.CONFIG_JOURNAL_FILE)
+    print(f"journal append: {records} records, {journal_bytes / 1e3:.0f} KB, "
+          f"{append * 1000:.0f} ms ({append / records * 1e6:.1f} us/record, {journal_bytes / records:.0f} B/record)")
+
+    # Crash here: journal on disk, snapshot not compacted yet
+    config_store.close_store()
+    load, replay = cold_start(workdir)
+    print(f"cold start after crash: snapshot load {load * 1000:.0f} ms (legacy json.load {legacy_load * 1000:.0f} ms), "
+          f"replay {records} records + compaction {replay * 1000:.0f} ms")
+
+    config_store.close_store()
+    config.refresh_config_cache()
+    for i, path in enumerate(paths):
+        config.update_path(path, {'xp': i % 500, 'level': 4, 'total_xp': i})
+    start = time.perf_counter()
+    config.flush()
+    print(f"compaction of {len(set(p[:2] for p in paths))} dirty guild shards: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark for the config read path used by on_message listeners.
+
+Compares the old behaviour (open + json.load of bot_config.json on every
+load_config() call) with the in-memory cache, for growing config sizes.
+Eight loads are done per simulated message, one per listener that reads
+config (AutoMod, Leveling, Counting, AFK, AIMod, SocialMedia, ModMail,
+CustomCommands).
+
+Usage: python benchmarks/bench_config_read.py [--messages N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import config_store
+
+LISTENERS_PER_MESSAGE = 8
+
+def make_config(guilds, users_per_guild):
+    """Build a synthetic config with XP data for every guild"""
+    cfg = json.loads(json.dumps(config.DEFAULT_CONFIG))
+    cfg['user_xp'] = {
+        str(1000 + g): {
+            str(10**17 + u): {'xp': u % 500, 'level': u % 30, 'total_xp': u * 7}
+            for u in range(users_per_guild)
+        }
+        for g in range(guilds)
+    }
+    cfg['guild_prefixes'] = {str(1000 + g): '!' for g in range(guilds)}
+    return cfg
+
+def legacy_load_config():
+    """load_config() as it was before the in-memory cache"""
+    with open(config.CONFIG_FILE, 'r') as f:
+        return json.load(f)
+
+def time_per_message(load, messages):
+    start = time.perf_counter()
+    for _ in range(messages):
+        for _ in range(LISTENERS_PER_MESSAGE):
+            load().get('guild_prefixes', {}).get('1000', '!')
+    return (time.perf_counter() - start) / messages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_config_')
+    config.CONFIG_FILE = os.path.join(workdir, 'bot_config.json')
+    config.CONFIG_BACKUP_FILE = os.path.join(workdir, 'bot_config.backup.json')
+    config_store.STORE_FILE = os.path.join(workdir, 'bot_config.db')
+
+    print(f"{'guilds':>7} {'users':>8} {'file size':>10} {'legacy/msg':>12} {'cached/msg':>12} {'speedup':>9}")
+    for guilds, users in ((10, 10), (100, 100), (100, 1000), (1000, 100)):
+        data = make_config(guilds, users)
+        with open(config.CONFIG_FILE, 'w') as f:
+            json.dump(data, f)
+        size = os.path.getsize(config.CONFIG_FILE)
+        config.save_config(data)
+        config.flush()
+
+        # Keep the slow path bounded on big files
+        legacy_messages = max(5, min(args.messages, int(2e8 // (size * LISTENERS_PER_MESSAGE))))
+        legacy = time_per_message(legacy_load_config, legacy_messages)
+        cached = time_per_message(config.load_config, args.messages * 100)
+        print(f"{guilds:>7} {guilds * users:>8} {size / 1024:>8.0f}KB {legacy * 1e6:>10.0f}us {cached * 1e6:>10.2f}us {legacy / cached:>8.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark for guild leaderboards.
+
+For guilds of growing size, compares the old /leaderboard and rank lookups
+(sort every user of the guild by total XP on each call) with
+leaderboard_index.Leaderboard: build time, score updates per second (as
+XP gains and balance changes would do), "rank #k of n" and a top-10 page
+from the middle of the board. Checks that pages and ranks agree with the
+full sort.
+
+Usage: python benchmarks/bench_leaderboard.py [--members 1000,50000,500000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard_index import Leaderboard
+
+SEED = 1234
+USER_ID_BASE = 10**17
+
+def legacy_sorted(guild_data):
+    """slash_leaderboard before the index: sort the whole guild"""
+    return sorted(guild_data.items(), key=lambda x: x[1].get('total_xp', 0), reverse=True)
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat
+
+def run(members, queries, rng):
+    user_ids = [USER_ID_BASE + i for i in range(members)]
+    guild_data = {str(uid): {'total_xp': rng.randrange(1_000_000)} for uid in user_ids}
+    probes = [rng.choice(user_ids) for _ in range(queries)]
+
+    legacy_repeat = max(1, min(queries, 2_000_000 // members))
+    legacy_top = timed(lambda i: legacy_sorted(guild_data)[:10], legacy_repeat)
+
+    def legacy_rank(i):
+        key = str(probes[i])
+        for position, (user_id, _) in enumerate(legacy_sorted(guild_data), 1):
+            if user_id == key:
+                return position
+    legacy_rank_seconds = timed(legacy_rank, legacy_repeat)
+
+    start = time.perf_counter()
+    board = Leaderboard({uid: data['total_xp'] for uid, data in ((int(k), v) for k, v in guild_data.items())})
+    build = time.perf_counter() - start
+
+    gains = [(rng.choice(user_ids), rng.randint(15, 25)) for _ in range(queries * 10)]
+
+    def update(i):
+        user_id, gain = gains[i]
+        board.update(user_id, board.scores[user_id] + gain)
+    update_seconds = timed(update, len(gains))
+    for user_id, gain in gains:
+        guild_data[str(user_id)]['total_xp'] = board.scores[user_id]
+
+    rank_seconds = timed(lambda i: board.rank(probes[i]), queries)
+    middle = members // 2
+    page_seconds = timed(lambda i: board.page(middle, 10), queries)
+
+    # The index orders ties by user id
+    expected = sorted(guild_data.items(), key=lambda x: (-x[1]['total_xp'], int(x[0])))
+    positions = {int(user_id): position for position, (user_id, _) in enumerate(expected, 1)}
+    ok = (board.page(middle, 10) == [(int(user_id), data['total_xp']) for user_id, data in expected[middle:middle + 10]]
+          and all(board.rank(user_id) == positions[user_id] for user_id in probes))
+    return {
+        'legacy_top_ms': legacy_top * 1000, 'legacy_rank_ms': legacy_rank_seconds * 1000,
+        'build_ms': build * 1000, 'updates_per_second': 1 / update_seconds,
+        'rank_us': rank_seconds * 1e6, 'page_us': page_seconds * 1e6, 'ok': ok,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--members', default='1000,50000,500000')
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(SEED)
+    print(f"{'members':>8} {'old top10':>10} {'old rank':>10} {'build':>9} {'updates/s':>10} "
+          f"{'rank':>8} {'page':>8} {'ok':>4}")
+    for members in [int(m) for m in args.members.split(',')]:
+        r = run(members, args.queries, rng)
+        print(f"{members:>8} {r['legacy_top_ms']:>8.2f}ms {r['legacy_rank_ms']:>8.2f}ms {r['build_ms']:>7.0f}ms "
+              f"{r['updates_per_second']:>10.0f} {r['rank_us']:>6.1f}us {r['page_us']:>6.1f}us {str(r['ok']):>4}")
+
+if __name__ == '__main__':
+    main()
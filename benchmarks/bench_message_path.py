@@ -0,0 +1,277 @@
+"""
+Benchmark for the per-message hot path and the persistence layer behind it.
+
+Writes a synthetic bot_config.json (10, 1k and 10k guilds by default, with
+100k users of XP and economy data spread over them), imports it the way the
+bot does on first start, then feeds fake messages through the real on_message
+handlers of AutoMod, Leveling, Counting, AFK and ServerStats, dispatched by
+message_pipeline as in the bot. AIMod and AIChat are registered too, without
+an API key, so only their inline filters are measured. The message mix
+includes counting, AFK mentions, bad words, links and caps so the write paths
+are exercised too.
+
+Reports throughput, p50/p99 latency per message (all stages) and the
+bytes written by the persistence layer, including the final flush. Each guild
+count runs in a fresh process in its own temp directory, so caches and files
+do not carry over. Results are seeded and can be saved with --output to
+compare storage changes.
+
+Usage: python benchmarks/bench_message_path.py [--messages 20000] [--guilds 10,1000,10000]
+       [--users 100000] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED = 1234
+USER_ID_BASE = 10**17
+GUILD_ID_BASE = 10**15
+COUNTING_CHANNEL = 1
+BAD_WORDS = ['badword', 'worseword', 'worstword']
+
+def make_config(guilds, users):
+    """Synthetic config: every user belongs to guild (user % guilds)"""
+    rng = random.Random(SEED)
+    import config
+    cfg = json.loads(json.dumps(config.DEFAULT_CONFIG))
+    user_xp, economy, afk_users = {}, {}, {}
+    for u in range(users):
+        gid, uid = str(GUILD_ID_BASE + u % guilds), str(USER_ID_BASE + u)
+        user_xp.setdefault(gid, {})[uid] = {'xp': u % 500, 'level': u % 30, 'total_xp': u * 7}
+        economy.setdefault(gid, {})[uid] = {
+            'balance': rng.randint(0, 10000), 'bank': rng.randint(0, 50000),
+            'inventory': [], 'last_daily': None, 'last_work': None
+        }
+        if u % 100 == 0:
+            afk_users[uid] = {'reason': 'brb', 'timestamp': datetime.now(timezone.utc).isoformat()}
+    cfg['user_xp'] = user_xp
+    cfg['economy'] = economy
+    cfg['afk_users'] = afk_users
+    cfg['automod'] = {
+        str(GUILD_ID_BASE + g): {
+            'enabled': True, 'spam_detection': True, 'link_filter': True, 'bad_words': BAD_WORDS,
+            'caps_filter': True, 'emoji_spam': False, 'max_messages': 5, 'time_window': 5,
+            'punishment': 'warn'
+        }
+        for g in range(0, guilds, 2)
+    }
+    cfg['counting'] = {
+        str(GUILD_ID_BASE + g): {
+            'enabled': True, 'channel_id': COUNTING_CHANNEL, 'current_number': 0,
+            'last_user_id': None, 'high_score': 0
+        }
+        for g in range(guilds)
+    }
+    cfg['guild_prefixes'] = {str(GUILD_ID_BASE + g): '!' for g in range(guilds)}
+    return cfg
+
+async def _noop(*args, **kwargs):
+    return None
+
+def make_member(user_id):
+    return SimpleNamespace(
+        id=user_id, bot=False, name=f'user{user_id}', mention=f'<@{user_id}>',
+        display_avatar=SimpleNamespace(url=''),
+        guild_permissions=SimpleNamespace(manage_messages=False),
+        add_roles=_noop, timeout=_noop, kick=_noop
+    )
+
+def make_messages(count, guilds, users):
+    """Seeded message mix; counting messages carry the next number of their guild"""
+    rng = random.Random(SEED)
+    next_number = {}
+    guild_objects = {}
+    channels = {}
+    now = datetime.now(timezone.utc)
+    messages = []
+    for i in range(count):
+        u = rng.randrange(users)
+        g = u % guilds
+        guild = guild_objects.get(g)
+        if guild is None:
+            guild = guild_objects[g] = SimpleNamespace(
+                id=GUILD_ID_BASE + g, name=f'guild{g}', member_count=users // guilds,
+                get_role=lambda role_id: None
+            )
+        roll = rng.random()
+        channel_id = 100 + rng.randrange(5)
+        mentions = []
+        if roll < 0.05:
+            channel_id = COUNTING_CHANNEL
+            number = next_number.get(g, 0) + 1
+            next_number[g] = number
+            content = str(number)
+        elif roll < 0.07:
+            content = 'hey are you there?'
+            mentions = [make_member(USER_ID_BASE + rng.randrange(0, users, 100))]
+        elif roll < 0.08:
+            content = f'this is a {rng.choice(BAD_WORDS)} message'
+        elif roll < 0.09:
+            content = 'check https://example.com/page out'
+        elif roll < 0.10:
+            content = 'WHY IS EVERYONE SHOUTING TODAY'
+        else:
+            content = ' '.join(rng.choice(('hello', 'the', 'game', 'tonight', 'lol', 'nice', 'gg', 'anyone'))
+                               for _ in range(rng.randint(2, 12)))
+        channel = channels.get(channel_id)
+        if channel is None:
+            channel = channels[channel_id] = SimpleNamespace(id=channel_id, name=f'channel{channel_id}', send=_noop)
+        messages.append(SimpleNamespace(
+            id=i, content=content, author=make_member(USER_ID_BASE + u), guild=guild,
+            channel=channel, mentions=mentions, mention_everyone=False, created_at=now,
+            delete=_noop, add_reaction=_noop
+        ))
+    return messages
+
+def io_written():
+    """Bytes this process passed to write() so far (Linux only), or None"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+async def run_scenario(guilds, users, message_count, workdir):
+    """Run one guild count in workdir and return its results"""
+    # config's files are relative to the working directory: never write them into the repo
+    os.chdir(workdir)
+    import config
+    import message_pipeline
+    from cogs.afk import AFK
+    from cogs.aichat import AIChat
+    from cogs.aimoderation import AIMod
+    from cogs.automod import AutoMod
+    from cogs.counting import Counting
+    from cogs.leveling import Leveling
+    from cogs.serverstats import ServerStats
+
+    with open(config.CONFIG_FILE, 'w') as f:
+        json.dump(make_config(guilds, users), f, indent=4)
+    file_size = os.path.getsize(config.CONFIG_FILE)
+
+    start = time.perf_counter()
+    config.enable_journal()
+    config.load_config()
+    import_seconds = time.perf_counter() - start
+
+    bot = SimpleNamespace(get_channel=lambda channel_id: None, get_cog=lambda name: None,
+                          user=SimpleNamespace(id=1, mentioned_in=lambda message: False),
+                          wait_until_ready=_noop)
+    cogs = [AutoMod(bot), Leveling(bot), Counting(bot), AFK(bot), AIMod(bot), AIChat(bot), ServerStats(bot)]
+    for cog in cogs:
+        await cog.cog_load()
+    messages = make_messages(message_count, guilds, users)
+
+    # Warm up the per-guild caches on a slice of the traffic
+    for message in messages[:min(1000, len(messages) // 10)]:
+        await message_pipeline.dispatch(message)
+
+    stats_before = config.get_persistence_stats()
+    io_before = io_written()
+    latencies = []
+    run_start = time.perf_counter()
+    for message in messages:
+        start = time.perf_counter()
+        await message_pipeline.dispatch(message)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - run_start
+
+    stages = message_pipeline.get_stage_stats()
+    # Leveling writes its in-memory XP on unload; count it in the final flush
+    flush_start = time.perf_counter()
+    await cogs[1].cog_unload()
+    config.flush()
+    flush_seconds = time.perf_counter() - flush_start
+    stats_after = config.get_persistence_stats()
+    io_after = io_written()
+    cogs[-1].cog_unload()
+    config.shutdown()
+
+    latencies.sort()
+    return {
+        'guilds': guilds,
+        'users': users,
+        'messages': len(messages),
+        'legacy_file_bytes': file_size,
+        'import_seconds': import_seconds,
+        'messages_per_second': len(messages) / elapsed,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+        'max_us': latencies[-1] * 1e6,
+        'final_flush_ms': flush_seconds * 1000,
+        'store_bytes': stats_after['bytes_written'] - stats_before['bytes_written'],
+        'journal_bytes': stats_after['journal_bytes'] - stats_before['journal_bytes'],
+        'flushes': stats_after['flushes'] - stats_before['flushes'],
+        'io_bytes': io_after - io_before if io_before is not None else None,
+        'stage_avg_us': {name: stats['avg_us'] for name, stats in stages.items()},
+    }
+
+def run_child(guilds, users, messages):
+    """Run one scenario in a fresh process and temp directory"""
+    workdir = tempfile.mkdtemp(prefix='bench_messages_')
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop('OPENAI_API_KEY', None)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--scenario', str(guilds),
+         '--users', str(users), '--messages', str(messages), '--workdir', workdir],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if output.returncode != 0:
+        sys.stderr.write(output.stdout + output.stderr)
+        raise SystemExit(f"scenario with {guilds} guilds failed")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--guilds', default='10,1000,10000')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--scenario', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        # Child process: keep the listeners' chatter out of the result line
+        real_stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        workdir = args.workdir or tempfile.mkdtemp(prefix='bench_messages_')
+        result = asyncio.run(run_scenario(args.scenario, args.users, args.messages, workdir))
+        sys.stdout = real_stdout
+        print(json.dumps(result))
+        return
+
+    results = []
+    print(f"{'guilds':>7} {'users':>7} {'file':>8} {'import':>8} {'msg/s':>9} {'p50':>8} {'p99':>9} "
+          f"{'store':>9} {'journal':>9} {'io':>9}")
+    for guilds in [int(g) for g in args.guilds.split(',')]:
+        r = run_child(guilds, args.users, args.messages)
+        results.append(r)
+        io = f"{r['io_bytes'] / 1024:>7.0f}KB" if r['io_bytes'] is not None else f"{'n/a':>9}"
+        print(f"{guilds:>7} {r['users']:>7} {r['legacy_file_bytes'] / 1e6:>6.1f}MB {r['import_seconds']:>7.2f}s "
+              f"{r['messages_per_second']:>9.0f} {r['p50_us']:>6.1f}us {r['p99_us']:>7.1f}us "
+              f"{r['store_bytes'] / 1024:>7.0f}KB {r['journal_bytes'] / 1024:>7.0f}KB {io}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark for bulk XP operations on one big guild.
+
+Loads a guild of --users members into xp_engine.XPEngine and times
+bulk_import, bulk_scale, recompute_levels and bulk_reset, each a single
+pass over the guild plus one config write (the final store flush is timed
+separately). The old way, walking xp_for_level one level at a time and
+calling update_path() per user, is timed on --legacy-users members and
+extrapolated. Checks that the closed-form levels match the level-by-level
+walk on a sample.
+
+Usage: python benchmarks/bench_xp_bulk.py [--users 1000000] [--legacy-users 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import config_store
+import xp_engine
+
+SEED = 1234
+GUILD_ID = 1000
+USER_ID_BASE = 10**17
+
+def legacy_level(total):
+    """Level of a total, walking xp_for_level as Leveling did"""
+    level = 0
+    while total >= xp_engine.xp_for_level(level + 1):
+        total -= xp_engine.xp_for_level(level + 1)
+        level += 1
+    return level, total
+
+def legacy_scale(totals, factor):
+    """bulk_scale the old way: per-user level walk and update_path()"""
+    for user_id, total in totals.items():
+        total = int(total * factor)
+        level, xp = legacy_level(total)
+        config.update_path(('user_xp', GUILD_ID, user_id), {'xp': xp, 'level': level, 'total_xp': total})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--legacy-users', type=int, default=20_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_xp_bulk_')
+    config.CONFIG_FILE = os.path.join(workdir, 'bot_config.json')
+    config.CONFIG_BACKUP_FILE = os.path.join(workdir, 'bot_config.backup.json')
+    config_store.STORE_FILE = os.path.join(workdir, 'bot_config.db')
+    config.load_config()
+
+    rng = random.Random(SEED)
+    totals = {USER_ID_BASE + u: int(rng.paretovariate(1.2) * 200) for u in range(args.users)}
+
+    legacy_totals = dict(list(totals.items())[:args.legacy_users])
+    start = time.perf_counter()
+    legacy_scale(legacy_totals, 2)
+    legacy_per_user = (time.perf_counter() - start) / len(legacy_totals)
+    config.delete_path(('user_xp', GUILD_ID))
+    config.flush()
+
+    engine = xp_engine.XPEngine()
+    print(f"{'operation':>18} {'users':>9} {'time':>9} {'per user':>10}")
+    print(f"{'legacy scale':>18} {args.users:>9} {legacy_per_user * args.users:>8.2f}s "
+          f"{legacy_per_user * 1e6:>8.2f}us  (extrapolated from {len(legacy_totals)} users)")
+    for name, run in (('bulk_import', lambda: engine.bulk_import(GUILD_ID, totals, replace=True)),
+                      ('bulk_scale x2', lambda: engine.bulk_scale(GUILD_ID, 2)),
+                      ('recompute_levels', lambda: engine.recompute_levels(GUILD_ID)),
+                      ('store flush', None),
+                      ('bulk_reset', lambda: engine.bulk_reset(GUILD_ID))):
+        start = time.perf_counter()
+        if run is None:
+            config.flush()
+        else:
+            run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>18} {args.users:>9} {elapsed:>8.2f}s {elapsed / args.users * 1e6:>8.2f}us")
+        if name == 'bulk_scale x2':
+            sample = rng.sample(sorted(totals), min(10_000, args.users))
+            ok = all((engine.get(GUILD_ID, user_id)['level'], engine.get(GUILD_ID, user_id)['xp'])
+                     == legacy_level(totals[user_id] * 2) for user_id in sample)
+    print(f"closed-form levels match the level-by-level walk: {ok}")
+    config.shutdown()
+
+if __name__ == '__main__':
+    main()
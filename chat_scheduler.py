@@ -0,0 +1,123 @@
+"""
+Fair scheduling of AI chat requests
+At most max_concurrency requests run at once, with per-guild and per-user
+caps on top. Requests that cannot start wait in a queue per guild, and freed
+slots go to the guilds in turn (round robin), so one busy server cannot
+starve the others. Each guild's queue is bounded: during a mention storm
+extra requests are rejected with QueueFull instead of piling up.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+class QueueFull(Exception):
+    """The guild already has max_waiting_per_guild requests waiting"""
+
+class FairScheduler:
+    def __init__(self, max_concurrency=4, per_guild=2, per_user=1, max_waiting_per_guild=5):
+        self.max_concurrency = max_concurrency
+        self.per_guild = per_guild
+        self.per_user = per_user
+        self.max_waiting_per_guild = max_waiting_per_guild
+        self._running = 0
+        self._guild_running = {}
+        self._user_running = {}
+        # guild_id -> deque of (user_id, future); order is the round-robin order
+        self._waiting = OrderedDict()
+        self._stats = {'served': 0, 'queued': 0, 'rejected': 0, 'wait_seconds': 0.0}
+
+    def _eligible(self, guild_id, user_id):
+        return (self._running < self.max_concurrency
+                and self._guild_running.get(guild_id, 0) < self.per_guild
+                and self._user_running.get((guild_id, user_id), 0) < self.per_user)
+
+    def _take(self, guild_id, user_id):
+        self._running += 1
+        self._guild_running[guild_id] = self._guild_running.get(guild_id, 0) + 1
+        key = (guild_id, user_id)
+        self._user_running[key] = self._user_running.get(key, 0) + 1
+        self._stats['served'] += 1
+
+    def _release(self, guild_id, user_id):
+        self._running -= 1
+        if self._guild_running[guild_id] == 1:
+            del self._guild_running[guild_id]
+        else:
+            self._guild_running[guild_id] -= 1
+        key = (guild_id, user_id)
+        if self._user_running[key] == 1:
+            del self._user_running[key]
+        else:
+            self._user_running[key] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, one guild at a time"""
+        progress = True
+        while progress and self._running < self.max_concurrency:
+            progress = False
+            for guild_id in list(self._waiting):
+                queue = self._waiting[guild_id]
+                for entry in queue:
+                    user_id, future = entry
+                    if future.done():
+                        continue
+                    if self._eligible(guild_id, user_id):
+                        queue.remove(entry)
+                        self._take(guild_id, user_id)
+                        future.set_result(None)
+                        # Served: this guild goes to the back of the line
+                        self._waiting.move_to_end(guild_id)
+                        progress = True
+                        break
+                while queue and queue[0][1].done():
+                    queue.popleft()
+                if not queue:
+                    del self._waiting[guild_id]
+                if progress:
+                    break
+
+    async def _acquire(self, guild_id, user_id):
+        if guild_id not in self._waiting and self._eligible(guild_id, user_id):
+            self._take(guild_id, user_id)
+            return
+        queue = self._waiting.get(guild_id)
+        if queue is None:
+            queue = self._waiting[guild_id] = deque()
+        if len(queue) >= self.max_waiting_per_guild:
+            self._stats['rejected'] += 1
+            raise QueueFull(guild_id)
+        future = asyncio.get_running_loop().create_future()
+        entry = (user_id, future)
+        queue.append(entry)
+        self._stats['queued'] += 1
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release(guild_id, user_id)
+            elif entry in queue:
+                queue.remove(entry)
+                if not queue and self._waiting.get(guild_id) is queue:
+                    del self._waiting[guild_id]
+            raise
+        self._stats['wait_seconds'] += time.monotonic() - start
+
+    @asynccontextmanager
+    async def slot(self, guild_id, user_id):
+        """Wait for a turn (raises QueueFull if the guild's queue is full), hold it while inside"""
+        await self._acquire(guild_id, user_id)
+        try:
+            yield
+        finally:
+            self._release(guild_id, user_id)
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['running'] = self._running
+        stats['waiting'] = sum(len(queue) for queue in self._waiting.values())
+        stats['avg_wait_ms'] = stats['wait_seconds'] / stats['queued'] * 1000 if stats['queued'] else 0.0
+        return stats
@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 import config
+import message_pipeline
 from datetime import datetime, timezone
 
 class AFK(commands.Cog):
@@ -14,33 +15,27 @@ class AFK(commands.Cog):
     
     def save_afk_users(self, afk_users):
         """Save AFK users"""
-        cfg = config.load_config()
-        cfg['afk_users'] = afk_users
-        config.save_config(cfg)
+        config.update_path(('afk_users',), afk_users)
     
     def set_afk(self, user_id, reason):
         """Set user as AFK"""
-        afk_users = self.get_afk_users()
-        afk_users[str(user_id)] = {
+        config.update_path(('afk_users', user_id), {
             'reason': reason,
             'timestamp': datetime.now(timezone.utc).isoformat()
-        }
-        self.save_afk_users(afk_users)
+        })
     
     def remove_afk(self, user_id):
         """Remove AFK status"""
-        afk_users = self.get_afk_users()
-        if str(user_id) in afk_users:
-            del afk_users[str(user_id)]
-            self.save_afk_users(afk_users)
-            return True
-        return False
+        return config.delete_path(('afk_users', user_id))
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
+    async def cog_load(self):
+        message_pipeline.register_stage('afk', self.handle_message, message_pipeline.FEATURES)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('afk')
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
         afk_users = self.get_afk_users()
         
         # Check if user is returning from AFK
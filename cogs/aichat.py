@@ -2,14 +2,31 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import aiohttp
+import chat_scheduler
+import http_clients
+import json
 import config
-from translations import get_text, get_guild_language
+from translations import get_text
+import message_pipeline
 import os
+import time
+import ttl_cache
+
+API_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/') + '/chat/completions'
+# Seconds between edits of a streaming reply (Discord allows about 5 edits per 5 s)
+EDIT_INTERVAL = 1.0
+RESPONSE_CACHE_SIZE = 500
+RESPONSE_CACHE_TTL = 600
 
 class AIChat(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        # Caps concurrent answers overall, per guild and per user
+        self.scheduler = chat_scheduler.FairScheduler()
+        self.response_cache = ttl_cache.TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+        self.stats = {'responses': 0, 'cache_hits': 0, 'rejected': 0, 'edits': 0,
+                      'first_token_seconds': 0.0, 'response_seconds': 0.0}
     
     @app_commands.command(name="aichat", description="Configure AI chat for a channel / AI csevegés beállítása")
     @app_commands.describe(
@@ -72,62 +89,111 @@ class AIChat(commands.Cog):
             
             await interaction.followup.send(embed=embed)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        
+    async def cog_load(self):
+        message_pipeline.register_stage('aichat', self.handle_message, message_pipeline.RESPONSES, background=True,
+                                        accepts=self.wants_message)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('aichat')
+    
+    def wants_message(self, ctx):
+        """Only mentions of the bot are answered; checked inline, so other messages cost no task"""
+        message = ctx.message
+        return bool(self.openai_api_key) and self.bot.user.mentioned_in(message) and not message.mention_everyone
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
         if not message.content or not message.content.strip():
             return
         
         if message.content.startswith('!') or message.content.startswith('/'):
             return
         
-        if not self.openai_api_key:
-            return
-        
-        is_bot_mentioned = self.bot.user.mentioned_in(message) and not message.mention_everyone
+        ai_language = ctx.language if ctx.language in ['en', 'hu'] else 'en'
+        clean_content = message.content.replace(f'<@{self.bot.user.id}>', '').replace(f'<@!{self.bot.user.id}>', '').strip()
         
-        if not is_bot_mentioned:
+        # Repeated prompts ("hi", "what can you do?") are answered from the cache
+        cache_key = (ai_language, ' '.join(clean_content.lower().split()))
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            await self.send_chunks(message, cached)
             return
         
-        guild_lang = get_guild_language(str(message.guild.id))
-        ai_language = guild_lang if guild_lang in ['en', 'hu'] else 'en'
-        
-        async with message.channel.typing():
-            try:
-                clean_content = message.content.replace(f'<@{self.bot.user.id}>', '').replace(f'<@!{self.bot.user.id}>', '').strip()
-                
-                response_text = await self.get_ai_response(
-                    clean_content,
-                    ai_language
-                )
-                
-                if len(response_text) > 2000:
-                    chunks = [response_text[i:i+2000] for i in range(0, len(response_text), 2000)]
-                    for chunk in chunks:
-                        await message.reply(chunk, mention_author=False)
+        try:
+            async with message.channel.typing():
+                async with self.scheduler.slot(message.guild.id, message.author.id):
+                    response_text = await self.stream_reply(message, clean_content, ai_language)
+            self.response_cache.put(cache_key, response_text)
+        
+        except chat_scheduler.QueueFull:
+            self.stats['rejected'] += 1
+            if ai_language == 'hu':
+                await message.reply("⏳ Most túl sok kérdést kapok, próbáld újra egy kicsit később!", mention_author=False)
+            else:
+                await message.reply("⏳ I'm answering too many questions right now, please try again in a moment.", mention_author=False)
+        
+        except Exception as e:
+            print(f"AI Chat Error: {type(e).__name__}: {str(e)}")
+            error_msg = "❌ Sorry, I couldn't process that message."
+            error_str = str(e).lower()
+            
+            if "429" in str(e) or "quota" in error_str or "insufficient_quota" in error_str:
+                error_msg = "❌ AI chat is temporarily unavailable (API quota exceeded). Please contact the bot owner to add OpenAI credits."
+            elif "rate_limit" in error_str or "rate limit" in error_str:
+                error_msg = "❌ Rate limit reached. Please try again in a few moments."
+            elif "invalid" in error_str or "401" in str(e):
+                error_msg = "❌ API key issue. Please contact an administrator."
+            elif "timeout" in error_str:
+                error_msg = "❌ Request timed out. Please try again."
+            
+            await message.reply(error_msg, mention_author=False)
+    
+    async def send_chunks(self, message, text):
+        """Reply with text split into 2000-character messages"""
+        for i in range(0, len(text), 2000):
+            await message.reply(text[i:i + 2000], mention_author=False)
+    
+    async def stream_reply(self, message, user_message, language):
+        """Reply while the answer streams in, editing the reply at most every EDIT_INTERVAL seconds.
+
+        Text beyond 2000 characters continues in further replies. Returns the full answer.
+        """
+        start = time.monotonic()
+        replies = []    # [(discord message, text shown)]
+        text = ''
+        last_edit = 0.0
+        
+        async def show():
+            chunks = [text[i:i + 2000] for i in range(0, len(text), 2000)]
+            for index, chunk in enumerate(chunks):
+                if index < len(replies):
+                    sent, shown = replies[index]
+                    if shown != chunk:
+                        await sent.edit(content=chunk)
+                        replies[index] = (sent, chunk)
+                        self.stats['edits'] += 1
                 else:
-                    await message.reply(response_text, mention_author=False)
-                    
-            except Exception as e:
-                print(f"AI Chat Error: {type(e).__name__}: {str(e)}")
-                error_msg = "❌ Sorry, I couldn't process that message."
-                error_str = str(e).lower()
-                
-                if "429" in str(e) or "quota" in error_str or "insufficient_quota" in error_str:
-                    error_msg = "❌ AI chat is temporarily unavailable (API quota exceeded). Please contact the bot owner to add OpenAI credits."
-                elif "rate_limit" in error_str or "rate limit" in error_str:
-                    error_msg = "❌ Rate limit reached. Please try again in a few moments."
-                elif "invalid" in error_str or "401" in str(e):
-                    error_msg = "❌ API key issue. Please contact an administrator."
-                elif "timeout" in error_str:
-                    error_msg = "❌ Request timed out. Please try again."
-                
-                await message.reply(error_msg, mention_author=False)
+                    sent = await message.reply(chunk, mention_author=False)
+                    replies.append((sent, chunk))
+        
+        async for delta in self.stream_ai_response(user_message, language):
+            if not text:
+                self.stats['first_token_seconds'] += time.monotonic() - start
+            text += delta
+            if time.monotonic() - last_edit >= EDIT_INTERVAL:
+                await show()
+                last_edit = time.monotonic()
+        
+        if not text:
+            raise Exception("OpenAI API returned an empty response")
+        await show()
+        self.stats['responses'] += 1
+        self.stats['response_seconds'] += time.monotonic() - start
+        return text
     
-    async def get_ai_response(self, user_message: str, language: str) -> str:
-        """Get AI response from OpenAI API"""
+    async def stream_ai_response(self, user_message: str, language: str):
+        """Yield the AI response from OpenAI API piece by piece as it is generated"""
         
         system_prompt = {
             'en': "You are a helpful and friendly Discord bot assistant. Keep responses concise and helpful.",
@@ -146,23 +212,43 @@ class AIChat(commands.Cog):
                 {"role": "user", "content": user_message}
             ],
             "max_tokens": 500,
-            "temperature": 0.7
+            "temperature": 0.7,
+            "stream": True
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result['choices'][0]['message']['content']
-                else:
-                    error_text = await response.text()
-                    print(f"OpenAI API Error {response.status}: {error_text}")
-                    raise Exception(f"OpenAI API error {response.status}: {error_text[:100]}")
+        # sock_read bounds the gap between chunks rather than the whole answer
+        async with http_clients.request(
+            'openai', 'POST',
+            API_URL,
+            headers=headers,
+            json=data,
+            timeout=aiohttp.ClientTimeout(total=90, sock_read=30)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                print(f"OpenAI API Error {response.status}: {error_text}")
+                raise Exception(f"OpenAI API error {response.status}: {error_text[:100]}")
+            
+            # Server-sent events: one "data: {...}" line per chunk, then "data: [DONE]"
+            async for line in response.content:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                payload = line[5:].strip()
+                if payload == '[DONE]':
+                    break
+                choices = json.loads(payload).get('choices') or [{}]
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+    
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats.update(self.scheduler.get_stats())
+        responses = stats['responses']
+        stats['avg_first_token_ms'] = stats['first_token_seconds'] / responses * 1000 if responses else 0.0
+        stats['avg_response_ms'] = stats['response_seconds'] / responses * 1000 if responses else 0.0
+        return stats
 
 async def setup(bot):
     await bot.add_cog(AIChat(bot))
@@ -1,13 +1,16 @@
 import discord
 from discord.ext import commands
 import config
+import message_pipeline
+import moderation_queue
 import os
-import aiohttp
 
 class AIMod(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.api_key = os.getenv('OPENAI_API_KEY')
+        # Batches the checks of all guilds into shared, rate-limited requests
+        self.queue = moderation_queue.ModerationQueue(self.api_key)
     
     def get_aimod_config(self, guild_id):
         """Get AI moderation settings"""
@@ -29,22 +32,26 @@ class AIMod(commands.Cog):
         cfg['aimod'][str(guild_id)] = settings
         config.save_config(cfg)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
+    async def cog_load(self):
+        message_pipeline.register_stage('aimoderation', self.handle_message, message_pipeline.MODERATION, background=True,
+                                        accepts=self.wants_message)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('aimoderation')
+        await self.queue.close()
+    
+    def wants_message(self, ctx):
+        """Guilds with AI moderation on, and text to classify (attachments or stickers only have none)"""
+        return (bool(self.api_key) and config.get_path(('aimod', ctx.guild_id, 'enabled'), False)
+                and bool(ctx.features.length))
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
         settings = self.get_aimod_config(message.guild.id)
         
-        if not settings['enabled']:
-            return
-        
         if message.channel.id in settings['excluded_channels']:
             return
         
-        if not self.api_key:
-            return
-        
         is_toxic = await self.check_toxicity(message.content)
         
         if is_toxic:
@@ -78,45 +85,7 @@ class AIMod(commands.Cog):
     
     async def check_toxicity(self, text):
         """Use OpenAI to check message toxicity"""
-        if not self.api_key or len(text) < 5:
-            return False
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                }
-                
-                data = {
-                    'model': 'gpt-3.5-turbo',
-                    'messages': [
-                        {
-                            'role': 'system',
-                            'content': 'You are a content moderation assistant. Respond with only "toxic" or "safe".'
-                        },
-                        {
-                            'role': 'user',
-                            'content': f'Is this message toxic, hateful, or inappropriate? Message: "{text}"'
-                        }
-                    ],
-                    'max_tokens': 10,
-                    'temperature': 0.3
-                }
-                
-                async with session.post(
-                    'https://api.openai.com/v1/chat/completions',
-                    headers=headers,
-                    json=data
-                ) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        response = result['choices'][0]['message']['content'].lower()
-                        return 'toxic' in response
-        except:
-            pass
-        
-        return False
+        return await self.queue.check(text)
 
 async def setup(bot):
     await bot.add_cog(AIMod(bot))
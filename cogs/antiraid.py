@@ -3,6 +3,17 @@ from discord.ext import commands
 import config
 from datetime import datetime, timedelta, timezone
 from collections import defaultdict
+from dataclasses import dataclass
+import guild_settings
+
+@guild_settings.register('antiraid')
+@dataclass(frozen=True, slots=True)
+class AntiRaidSettings:
+    enabled: bool = False
+    join_threshold: int = 10
+    time_window: int = 10
+    action: str = 'kick'
+    lockdown_on_raid: bool = True
 
 class AntiRaid(commands.Cog):
     def __init__(self, bot):
@@ -11,29 +22,20 @@ class AntiRaid(commands.Cog):
     
     def get_antiraid_config(self, guild_id):
         """Get anti-raid settings"""
-        cfg = config.load_config()
-        antiraid = cfg.get('antiraid', {})
-        return antiraid.get(str(guild_id), {
-            'enabled': False,
-            'join_threshold': 10,
-            'time_window': 10,
-            'action': 'kick',
-            'lockdown_on_raid': True
-        })
+        settings = config.get_path(('antiraid', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(AntiRaidSettings)
+        return settings
     
     def save_antiraid_config(self, guild_id, settings):
         """Save anti-raid settings"""
-        cfg = config.load_config()
-        if 'antiraid' not in cfg:
-            cfg['antiraid'] = {}
-        cfg['antiraid'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('antiraid', guild_id), settings)
     
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        settings = self.get_antiraid_config(member.guild.id)
+        settings = guild_settings.get_settings('antiraid', member.guild.id)
         
-        if not settings['enabled']:
+        if not settings.enabled:
             return
         
         now = datetime.now(timezone.utc)
@@ -43,14 +45,14 @@ class AntiRaid(commands.Cog):
         self.join_tracking[guild_id].append(now)
         
         # Clean old joins
-        cutoff = now - timedelta(seconds=settings['time_window'])
+        cutoff = now - timedelta(seconds=settings.time_window)
         self.join_tracking[guild_id] = [
             join_time for join_time in self.join_tracking[guild_id]
             if join_time > cutoff
         ]
         
         # Check if raid detected
-        if len(self.join_tracking[guild_id]) >= settings['join_threshold']:
+        if len(self.join_tracking[guild_id]) >= settings.join_threshold:
             await self.handle_raid(member.guild, settings)
     
     async def handle_raid(self, guild, settings):
@@ -64,23 +66,23 @@ class AntiRaid(commands.Cog):
                 if channel:
                     embed = discord.Embed(
                         title="🚨 RAID DETECTED!",
-                        description=f"**{settings['join_threshold']}** users joined in **{settings['time_window']}** seconds!\n\nAction taken: **{settings['action'].upper()}**",
+                        description=f"**{settings.join_threshold}** users joined in **{settings.time_window}** seconds!\n\nAction taken: **{settings.action.upper()}**",
                         color=0xFF0000,
                         timestamp=discord.utils.utcnow()
                     )
                     await channel.send("@here", embed=embed)
         
         # Take action based on settings
-        if settings['action'] == 'kick':
-            recent_members = sorted(guild.members, key=lambda m: m.joined_at, reverse=True)[:settings['join_threshold']]
+        if settings.action == 'kick':
+            recent_members = sorted(guild.members, key=lambda m: m.joined_at, reverse=True)[:settings.join_threshold]
             for member in recent_members:
                 try:
                     await member.kick(reason="Anti-raid protection")
                 except:
                     pass
         
-        elif settings['action'] == 'ban':
-            recent_members = sorted(guild.members, key=lambda m: m.joined_at, reverse=True)[:settings['join_threshold']]
+        elif settings.action == 'ban':
+            recent_members = sorted(guild.members, key=lambda m: m.joined_at, reverse=True)[:settings.join_threshold]
             for member in recent_members:
                 try:
                     await member.ban(reason="Anti-raid protection")
@@ -88,7 +90,7 @@ class AntiRaid(commands.Cog):
                     pass
         
         # Lockdown if enabled
-        if settings['lockdown_on_raid']:
+        if settings.lockdown_on_raid:
             for channel in guild.text_channels:
                 try:
                     await channel.set_permissions(guild.default_role, send_messages=False, reason="Raid lockdown")
@@ -2,136 +2,132 @@ import discord
 from discord.ext import commands
 import config
 import translations
-import re
-from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from hungarian_automod import has_bad_words, detect_language, merge_bad_words, get_bad_words_for_language
+from hungarian_automod import get_guild_matcher, get_dashboard_bad_words
 from database import get_guild_settings
+from dataclasses import dataclass
+import guild_settings
+import link_policy
+import message_pipeline
+import rate_tracker
+
+@guild_settings.register('automod')
+@dataclass(frozen=True, slots=True)
+class AutoModSettings:
+    enabled: bool = False
+    spam_detection: bool = True
+    link_filter: bool = False
+    blocked_links: tuple = ()
+    bad_words: tuple = ()
+    caps_filter: bool = False
+    emoji_spam: bool = False
+    max_messages: int = 5
+    time_window: int = 5
+    # Repeated-message and mention-burst checks punish, so they stay off (0)
+    # until a guild sets them with /automod set
+    duplicate_limit: int = 0
+    duplicate_window: int = 30
+    mention_limit: int = 0
+    mention_window: int = 30
+    punishment: str = 'warn'
 
 class AutoMod(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.message_cache = defaultdict(list)
-        self.spam_cooldown = {}
+        self.rate_tracker = rate_tracker.RateTracker()
         
     def get_automod_config(self, guild_id):
         """Get automod settings for a guild"""
-        cfg = config.load_config()
-        automod = cfg.get('automod', {})
-        return automod.get(str(guild_id), {
-            'enabled': False,
-            'spam_detection': True,
-            'link_filter': False,
-            'bad_words': [],
-            'caps_filter': False,
-            'emoji_spam': False,
-            'max_messages': 5,
-            'time_window': 5,
-            'punishment': 'warn'
-        })
+        settings = config.get_path(('automod', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(AutoModSettings)
+        return settings
     
     def save_automod_config(self, guild_id, settings):
         """Save automod settings"""
-        cfg = config.load_config()
-        if 'automod' not in cfg:
-            cfg['automod'] = {}
-        cfg['automod'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('automod', guild_id), settings)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
+    async def cog_load(self):
+        message_pipeline.register_stage('automod', self.handle_message, message_pipeline.MODERATION)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('automod')
+    
+    async def handle_message(self, ctx):
         # Skip if user has manage messages permission
-        if message.author.guild_permissions.manage_messages:
+        if ctx.can_manage_messages:
             return
         
-        settings = self.get_automod_config(message.guild.id)
+        settings = ctx.settings('automod')
         
-        if not settings['enabled']:
+        if not settings.enabled:
             return
         
-        # Spam detection
-        if settings['spam_detection']:
-            if await self.check_spam(message, settings):
+        message = ctx.message
+        # Each check returns True once it acted on the message; later stages
+        # then skip it
+        if settings.spam_detection:
+            if await self.check_spam(message, settings, ctx.content_lower, ctx.features):
+                ctx.stop('automod')
                 return
         
         # Bad words filter
-        if settings['bad_words']:
-            if await self.check_bad_words(message, settings):
+        if settings.bad_words or get_dashboard_bad_words(ctx.guild_id):
+            if await self.check_bad_words(message, settings, ctx.language):
+                ctx.stop('automod')
                 return
         
         # Link filter
-        if settings['link_filter']:
-            if await self.check_links(message):
+        if (settings.link_filter or settings.blocked_links) and ctx.features.has_links:
+            if await self.check_links(message, settings, ctx.features):
+                ctx.stop('automod')
                 return
         
         # Caps filter
-        if settings['caps_filter']:
-            if await self.check_caps(message):
+        if settings.caps_filter:
+            if await self.check_caps(message, ctx.features):
+                ctx.stop('automod')
                 return
         
         # Emoji spam
-        if settings['emoji_spam']:
-            if await self.check_emoji_spam(message):
+        if settings.emoji_spam:
+            if await self.check_emoji_spam(message, ctx.features):
+                ctx.stop('automod')
                 return
     
-    async def check_spam(self, message, settings):
-        """Detect message spam"""
-        guild_id = message.guild.id
-        author_id = message.author.id
-        now = datetime.now(timezone.utc)
-        
-        # Clean old messages
-        self.message_cache[author_id] = [
-            msg_time for msg_time in self.message_cache[author_id]
-            if (now - msg_time).total_seconds() < settings['time_window']
-        ]
-        
-        # Add current message
-        self.message_cache[author_id].append(now)
-        
-        # Check if spam threshold exceeded
-        if len(self.message_cache[author_id]) > settings['max_messages']:
-            await self.punish_user(message, "Message spam detected", settings['punishment'])
-            self.message_cache[author_id].clear()
-            return True
+    async def check_spam(self, message, settings, content_lower, features):
+        """Detect message spam, repeated messages and mention bursts"""
+        verdict = self.rate_tracker.record(message.guild.id, message.author.id, settings,
+                                           content_lower.strip(), features.mention_count)
+        if verdict is None:
+            return False
         
-        return False
+        if verdict == rate_tracker.SPAM:
+            await self.punish_user(message, "Message spam detected", settings.punishment)
+        else:
+            try:
+                await message.delete()
+                if verdict == rate_tracker.DUPLICATE:
+                    warning = f"⚠️ {message.author.mention}, please don't repeat the same message!"
+                else:
+                    warning = f"⚠️ {message.author.mention}, too many mentions!"
+                await message.channel.send(warning, delete_after=5)
+            except:
+                pass
+            reason = "Duplicate message spam detected" if verdict == rate_tracker.DUPLICATE else "Mention spam detected"
+            await self.punish_user(message, reason, settings.punishment)
+        self.rate_tracker.reset(message.guild.id, message.author.id)
+        return True
     
-    async def check_bad_words(self, message, settings):
+    async def check_bad_words(self, message, settings, guild_language):
         """Check for bad words with language support"""
-        # Load custom bad words from config
-        cfg = config.load_config()
-        custom_bad_words = settings.get('bad_words', [])
-        
-        # Get guild language setting
-        guild_language = cfg.get('guild_languages', {}).get(str(message.guild.id), 'en')
-        
-        # Check for bad words (custom words take priority)
-        if custom_bad_words:
-            # Check custom bad words first
-            for bad_word in custom_bad_words:
-                if bad_word.lower() in message.content.lower():
-                    try:
-                        await message.delete()
-                        
-                        if guild_language == 'hu':
-                            msg = f"⚠️ {message.author.mention}, megfelelő viselkedés szükséges!"
-                        else:
-                            msg = f"⚠️ {message.author.mention}, please watch your language!"
-                        
-                        await message.channel.send(msg, delete_after=5)
-                        await self.punish_user(message, f"Used inappropriate word: {bad_word}", settings['punishment'])
-                    except:
-                        pass
-                    return True
-        
-        # Then check language-specific bad words
-        found_bad, bad_word = has_bad_words(message.content, guild_language, custom_bad_words)
-        
-        if found_bad:
+        # Language list, custom words and dashboard words in one compiled pass
+        # over the normalized text
+        matcher = get_guild_matcher(message.guild.id, guild_language, settings.bad_words)
+        found = matcher.find(message.content or '')
+        
+        if found:
+            bad_word = found[0]
             try:
                 await message.delete()
                 
@@ -141,22 +137,21 @@ class AutoMod(commands.Cog):
                     msg = f"⚠️ {message.author.mention}, please watch your language!"
                 
                 await message.channel.send(msg, delete_after=5)
-                await self.punish_user(message, f"Used inappropriate word: {bad_word}", settings['punishment'])
+                await self.punish_user(message, f"Used inappropriate word: {bad_word}", settings.punishment)
             except:
                 pass
             return True
         
         return False
     
-    async def check_links(self, message):
-        """Check for links/invites"""
-        url_pattern = r'https?://|discord\.gg/|discord\.com/invite/'
-        
-        if re.search(url_pattern, message.content, re.IGNORECASE):
+    async def check_links(self, message, settings, features):
+        """Check links/invites against the guild's allowed and blocked lists"""
+        found = link_policy.get_guild_policy(message.guild, settings).check(features)
+        if found:
             try:
                 await message.delete()
                 await message.channel.send(
-                    f"⚠️ {message.author.mention}, links are not allowed!",
+                    f"⚠️ {message.author.mention}, links to {found[2]} are not allowed!",
                     delete_after=5
                 )
             except:
@@ -165,14 +160,12 @@ class AutoMod(commands.Cog):
         
         return False
     
-    async def check_caps(self, message):
+    async def check_caps(self, message, features):
         """Check for excessive caps"""
-        if len(message.content) < 5:
+        if features.length < 5:
             return False
         
-        caps_ratio = sum(1 for c in message.content if c.isupper()) / len(message.content)
-        
-        if caps_ratio > 0.7:
+        if features.caps_ratio > 0.7:
             try:
                 await message.delete()
                 await message.channel.send(
@@ -185,11 +178,9 @@ class AutoMod(commands.Cog):
         
         return False
     
-    async def check_emoji_spam(self, message):
+    async def check_emoji_spam(self, message, features):
         """Check for emoji spam"""
-        emoji_count = len(re.findall(r'<a?:\w+:\d+>|[\U0001F600-\U0001F64F]', message.content))
-        
-        if emoji_count > 10:
+        if features.emoji_count > 10:
             try:
                 await message.delete()
                 await message.channel.send(
@@ -206,20 +197,11 @@ class AutoMod(commands.Cog):
         """Punish user based on settings"""
         if punishment == 'warn':
             # Add warning
-            cfg = config.load_config()
-            if 'warnings' not in cfg:
-                cfg['warnings'] = {}
-            
-            user_id = str(message.author.id)
-            if user_id not in cfg['warnings']:
-                cfg['warnings'][user_id] = []
-            
-            cfg['warnings'][user_id].append({
+            config.mutate('warnings', message.author.id, lambda warnings: warnings.append({
                 'reason': reason,
                 'moderator': 'AutoMod',
                 'timestamp': datetime.now(timezone.utc).isoformat()
-            })
-            config.save_config(cfg)
+            }), default=list)
             
         elif punishment == 'mute':
             try:
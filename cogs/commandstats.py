@@ -1,14 +1,24 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import config
-from datetime import datetime, timezone
+import command_telemetry
+import command_timing
+import time
 
 class CommandStats(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Counted in memory, written to config by flush_task
+        self.telemetry = command_telemetry.CommandTelemetry()
+        self.flush_task.start()
+    
+    def cog_unload(self):
+        self.flush_task.cancel()
+        self.telemetry.flush()
     
     def get_command_stats(self, guild_id=None):
         """Get command usage statistics"""
+        self.telemetry.flush(guild_id)
         cfg = config.load_config()
         stats = cfg.get('command_stats', {})
         
@@ -18,56 +28,36 @@ class CommandStats(commands.Cog):
     
     def record_command(self, guild_id, command_name, user_id):
         """Record command usage"""
-        cfg = config.load_config()
-        if 'command_stats' not in cfg:
-            cfg['command_stats'] = {}
-        if str(guild_id) not in cfg['command_stats']:
-            cfg['command_stats'][str(guild_id)] = {
-                'total_commands': 0,
-                'commands': {},
-                'users': {},
-                'history': []
-            }
-        
-        guild_stats = cfg['command_stats'][str(guild_id)]
-        
-        # Total count
-        guild_stats['total_commands'] += 1
-        
-        # Command count
-        if command_name not in guild_stats['commands']:
-            guild_stats['commands'][command_name] = 0
-        guild_stats['commands'][command_name] += 1
-        
-        # User count
-        user_key = str(user_id)
-        if user_key not in guild_stats['users']:
-            guild_stats['users'][user_key] = 0
-        guild_stats['users'][user_key] += 1
-        
-        # History (keep last 1000)
-        guild_stats['history'].append({
-            'command': command_name,
-            'user_id': user_id,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        })
-        
-        if len(guild_stats['history']) > 1000:
-            guild_stats['history'] = guild_stats['history'][-1000:]
-        
-        config.save_config(cfg)
+        self.telemetry.record(guild_id, command_name, user_id)
+    
+    def get_command_latency(self, command_name):
+        """Latency summary of a command: slash commands are timed by command_timing, prefix commands here"""
+        return command_timing.summary(command_name) or self.telemetry.latency(command_name)
+    
+    @tasks.loop(minutes=1)
+    async def flush_task(self):
+        """Periodically save command usage"""
+        self.telemetry.flush()
     
     @commands.Cog.listener()
     async def on_command(self, ctx):
         """Track command usage"""
+        ctx.command_started = time.perf_counter()
         if ctx.guild:
-            self.record_command(ctx.guild.id, "command_name", ctx.author.id)
+            self.record_command(ctx.guild.id, ctx.command.qualified_name, ctx.author.id)
+    
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx):
+        started = getattr(ctx, 'command_started', None)
+        if started is not None:
+            self.telemetry.record_latency(ctx.command.qualified_name, time.perf_counter() - started)
     
     @commands.Cog.listener()
     async def on_interaction(self, interaction):
         """Track slash command usage"""
-        if interaction.type == discord.InteractionType.application_command and interaction.guild:
-            self.record_command(interaction.guild.id, interaction.command.name, interaction.user.id)
+        if interaction.type == discord.InteractionType.application_command:
+            if interaction.guild and interaction.command:
+                self.record_command(interaction.guild.id, interaction.command.qualified_name, interaction.user.id)
 
 async def setup(bot):
     await bot.add_cog(CommandStats(bot))
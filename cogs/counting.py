@@ -1,6 +1,18 @@
 import discord
 from discord.ext import commands
 import config
+from dataclasses import dataclass
+import guild_settings
+import message_pipeline
+
+@guild_settings.register('counting')
+@dataclass(frozen=True, slots=True)
+class CountingSettings:
+    enabled: bool = False
+    channel_id: int = None
+    current_number: int = 0
+    last_user_id: int = None
+    high_score: int = 0
 
 class Counting(commands.Cog):
     def __init__(self, bot):
@@ -8,32 +20,25 @@ class Counting(commands.Cog):
     
     def get_counting_config(self, guild_id):
         """Get counting game settings"""
-        cfg = config.load_config()
-        counting = cfg.get('counting', {})
-        return counting.get(str(guild_id), {
-            'enabled': False,
-            'channel_id': None,
-            'current_number': 0,
-            'last_user_id': None,
-            'high_score': 0
-        })
+        settings = config.get_path(('counting', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(CountingSettings)
+        return settings
     
     def save_counting_config(self, guild_id, settings):
         """Save counting game settings"""
-        cfg = config.load_config()
-        if 'counting' not in cfg:
-            cfg['counting'] = {}
-        cfg['counting'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('counting', guild_id), settings)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
-        settings = self.get_counting_config(message.guild.id)
-        
-        if not settings['enabled'] or message.channel.id != settings['channel_id']:
+    async def cog_load(self):
+        message_pipeline.register_stage('counting', self.handle_message, message_pipeline.FEATURES)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('counting')
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
+        gate = ctx.settings('counting')
+        if not gate.enabled or message.channel.id != gate.channel_id:
             return
         
         # Try to parse number
@@ -42,6 +47,9 @@ class Counting(commands.Cog):
         except:
             return
         
+        # The count itself is updated in place, so work on the mutable entry
+        settings = self.get_counting_config(message.guild.id)
+        
         expected = settings['current_number'] + 1
         
         # Check if correct number
@@ -1,9 +1,7 @@
 import discord
 from discord.ext import commands
-import json
-import os
-
-CONFIG_FILE = 'bot_config.json'
+import config
+import message_pipeline
 
 class CustomCommands(commands.Cog):
     def __init__(self, bot):
@@ -12,43 +10,25 @@ class CustomCommands(commands.Cog):
     
     def load_custom_commands(self):
         """Load custom commands from config"""
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r') as f:
-                    config = json.load(f)
-                    return config.get('custom_commands', {})
-            except:
-                return {}
-        return {}
+        cfg = config.load_config()
+        return cfg.get('custom_commands', {})
     
     def save_custom_commands(self):
         """Save custom commands to config"""
-        config = {}
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r') as f:
-                    config = json.load(f)
-            except:
-                pass
-        
-        config['custom_commands'] = self.custom_commands
-        
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
+        cfg = config.load_config()
+        cfg['custom_commands'] = self.custom_commands
+        config.save_config(cfg)
+    
+    async def cog_load(self):
+        message_pipeline.register_stage('customcommands', self.handle_message, message_pipeline.COMMANDS)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('customcommands')
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    async def handle_message(self, ctx):
         """Listen for custom command triggers"""
-        if message.author.bot:
-            return
-        
-        # Check if message starts with any guild prefix or default
-        if not message.guild:
-            return
-        
-        # Import config to get guild prefix
-        import config
-        prefix = config.get_guild_prefix(message.guild.id)
+        message = ctx.message
+        prefix = ctx.prefix
         
         if not message.content.startswith(prefix):
             return
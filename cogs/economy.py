@@ -1,12 +1,15 @@
 import discord
 from discord.ext import commands
 import config
+import leaderboard_index
 from datetime import datetime, timedelta, timezone
 import random
 
 class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Ranked by wallet balance
+        self.leaderboard = leaderboard_index.ConfigLeaderboards('economy', lambda data: data.get('balance', 0))
     
     def get_user_balance(self, guild_id, user_id):
         """Get user's economy data"""
@@ -23,13 +26,7 @@ class Economy(commands.Cog):
     
     def save_user_balance(self, guild_id, user_id, data):
         """Save user's economy data"""
-        cfg = config.load_config()
-        if 'economy' not in cfg:
-            cfg['economy'] = {}
-        if str(guild_id) not in cfg['economy']:
-            cfg['economy'][str(guild_id)] = {}
-        cfg['economy'][str(guild_id)][str(user_id)] = data
-        config.save_config(cfg)
+        self.leaderboard.save(guild_id, user_id, data)
     
     def get_shop_items(self, guild_id):
         """Get server shop items"""
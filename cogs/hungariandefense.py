@@ -7,7 +7,7 @@ from discord.ext import commands
 from discord import app_commands
 from hungarian_automod import (
     HUNGARIAN_BAD_WORDS, ENGLISH_BAD_WORDS, 
-    get_bad_words_for_language, merge_bad_words
+    get_bad_words_for_language, merge_bad_words, invalidate_guild
 )
 from database import get_guild_settings, update_guild_settings
 import translations
@@ -34,6 +34,7 @@ class HungarianDefense(commands.Cog):
         
         settings['language'] = 'hu'
         update_guild_settings(str(interaction.guild.id), settings)
+        invalidate_guild(interaction.guild.id)
         
         embed = discord.Embed(
             title="✅ Hungarian Defense Enabled",
@@ -53,6 +54,7 @@ class HungarianDefense(commands.Cog):
         settings['automod'] = settings.get('automod', {})
         settings['automod']['enabled'] = False
         update_guild_settings(str(interaction.guild.id), settings)
+        invalidate_guild(interaction.guild.id)
         
         embed = discord.Embed(
             title="❌ Hungarian Defense Disabled",
@@ -104,6 +106,7 @@ class HungarianDefense(commands.Cog):
         bad_words.append(word_lower)
         settings['bad_words'] = bad_words
         update_guild_settings(str(interaction.guild.id), settings)
+        invalidate_guild(interaction.guild.id)
         
         embed = discord.Embed(
             title="✅ Word Added",
@@ -127,6 +130,7 @@ class HungarianDefense(commands.Cog):
         bad_words.remove(word_lower)
         settings['bad_words'] = bad_words
         update_guild_settings(str(interaction.guild.id), settings)
+        invalidate_guild(interaction.guild.id)
         
         embed = discord.Embed(
             title="✅ Word Removed",
@@ -171,6 +175,7 @@ class HungarianDefense(commands.Cog):
         default_words = get_bad_words_for_language(language)
         settings['bad_words'] = default_words.copy()
         update_guild_settings(str(interaction.guild.id), settings)
+        invalidate_guild(interaction.guild.id)
         
         embed = discord.Embed(
             title="✅ Reset to Defaults",
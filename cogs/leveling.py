@@ -1,111 +1,87 @@
+import asyncio
 import discord
 from discord.ext import commands
 from discord import app_commands
 import config
+import json
 import random
-from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from types import MappingProxyType
+import guild_settings
+import message_pipeline
+import xp_engine
+
+@guild_settings.register('leveling')
+@dataclass(frozen=True, slots=True)
+class LevelingSettings:
+    enabled: bool = True
+    xp_per_message: tuple = (15, 25)
+    cooldown: int = 60
+    level_up_channel: int = None
+    level_up_message: str = 'GG {user}, you reached level {level}!'
+    role_rewards: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.xp_cooldown = {}
+        # XP is kept in memory and written to config in batches
+        self.engine = xp_engine.XPEngine()
     
     def get_leveling_config(self, guild_id):
         """Get leveling settings"""
-        cfg = config.load_config()
-        leveling = cfg.get('leveling', {})
-        return leveling.get(str(guild_id), {
-            'enabled': True,
-            'xp_per_message': (15, 25),
-            'cooldown': 60,
-            'level_up_channel': None,
-            'level_up_message': 'GG {user}, you reached level {level}!',
-            'role_rewards': {}
-        })
+        settings = config.get_path(('leveling', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(LevelingSettings)
+        return settings
     
     def save_leveling_config(self, guild_id, settings):
         """Save leveling settings"""
-        cfg = config.load_config()
-        if 'leveling' not in cfg:
-            cfg['leveling'] = {}
-        cfg['leveling'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('leveling', guild_id), settings)
     
     def get_user_xp(self, guild_id, user_id):
         """Get user XP and level"""
-        cfg = config.load_config()
-        user_data = cfg.get('user_xp', {}).get(str(guild_id), {}).get(str(user_id), {
-            'xp': 0,
-            'level': 0,
-            'total_xp': 0
-        })
-        return user_data
+        return self.engine.get(guild_id, user_id)
     
     def save_user_xp(self, guild_id, user_id, xp, level, total_xp):
         """Save user XP"""
-        cfg = config.load_config()
-        if 'user_xp' not in cfg:
-            cfg['user_xp'] = {}
-        if str(guild_id) not in cfg['user_xp']:
-            cfg['user_xp'][str(guild_id)] = {}
-        
-        cfg['user_xp'][str(guild_id)][str(user_id)] = {
-            'xp': xp,
-            'level': level,
-            'total_xp': total_xp
-        }
-        config.save_config(cfg)
+        self.engine.set(guild_id, user_id, xp, level, total_xp)
     
     def xp_for_level(self, level):
         """Calculate XP needed for a level"""
-        return 5 * (level ** 2) + 50 * level + 100
+        return self.engine.curve.xp_for_level(level)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
-        settings = self.get_leveling_config(message.guild.id)
+    async def cog_load(self):
+        message_pipeline.register_stage('leveling', self.handle_message, message_pipeline.FEATURES)
+        self.engine.start()
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('leveling')
+        await self.engine.stop()
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
+        settings = ctx.settings('leveling')
         
-        if not settings['enabled']:
+        if not settings.enabled:
             return
         
         # Check cooldown
-        user_key = f"{message.guild.id}_{message.author.id}"
-        now = datetime.now(timezone.utc)
-        
-        if user_key in self.xp_cooldown:
-            if (now - self.xp_cooldown[user_key]).total_seconds() < settings['cooldown']:
-                return
-        
-        self.xp_cooldown[user_key] = now
+        if self.engine.on_cooldown(message.guild.id, message.author.id, settings.cooldown):
+            return
         
         # Award XP
-        xp_gain = random.randint(*settings['xp_per_message'])
-        user_data = self.get_user_xp(message.guild.id, message.author.id)
-        
-        new_xp = user_data['xp'] + xp_gain
-        new_total_xp = user_data['total_xp'] + xp_gain
-        current_level = user_data['level']
+        new_level = self.engine.award(message.guild.id, message.author.id, random.randint(*settings.xp_per_message))
         
         # Check for level up
-        xp_needed = self.xp_for_level(current_level + 1)
-        
-        if new_xp >= xp_needed:
-            new_level = current_level + 1
-            new_xp = new_xp - xp_needed
-            
-            # Save
-            self.save_user_xp(message.guild.id, message.author.id, new_xp, new_level, new_total_xp)
-            
+        if new_level is not None:
             # Send level up message
-            level_msg = settings['level_up_message'].format(
+            level_msg = settings.level_up_message.format(
                 user=message.author.mention,
                 level=new_level
             )
             
-            if settings['level_up_channel']:
-                channel = self.bot.get_channel(settings['level_up_channel'])
+            if settings.level_up_channel:
+                channel = self.bot.get_channel(settings.level_up_channel)
                 if channel:
                     embed = discord.Embed(
                         title="🎉 Level Up!",
@@ -118,17 +94,14 @@ class Leveling(commands.Cog):
                 await message.channel.send(level_msg)
             
             # Check for role rewards
-            if str(new_level) in settings['role_rewards']:
-                role_id = settings['role_rewards'][str(new_level)]
+            if str(new_level) in settings.role_rewards:
+                role_id = settings.role_rewards[str(new_level)]
                 role = message.guild.get_role(role_id)
                 if role:
                     try:
                         await message.author.add_roles(role, reason=f"Level {new_level} reward")
                     except:
                         pass
-        else:
-            # Save XP
-            self.save_user_xp(message.guild.id, message.author.id, new_xp, current_level, new_total_xp)
 
     @app_commands.command(name="xp_toggle", description="Toggle the XP system for this server")
     @app_commands.checks.has_permissions(manage_guild=True)
@@ -140,5 +113,81 @@ class Leveling(commands.Cog):
         status = "enabled" if settings['enabled'] else "disabled"
         await interaction.response.send_message(f"✅ XP system has been **{status}** for this server.")
 
+    @app_commands.command(name="xp_import", description="Import total XP from a JSON file (e.g. another bot's export)")
+    @app_commands.describe(
+        file="JSON: {\"user_id\": total_xp} or a list of {\"id\": ..., \"xp\": ...} objects",
+        replace="Drop everyone's current XP first (default: add to it)"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def xp_import(self, interaction: discord.Interaction, file: discord.Attachment, replace: bool = False):
+        await interaction.response.defer()
+        data = await file.read()
+        try:
+            totals = await asyncio.get_running_loop().run_in_executor(None, lambda: parse_xp_import(json.loads(data)))
+        except (ValueError, TypeError, KeyError) as e:
+            await interaction.followup.send(f"❌ Could not read the file: {e}")
+            return
+        result = await self.engine.run_bulk(interaction.guild.id, xp_engine.plan_import, totals, replace)
+        if await self.report_busy(interaction, result):
+            return
+        await interaction.followup.send(
+            f"✅ Imported XP for **{len(totals)}** users ({result['users']} users with XP now, {result['seconds'] * 1000:.0f} ms)."
+        )
+    
+    async def report_busy(self, interaction, result):
+        """Tell the admin if another bulk operation of the guild is still running"""
+        if result is None:
+            await interaction.followup.send("⏳ Another XP operation is still running on this server, try again shortly.")
+            return True
+        return False
+    
+    @app_commands.command(name="xp_reset", description="Reset XP of one user or of the whole server")
+    @app_commands.describe(user="User to reset (default: everyone)")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def xp_reset(self, interaction: discord.Interaction, user: discord.Member = None):
+        await interaction.response.defer()
+        result = await self.engine.run_bulk(interaction.guild.id, xp_engine.plan_reset, [user.id] if user else None)
+        if await self.report_busy(interaction, result):
+            return
+        if user:
+            await interaction.followup.send(f"✅ XP of {user.mention} has been reset.")
+        else:
+            await interaction.followup.send("✅ XP of everyone on this server has been reset.")
+    
+    @app_commands.command(name="xp_scale", description="Multiply everyone's XP by a factor")
+    @app_commands.describe(factor="Multiplier, e.g. 2 or 0.5")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def xp_scale(self, interaction: discord.Interaction, factor: app_commands.Range[float, 0, 100]):
+        await interaction.response.defer()
+        result = await self.engine.run_bulk(interaction.guild.id, xp_engine.plan_scale, factor)
+        if await self.report_busy(interaction, result):
+            return
+        await interaction.followup.send(
+            f"✅ XP of **{result['users']}** users multiplied by {factor:g} ({result['seconds'] * 1000:.0f} ms)."
+        )
+    
+    @app_commands.command(name="xp_recalculate", description="Recalculate levels from total XP")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def xp_recalculate(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        result = await self.engine.run_bulk(interaction.guild.id, xp_engine.plan_recompute)
+        if await self.report_busy(interaction, result):
+            return
+        await interaction.followup.send(
+            f"✅ Levels of **{result['users']}** users recalculated ({result['seconds'] * 1000:.0f} ms)."
+        )
+
+def parse_xp_import(data):
+    """{user_id: total_xp} from {"id": xp} or [{"id"/"user_id", "xp"/"total_xp"}] (MEE6-style "players" too)"""
+    if isinstance(data, dict) and isinstance(data.get('players'), list):
+        data = data['players']
+    if isinstance(data, dict):
+        return {int(user_id): int(xp) for user_id, xp in data.items()}
+    totals = {}
+    for entry in data:
+        user_id = entry['id'] if 'id' in entry else entry['user_id']
+        totals[int(user_id)] = int(entry['xp'] if 'xp' in entry else entry['total_xp'])
+    return totals
+
 async def setup(bot):
     await bot.add_cog(Leveling(bot))
@@ -38,11 +38,10 @@ class Moderation(commands.Cog):
                     try:
                         user = await self.bot.fetch_user(int(user_id))
                         await guild.unban(user, reason="Temporary ban expired")
-                        del temp_bans[guild_id][user_id]
+                        # Only this guild's entry is rewritten, and nothing when no ban expired
+                        config.delete_path(('temp_bans', guild_id, user_id))
                     except:
                         pass
-        
-        config.save_config(cfg)
     
     @check_temp_actions.before_loop
     async def before_check_temp_actions(self):
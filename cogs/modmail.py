@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import config
+import message_pipeline
 
 class ModMail(commands.Cog):
     def __init__(self, bot):
@@ -165,11 +166,14 @@ class ModMail(commands.Cog):
         cfg['modmail'][str(guild_id)] = settings
         config.save_config(cfg)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        # Ignore bots
-        if message.author.bot:
-            return
+    async def cog_load(self):
+        message_pipeline.register_stage('modmail', self.handle_message, message_pipeline.COMMANDS, guild_only=False)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('modmail')
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
         
         # ============ CASE 1: User sends DM to bot ============
         if not message.guild and message.author != self.bot.user:
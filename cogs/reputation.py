@@ -1,11 +1,13 @@
 import discord
 from discord.ext import commands
 import config
+import leaderboard_index
 from datetime import datetime, timedelta, timezone
 
 class Reputation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.leaderboard = leaderboard_index.ConfigLeaderboards('reputation', lambda data: data.get('rep', 0))
     
     def get_user_rep(self, guild_id, user_id):
         """Get user reputation data"""
@@ -21,13 +23,7 @@ class Reputation(commands.Cog):
     
     def save_user_rep(self, guild_id, user_id, data):
         """Save user reputation"""
-        cfg = config.load_config()
-        if 'reputation' not in cfg:
-            cfg['reputation'] = {}
-        if str(guild_id) not in cfg['reputation']:
-            cfg['reputation'][str(guild_id)] = {}
-        cfg['reputation'][str(guild_id)][str(user_id)] = data
-        config.save_config(cfg)
+        self.leaderboard.save(guild_id, user_id, data)
     
     async def give_rep(self, interaction, target_user, positive=True):
         """Give reputation to a user"""
@@ -1,50 +1,62 @@
 import discord
 from discord.ext import commands, tasks
+import activity_metrics
 import config
+import message_pipeline
 from datetime import datetime, timezone
-from collections import defaultdict
+import time
 
 class ServerStats(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.message_counts = defaultdict(int)
+        # Per-minute counters, written to config by save_stats_task
+        self.activity = activity_metrics.ActivityCounters()
         self.save_stats_task.start()
     
     def cog_unload(self):
         self.save_stats_task.cancel()
+        message_pipeline.unregister_stage('serverstats')
+        self.activity.flush(on_guild=self.add_totals)
     
     def get_server_stats(self, guild_id):
         """Get server statistics"""
         cfg = config.load_config()
         stats = cfg.get('server_stats', {})
-        return stats.get(str(guild_id), {
-            'total_messages': 0,
-            'member_count_history': [],
-            'most_active_users': {},
-            'most_active_channels': {}
-        })
+        return stats.get(str(guild_id), default_server_stats())
     
     def save_server_stats(self, guild_id, stats):
         """Save server statistics"""
-        cfg = config.load_config()
-        if 'server_stats' not in cfg:
-            cfg['server_stats'] = {}
-        cfg['server_stats'][str(guild_id)] = stats
-        config.save_config(cfg)
+        config.update_path(('server_stats', guild_id), stats)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
+    async def cog_load(self):
+        message_pipeline.register_stage('serverstats', self.handle_message, message_pipeline.STATS)
+    
+    async def handle_message(self, ctx):
+        message = ctx.message
         # Track message counts
-        guild_key = f"{message.guild.id}"
-        user_key = f"{message.guild.id}_{message.author.id}"
-        channel_key = f"{message.guild.id}_{message.channel.id}"
-        
-        self.message_counts[guild_key] += 1
-        self.message_counts[user_key] += 1
-        self.message_counts[channel_key] += 1
+        self.activity.record(message.guild.id, message.channel.id, message.author.id)
+    
+    def add_totals(self, guild_id, counts):
+        """Add flushed activity counts to the all-time totals in server_stats"""
+        def apply(stats):
+            for key, value in default_server_stats().items():
+                stats.setdefault(key, value)
+            users = stats['most_active_users']
+            channels = stats['most_active_channels']
+            for (dimension, entity_id, _), count in counts.items():
+                if dimension == 'guild':
+                    stats['total_messages'] += count
+                elif dimension == 'user':
+                    users[str(entity_id)] = users.get(str(entity_id), 0) + count
+                else:
+                    channels[str(entity_id)] = channels.get(str(entity_id), 0) + count
+        config.mutate('server_stats', guild_id, apply)
+    
+    def recent_messages(self, guild_id, seconds):
+        """Messages in a guild in the last seconds, flushed and pending"""
+        resolution = 'minute' if seconds <= 86400 else 'hour'
+        stored = activity_metrics.query(guild_id, 'guild', resolution, since=time.time() - seconds)
+        return sum(count for points in stored.values() for _, count in points) + self.activity.pending_count(guild_id)
     
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -80,41 +92,22 @@ class ServerStats(commands.Cog):
         
         self.save_server_stats(member.guild.id, stats)
     
-    @tasks.loop(minutes=10)
+    @tasks.loop(minutes=1)
     async def save_stats_task(self):
-        """Periodically save statistics"""
-        for guild in self.bot.guilds:
-            stats = self.get_server_stats(guild.id)
-            
-            # Update total messages
-            guild_key = f"{guild.id}"
-            if guild_key in self.message_counts:
-                stats['total_messages'] += self.message_counts[guild_key]
-                self.message_counts[guild_key] = 0
-            
-            # Update most active users
-            for key, count in list(self.message_counts.items()):
-                if key.startswith(f"{guild.id}_") and len(key.split('_')) == 2:
-                    user_id = key.split('_')[1]
-                    if user_id not in stats['most_active_users']:
-                        stats['most_active_users'][user_id] = 0
-                    stats['most_active_users'][user_id] += count
-                    del self.message_counts[key]
-            
-            # Update most active channels
-            for key, count in list(self.message_counts.items()):
-                if key.startswith(f"{guild.id}_") and len(key.split('_')) == 2:
-                    channel_id = key.split('_')[1]
-                    if channel_id not in stats['most_active_channels']:
-                        stats['most_active_channels'][channel_id] = 0
-                    stats['most_active_channels'][channel_id] += count
-                    del self.message_counts[key]
-            
-            self.save_server_stats(guild.id, stats)
+        """Periodically save statistics of the guilds that had messages"""
+        self.activity.flush(on_guild=self.add_totals)
     
     @save_stats_task.before_loop
     async def before_save_stats(self):
         await self.bot.wait_until_ready()
 
+def default_server_stats():
+    return {
+        'total_messages': 0,
+        'member_count_history': [],
+        'most_active_users': {},
+        'most_active_channels': {}
+    }
+
 async def setup(bot):
     await bot.add_cog(ServerStats(bot))
@@ -6,6 +6,9 @@ import translations
 from datetime import datetime, timezone, timedelta
 from cogs.tickets import TicketView, CloseTicketView
 
+# AutoMod spam settings /automod set can change
+AUTOMOD_LIMITS = ('duplicate_limit', 'duplicate_window', 'mention_limit', 'mention_window')
+
 class SlashCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -102,7 +105,7 @@ class SlashCommands(commands.Cog):
     async def slash_meme(self, interaction: discord.Interaction):
         import random
         from urllib.parse import quote
-        import aiohttp
+        import http_clients
         
         guild_id = interaction.guild.id
         await interaction.response.defer()
@@ -115,24 +118,23 @@ class SlashCommands(commands.Cog):
         ]
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(random.choice(meme_apis), timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        meme_url = data.get('url')
-                        meme_title = data.get('title', translations.get_text(guild_id, 'meme_title'))
-                        
-                        embed = discord.Embed(
-                            title=meme_title,
-                            color=discord.Color.random()
-                        )
-                        embed.set_image(url=meme_url)
-                        embed.set_footer(text=f"r/{data.get('subreddit')} | {translations.get_text(guild_id, 'generated_meme')}")
-                        
-                        await interaction.followup.send(embed=embed)
-                        return
-                    else:
-                        raise Exception("Meme API error")
+            async with http_clients.request('meme', 'GET', random.choice(meme_apis)) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    meme_url = data.get('url')
+                    meme_title = data.get('title', translations.get_text(guild_id, 'meme_title'))
+                    
+                    embed = discord.Embed(
+                        title=meme_title,
+                        color=discord.Color.random()
+                    )
+                    embed.set_image(url=meme_url)
+                    embed.set_footer(text=f"r/{data.get('subreddit')} | {translations.get_text(guild_id, 'generated_meme')}")
+                    
+                    await interaction.followup.send(embed=embed)
+                    return
+                else:
+                    raise Exception("Meme API error")
         except Exception as e:
             # Fallback to local templates if API fails
             lang = translations.get_guild_language(guild_id)
@@ -1387,9 +1389,9 @@ class SlashCommands(commands.Cog):
     
     @app_commands.command(name="automod", description="Configure auto-moderation system")
     @app_commands.describe(
-        action="Action to perform",
-        setting="Setting to modify (optional)",
-        value="Value to set (optional)"
+        action="Action to perform (enable, disable, settings, set, blocklink, unblocklink)",
+        setting="Setting to modify with set: duplicate_limit, duplicate_window, mention_limit, mention_window",
+        value="Value to set (0 turns a limit off), or the domain/link to (un)block"
     )
     @app_commands.checks.has_permissions(administrator=True)
     async def slash_automod(self, interaction: discord.Interaction, action: str, setting: str = None, value: str = None):
@@ -1419,10 +1421,55 @@ class SlashCommands(commands.Cog):
             embed.add_field(name="Emoji Spam", value="✅ Yes" if settings['emoji_spam'] else "❌ No", inline=True)
             embed.add_field(name="Punishment", value=settings['punishment'].upper(), inline=True)
             embed.add_field(name="Bad Words", value=f"{len(settings['bad_words'])} words", inline=True)
+            embed.add_field(name="Blocked Links", value=f"{len(settings.get('blocked_links') or ())} links", inline=True)
+            for name in AUTOMOD_LIMITS:
+                limit = settings.get(name, 0)
+                embed.add_field(name=name.replace('_', ' ').title(), value=str(limit) if limit else "❌ Off", inline=True)
             await interaction.response.send_message(embed=embed)
         
+        elif action == "set":
+            if setting not in AUTOMOD_LIMITS:
+                await interaction.response.send_message(
+                    f"❌ Invalid setting! Use: {', '.join(AUTOMOD_LIMITS)}", ephemeral=True)
+                return
+            try:
+                number = int(value)
+            except (TypeError, ValueError):
+                number = -1
+            # Limits may be 0 (off); windows divide the refill rate, so they must be positive
+            if number < 0 or (number == 0 and setting.endswith('_window')):
+                await interaction.response.send_message(
+                    "❌ Value must be a whole number (0 turns a limit off, windows are in seconds)", ephemeral=True)
+                return
+            settings[setting] = number
+            automod_cog.save_automod_config(interaction.guild.id, settings)
+            await interaction.response.send_message(f"✅ {setting} set to {number if number else 'off'}")
+        
+        elif action in ("blocklink", "unblocklink"):
+            import link_policy
+            entry = (value or '').strip()
+            if link_policy.parse_entry(entry) is None:
+                await interaction.response.send_message(
+                    "❌ Give a domain (example.com, *.example.com), URL or invite link as value!", ephemeral=True)
+                return
+            blocked = list(settings.get('blocked_links') or ())
+            if action == "blocklink":
+                if entry not in blocked:
+                    blocked.append(entry)
+                message = f"✅ Links to {entry} will be removed"
+            elif entry in blocked:
+                blocked.remove(entry)
+                message = f"✅ {entry} removed from the blocked links"
+            else:
+                await interaction.response.send_message(f"❌ {entry} is not blocked!", ephemeral=True)
+                return
+            settings['blocked_links'] = blocked
+            automod_cog.save_automod_config(interaction.guild.id, settings)
+            await interaction.response.send_message(message)
+        
         else:
-            await interaction.response.send_message("❌ Invalid action! Use: enable, disable, or settings", ephemeral=True)
+            await interaction.response.send_message(
+                "❌ Invalid action! Use: enable, disable, settings, set, blocklink, or unblocklink", ephemeral=True)
 
     # ==================== WELCOME/GOODBYE COMMANDS ====================
     
@@ -1536,44 +1583,64 @@ class SlashCommands(commands.Cog):
         embed.add_field(name="Level", value=f"⭐ {user_data['level']}", inline=True)
         embed.add_field(name="XP", value=f"{user_data['xp']} / {leveling_cog.xp_for_level(user_data['level'] + 1)}", inline=True)
         embed.add_field(name="Total XP", value=f"{user_data['total_xp']}", inline=True)
+        rank, ranked = leveling_cog.engine.rank(interaction.guild.id, target.id)
+        if rank:
+            embed.add_field(name="Rank", value=f"#{rank} of {ranked}", inline=True)
         embed.add_field(name="XP Until Next Level", value=f"{xp_needed} XP", inline=False)
         embed.set_thumbnail(url=target.display_avatar.url)
         
         await interaction.response.send_message(embed=embed)
     
-    @app_commands.command(name="leaderboard", description="Show server XP leaderboard")
-    async def slash_leaderboard(self, interaction: discord.Interaction):
-        leveling_cog = self.bot.get_cog('Leveling')
-        if not leveling_cog:
-            await interaction.response.send_message("❌ Leveling system not loaded!", ephemeral=True)
-            return
-        
-        cfg = config.load_config()
-        guild_data = cfg.get('user_xp', {}).get(str(interaction.guild.id), {})
-        
-        # Sort by total XP
-        sorted_users = sorted(
-            guild_data.items(),
-            key=lambda x: x[1].get('total_xp', 0),
-            reverse=True
-        )[:10]
+    @app_commands.command(name="leaderboard", description="Show a server leaderboard")
+    @app_commands.describe(board="What to rank by (default: XP)", page="Page number (10 users per page)")
+    @app_commands.choices(board=[
+        app_commands.Choice(name="⭐ XP", value="xp"),
+        app_commands.Choice(name="💰 Balance", value="balance"),
+        app_commands.Choice(name="👍 Reputation", value="rep")
+    ])
+    async def slash_leaderboard(self, interaction: discord.Interaction, board: str = "xp", page: int = 1):
+        cog_name = {'xp': 'Leveling', 'balance': 'Economy', 'rep': 'Reputation'}[board]
+        cog = self.bot.get_cog(cog_name)
+        if not cog:
+            await interaction.response.send_message(f"❌ {cog_name} system not loaded!", ephemeral=True)
+            return
+        
+        start = (max(page, 1) - 1) * 10
+        if board == 'xp':
+            ranked = len(cog.engine.guild(interaction.guild.id).leaderboard())
+            rows = [(user_id, f"Level {data['level']} • {data['total_xp']} total XP")
+                    for user_id, data in cog.engine.top(interaction.guild.id, 10, start)]
+        else:
+            leaderboard = cog.leaderboard.get(interaction.guild.id)
+            ranked = len(leaderboard)
+            if board == 'balance':
+                rows = [(user_id, f"${score:,}") for user_id, score in leaderboard.page(start, 10)]
+            else:
+                rows = [(user_id, f"{score} reputation") for user_id, score in leaderboard.page(start, 10)]
         
         embed = discord.Embed(
             title=f"🏆 {interaction.guild.name} Leaderboard",
             color=0xFFD700
         )
         
-        for i, (user_id, data) in enumerate(sorted_users, 1):
+        for i, (user_id, value) in enumerate(rows, start + 1):
             user = interaction.guild.get_member(int(user_id))
             if user:
                 embed.add_field(
                     name=f"{i}. {user.name}",
-                    value=f"Level {data['level']} • {data['total_xp']} total XP",
+                    value=value,
                     inline=False
                 )
         
-        if not sorted_users:
-            embed.description = "No data yet! Start chatting to earn XP!"
+        if not rows:
+            if start:
+                embed.description = "No users on this page."
+            elif board == 'xp':
+                embed.description = "No data yet! Start chatting to earn XP!"
+            else:
+                embed.description = "No data yet!"
+        else:
+            embed.set_footer(text=f"Page {start // 10 + 1} of {(ranked + 9) // 10} • {ranked} ranked users")
         
         await interaction.response.send_message(embed=embed)
 
@@ -1650,6 +1717,7 @@ class SlashCommands(commands.Cog):
         embed.add_field(name="Total Messages", value=f"{stats.get('total_messages', 0):,}", inline=True)
         embed.add_field(name="Members", value=f"{interaction.guild.member_count}", inline=True)
         embed.add_field(name="Channels", value=f"{len(interaction.guild.channels)}", inline=True)
+        embed.add_field(name="Messages (24h)", value=f"{stats_cog.recent_messages(interaction.guild.id, 86400):,}", inline=True)
         
         if top_users:
             users_text = "\n".join([
@@ -1717,6 +1785,10 @@ class SlashCommands(commands.Cog):
         embed.add_field(name="Wallet", value=f"${data['balance']:,}", inline=True)
         embed.add_field(name="Bank", value=f"${data['bank']:,}", inline=True)
         embed.add_field(name="Total", value=f"${data['balance'] + data['bank']:,}", inline=True)
+        leaderboard = economy_cog.leaderboard.get(interaction.guild.id)
+        rank = leaderboard.rank(target.id)
+        if rank:
+            embed.add_field(name="Rank", value=f"#{rank} of {len(leaderboard)}", inline=True)
         embed.set_thumbnail(url=target.display_avatar.url)
         
         await interaction.response.send_message(embed=embed)
@@ -2005,7 +2077,14 @@ class SlashCommands(commands.Cog):
         )
         
         if top_commands:
-            commands_text = "\n".join([f"{i+1}. `{cmd}` - {count} uses" for i, (cmd, count) in enumerate(top_commands)])
+            lines = []
+            for i, (cmd, count) in enumerate(top_commands):
+                line = f"{i+1}. `{cmd}` - {count} uses"
+                latency = stats_cog.get_command_latency(cmd)
+                if latency:
+                    line += f" • p50 {latency['p50_ms']:.0f} ms, p95 {latency['p95_ms']:.0f} ms"
+                lines.append(line)
+            commands_text = "\n".join(lines)
             embed.add_field(name="Top Commands", value=commands_text, inline=False)
         
         await interaction.response.send_message(embed=embed)
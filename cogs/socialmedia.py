@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 import config
+import message_pipeline
 
 class SocialMedia(commands.Cog):
     def __init__(self, bot):
@@ -26,12 +27,15 @@ class SocialMedia(commands.Cog):
         cfg['social_media'][str(guild_id)] = settings
         config.save_config(cfg)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    async def cog_load(self):
+        message_pipeline.register_stage('socialmedia', self.handle_message, message_pipeline.FEATURES)
+    
+    async def cog_unload(self):
+        message_pipeline.unregister_stage('socialmedia')
+    
+    async def handle_message(self, ctx):
         """Monitor announcement channel for social media posts"""
-        if message.author.bot or not message.guild:
-            return
-        
+        message = ctx.message
         settings = self.get_social_config(message.guild.id)
         
         if not settings['enabled'] or message.channel.id != settings['announcement_channel_id']:
@@ -1,6 +1,16 @@
 import discord
 from discord.ext import commands
 import config
+from dataclasses import dataclass
+import guild_settings
+
+@guild_settings.register('starboards')
+@dataclass(frozen=True, slots=True)
+class StarboardSettings:
+    enabled: bool = False
+    channel_id: int = None
+    threshold: int = 5
+    emoji: str = '⭐'
 
 class Starboard(commands.Cog):
     def __init__(self, bot):
@@ -8,34 +18,27 @@ class Starboard(commands.Cog):
     
     def get_starboard_config(self, guild_id):
         """Get starboard settings"""
-        cfg = config.load_config()
-        starboards = cfg.get('starboards', {})
-        return starboards.get(str(guild_id), {
-            'enabled': False,
-            'channel_id': None,
-            'threshold': 5,
-            'emoji': '⭐',
-            'starred_messages': {}
-        })
+        settings = config.get_path(('starboards', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(StarboardSettings)
+            settings['starred_messages'] = {}
+        return settings
     
     def save_starboard_config(self, guild_id, settings):
         """Save starboard settings"""
-        cfg = config.load_config()
-        if 'starboards' not in cfg:
-            cfg['starboards'] = {}
-        cfg['starboards'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('starboards', guild_id), settings)
     
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
         if payload.member and payload.member.bot:
             return
         
-        settings = self.get_starboard_config(payload.guild_id)
-        
-        if not settings['enabled'] or str(payload.emoji) != settings['emoji']:
+        gate = guild_settings.get_settings('starboards', payload.guild_id)
+        if not gate.enabled or str(payload.emoji) != gate.emoji:
             return
         
+        settings = self.get_starboard_config(payload.guild_id)
+        
         guild = self.bot.get_guild(payload.guild_id)
         if not guild:
             return
@@ -2,6 +2,17 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import config
+from dataclasses import dataclass
+import guild_settings
+
+@guild_settings.register('tempvoice')
+@dataclass(frozen=True, slots=True)
+class TempVoiceSettings:
+    enabled: bool = False
+    create_channel_id: int = None
+    category_id: int = None
+    channel_name: str = '{user}\'s Channel'
+    temp_channels: tuple = ()
 
 class TempVoice(commands.Cog):
     def __init__(self, bot):
@@ -9,23 +20,14 @@ class TempVoice(commands.Cog):
     
     def get_tempvoice_config(self, guild_id):
         """Get temp voice settings"""
-        cfg = config.load_config()
-        tempvoice = cfg.get('tempvoice', {})
-        return tempvoice.get(str(guild_id), {
-            'enabled': False,
-            'create_channel_id': None,
-            'category_id': None,
-            'channel_name': '{user}\'s Channel',
-            'temp_channels': []
-        })
+        settings = config.get_path(('tempvoice', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(TempVoiceSettings)
+        return settings
     
     def save_tempvoice_config(self, guild_id, settings):
         """Save temp voice settings"""
-        cfg = config.load_config()
-        if 'tempvoice' not in cfg:
-            cfg['tempvoice'] = {}
-        cfg['tempvoice'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('tempvoice', guild_id), settings)
     
     @app_commands.command(name="setupvoice", description="Setup temporary voice channels / Ideiglenes hangcsatornák beállítása")
     @app_commands.describe(channel="The 'Join to Create' voice channel / A 'Csatlakozz a létrehozáshoz' csatorna", category="The category for new channels / Az új csatornák kategóriája")
@@ -59,13 +61,20 @@ class TempVoice(commands.Cog):
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        settings = self.get_tempvoice_config(member.guild.id)
+        gate = guild_settings.get_settings('tempvoice', member.guild.id)
+        
+        if not gate.enabled:
+            return
         
-        if not settings['enabled']:
+        joined_create = after.channel and after.channel.id == gate.create_channel_id
+        left_temp = before.channel and before.channel.id in gate.temp_channels
+        if not (joined_create or left_temp):
             return
         
+        settings = self.get_tempvoice_config(member.guild.id)
+        
         # User joined the "create channel" voice channel
-        if after.channel and after.channel.id == settings['create_channel_id']:
+        if joined_create:
             category = member.guild.get_channel(settings['category_id'])
             
             channel_name = settings['channel_name'].format(user=member.name)
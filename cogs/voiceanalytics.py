@@ -23,13 +23,7 @@ class VoiceAnalytics(commands.Cog):
     
     def save_voice_stats(self, guild_id, user_id, data):
         """Save voice analytics"""
-        cfg = config.load_config()
-        if 'voice_analytics' not in cfg:
-            cfg['voice_analytics'] = {}
-        if str(guild_id) not in cfg['voice_analytics']:
-            cfg['voice_analytics'][str(guild_id)] = {}
-        cfg['voice_analytics'][str(guild_id)][str(user_id)] = data
-        config.save_config(cfg)
+        config.update_path(('voice_analytics', guild_id, user_id), data)
     
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
@@ -4,8 +4,8 @@ from discord import app_commands
 import traceback
 import sys
 from datetime import datetime, timezone
-import aiohttp
 import config
+import http_clients
 
 class WebhookLogging(commands.Cog):
     def __init__(self, bot):
@@ -18,9 +18,8 @@ class WebhookLogging(commands.Cog):
             return
             
         try:
-            async with aiohttp.ClientSession() as session:
-                webhook = discord.Webhook.from_url(self.webhook_url, session=session)
-                await webhook.send(embed=embed)
+            webhook = discord.Webhook.from_url(self.webhook_url, session=http_clients.get_session('discord_webhook'))
+            await webhook.send(embed=embed)
         except Exception as e:
             print(f"Failed to send webhook: {e}")
     
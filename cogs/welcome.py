@@ -2,6 +2,21 @@ import discord
 from discord.ext import commands
 import config
 import translations
+from dataclasses import dataclass
+import guild_settings
+
+@guild_settings.register('welcome')
+@dataclass(frozen=True, slots=True)
+class WelcomeSettings:
+    enabled: bool = False
+    channel_id: int = None
+    message: str = 'Welcome {user} to {server}!'
+    embed: bool = True
+    dm_enabled: bool = False
+    dm_message: str = 'Welcome to {server}!'
+    auto_role: int = None
+    goodbye_enabled: bool = False
+    goodbye_message: str = 'Goodbye {user}!'
 
 class Welcome(commands.Cog):
     def __init__(self, bot):
@@ -9,46 +24,33 @@ class Welcome(commands.Cog):
     
     def get_welcome_config(self, guild_id):
         """Get welcome settings"""
-        cfg = config.load_config()
-        welcome = cfg.get('welcome', {})
-        return welcome.get(str(guild_id), {
-            'enabled': False,
-            'channel_id': None,
-            'message': 'Welcome {user} to {server}!',
-            'embed': True,
-            'dm_enabled': False,
-            'dm_message': 'Welcome to {server}!',
-            'auto_role': None,
-            'goodbye_enabled': False,
-            'goodbye_message': 'Goodbye {user}!'
-        })
+        settings = config.get_path(('welcome', guild_id))
+        if settings is None:
+            settings = guild_settings.default_dict(WelcomeSettings)
+        return settings
     
     def save_welcome_config(self, guild_id, settings):
         """Save welcome settings"""
-        cfg = config.load_config()
-        if 'welcome' not in cfg:
-            cfg['welcome'] = {}
-        cfg['welcome'][str(guild_id)] = settings
-        config.save_config(cfg)
+        config.update_path(('welcome', guild_id), settings)
     
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        settings = self.get_welcome_config(member.guild.id)
+        settings = guild_settings.get_settings('welcome', member.guild.id)
         
-        if not settings['enabled']:
+        if not settings.enabled:
             return
         
         # Send welcome message
-        if settings['channel_id']:
-            channel = self.bot.get_channel(settings['channel_id'])
+        if settings.channel_id:
+            channel = self.bot.get_channel(settings.channel_id)
             if channel:
-                message = settings['message'].format(
+                message = settings.message.format(
                     user=member.mention,
                     server=member.guild.name,
                     count=member.guild.member_count
                 )
                 
-                if settings['embed']:
+                if settings.embed:
                     embed = discord.Embed(
                         title="✨ New Member!",
                         description=message,
@@ -61,9 +63,9 @@ class Welcome(commands.Cog):
                     await channel.send(message)
         
         # Send DM
-        if settings['dm_enabled']:
+        if settings.dm_enabled:
             try:
-                dm_message = settings['dm_message'].format(
+                dm_message = settings.dm_message.format(
                     user=member.name,
                     server=member.guild.name
                 )
@@ -72,9 +74,9 @@ class Welcome(commands.Cog):
                 pass
         
         # Auto-role
-        if settings['auto_role']:
+        if settings.auto_role:
             try:
-                role = member.guild.get_role(settings['auto_role'])
+                role = member.guild.get_role(settings.auto_role)
                 if role:
                     await member.add_roles(role, reason="Auto-role on join")
             except:
@@ -82,14 +84,14 @@ class Welcome(commands.Cog):
     
     @commands.Cog.listener()
     async def on_member_remove(self, member):
-        settings = self.get_welcome_config(member.guild.id)
+        settings = guild_settings.get_settings('welcome', member.guild.id)
         
-        if not settings['goodbye_enabled'] or not settings['channel_id']:
+        if not settings.goodbye_enabled or not settings.channel_id:
             return
         
-        channel = self.bot.get_channel(settings['channel_id'])
+        channel = self.bot.get_channel(settings.channel_id)
         if channel:
-            message = settings['goodbye_message'].format(
+            message = settings.goodbye_message.format(
                 user=member.name,
                 server=member.guild.name
             )
@@ -0,0 +1,105 @@
+"""
+Command usage telemetry
+Uses are counted in memory per guild (total, per command, per user) with the
+most recent ones in a fixed-size ring buffer, and merged into config
+(command_stats[guild_id]) in batches by flush(), one write per guild that
+ran commands. Prefix command latency goes into one histogram per command
+(slash commands are timed by command_timing). Recording a use is a few dict
+increments and a deque append; timestamps are only formatted when history
+is persisted.
+"""
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import config
+from latency_histogram import LatencyHistogram
+
+HISTORY_SIZE = 1000
+
+def default_guild_stats():
+    return {'total_commands': 0, 'commands': {}, 'users': {}, 'history': []}
+
+class _GuildUsage:
+    """Uses of one guild since the last flush"""
+    __slots__ = ('total', 'commands', 'users', 'history')
+
+    def __init__(self):
+        self.total = 0
+        self.commands = {}
+        self.users = {}
+        # (unix time, command, user id), oldest first
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+class CommandTelemetry:
+    def __init__(self):
+        self._pending = {}
+        self._latency = {}
+        self._stats = {'recorded': 0, 'flushes': 0, 'guilds_flushed': 0, 'flush_seconds': 0.0}
+
+    def record(self, guild_id, command, user_id):
+        """Count one use of a command"""
+        usage = self._pending.get(guild_id)
+        if usage is None:
+            usage = self._pending[guild_id] = _GuildUsage()
+        usage.total += 1
+        usage.commands[command] = usage.commands.get(command, 0) + 1
+        usage.users[user_id] = usage.users.get(user_id, 0) + 1
+        usage.history.append((time.time(), command, user_id))
+        self._stats['recorded'] += 1
+
+    def record_latency(self, command, seconds):
+        histogram = self._latency.get(command)
+        if histogram is None:
+            histogram = self._latency[command] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def latency(self, command):
+        """Latency summary of a command (see LatencyHistogram.summary), or None if never timed"""
+        histogram = self._latency.get(command)
+        return histogram.summary() if histogram is not None else None
+
+    def latency_by_command(self):
+        return {command: histogram.summary() for command, histogram in self._latency.items()}
+
+    def flush(self, guild_id=None):
+        """Merge pending uses into config, for one guild or all; returns the number of guilds written"""
+        start = time.perf_counter()
+        if guild_id is None:
+            pending, self._pending = self._pending, {}
+        else:
+            usage = self._pending.pop(guild_id, None)
+            pending = {guild_id: usage} if usage is not None else {}
+        for pending_guild_id, usage in pending.items():
+            config.mutate('command_stats', pending_guild_id,
+                          lambda guild_stats, usage=usage: _merge(guild_stats, usage),
+                          default=default_guild_stats)
+        self._stats['flushes'] += 1
+        self._stats['guilds_flushed'] += len(pending)
+        self._stats['flush_seconds'] += time.perf_counter() - start
+        return len(pending)
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['pending_guilds'] = len(self._pending)
+        stats['commands_timed'] = len(self._latency)
+        return stats
+
+def _merge(guild_stats, usage):
+    for key, value in default_guild_stats().items():
+        guild_stats.setdefault(key, value)
+    guild_stats['total_commands'] += usage.total
+    commands = guild_stats['commands']
+    for command, count in usage.commands.items():
+        commands[command] = commands.get(command, 0) + count
+    users = guild_stats['users']
+    for user_id, count in usage.users.items():
+        users[str(user_id)] = users.get(str(user_id), 0) + count
+    history = guild_stats['history']
+    history.extend({
+        'command': command,
+        'user_id': user_id,
+        'timestamp': datetime.fromtimestamp(at, timezone.utc).isoformat()
+    } for at, command, user_id in usage.history)
+    if len(history) > HISTORY_SIZE:
+        del history[:-HISTORY_SIZE]
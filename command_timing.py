@@ -0,0 +1,183 @@
+"""
+End-to-end timing of slash commands
+TimedCommandTree runs every application command inside a timing record
+(held in a context variable, so it follows the command through every await)
+and measures:
+
+- ack: from receipt to the first response (defer, send_message, ...)
+- total: the whole handler, error handler included
+- time spent in config, database and translations calls, in outbound HTTP
+  (http_clients) and in Discord interaction responses
+
+Each goes into a per-command LatencyHistogram (p50/p95/p99 via get_stats()).
+Discord drops interactions not acknowledged within ACK_DEADLINE seconds of
+creation, so a command still unacknowledged ALERT_SECONDS after Discord
+created it is reported right away with the breakdown so far.
+
+instrument() must run before the cogs are imported: it wraps the public
+functions of config, database and translations in place, and cogs that use
+"from database import ..." bind whatever is there at import time.
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import time
+
+import discord
+from discord import app_commands
+
+import config
+import database
+import http_clients
+import translations
+from latency_histogram import LatencyHistogram
+
+ACK_DEADLINE = 3.0
+ALERT_SECONDS = float(os.getenv('COMMAND_ACK_ALERT_SECONDS', '2.5'))
+SECTIONS = ('config', 'database', 'translations', 'http', 'discord')
+METRICS = ('ack', 'total') + SECTIONS
+RESPONSE_METHODS = ('defer', 'send_message', 'send_modal', 'edit_message', 'launch_activity')
+
+_current = contextvars.ContextVar('command_timing', default=None)
+# command name -> {metric: LatencyHistogram}
+_histograms = {}
+_stats = {'commands': 0, 'alerts': 0, 'late_acks': 0, 'unacknowledged': 0}
+_instrumented = False
+
+class _Timing:
+    __slots__ = ('interaction', 'started', 'lag', 'acked', 'sections', 'depth', 'alert')
+
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.started = time.perf_counter()
+        # How old the interaction already was when it reached us (clock skew aside)
+        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        self.lag = min(max(age, 0.0), ACK_DEADLINE)
+        self.acked = None
+        self.sections = dict.fromkeys(SECTIONS, 0.0)
+        self.depth = 0
+        self.alert = None
+
+def _command_name(interaction):
+    command = interaction.command
+    if command is not None:
+        return command.qualified_name
+    return (interaction.data or {}).get('name', 'unknown')
+
+def _breakdown(timing):
+    return ", ".join(f"{section} {seconds * 1000:.0f}ms" for section, seconds in timing.sections.items())
+
+def _alert(timing):
+    if timing.acked is not None:
+        return
+    _stats['alerts'] += 1
+    elapsed = timing.lag + time.perf_counter() - timing.started
+    print(f"⚠️ /{_command_name(timing.interaction)} not acknowledged {elapsed:.1f}s after Discord sent it "
+          f"(deadline {ACK_DEADLINE:.0f}s, arrived {timing.lag * 1000:.0f}ms late): {_breakdown(timing)}")
+
+def _finish(timing):
+    if timing.alert is not None:
+        timing.alert.cancel()
+    total = time.perf_counter() - timing.started
+    histograms = _histograms.get(name := _command_name(timing.interaction))
+    if histograms is None:
+        histograms = _histograms[name] = {metric: LatencyHistogram() for metric in METRICS}
+    histograms['total'].record(total)
+    if timing.acked is None:
+        _stats['unacknowledged'] += 1
+    else:
+        ack = timing.acked - timing.started
+        histograms['ack'].record(ack)
+        if timing.lag + ack > ACK_DEADLINE:
+            _stats['late_acks'] += 1
+    for section, seconds in timing.sections.items():
+        histograms[section].record(seconds)
+    _stats['commands'] += 1
+
+class TimedCommandTree(app_commands.CommandTree):
+    """CommandTree that times every application command (see module docstring)"""
+    async def _call(self, interaction):
+        if interaction.type is not discord.InteractionType.application_command:
+            return await super()._call(interaction)
+        timing = _Timing(interaction)
+        token = _current.set(timing)
+        timing.alert = asyncio.get_running_loop().call_later(max(ALERT_SECONDS - timing.lag, 0.0), _alert, timing)
+        try:
+            await super()._call(interaction)
+        except app_commands.AppCommandError as e:
+            # Run the error handler inside the record: it usually sends the response
+            await self._dispatch_error(interaction, e)
+        finally:
+            _current.reset(token)
+            _finish(timing)
+
+def _timed(fn, section):
+    """fn, adding its run time to the current command's section (outermost call only)"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        timing = _current.get()
+        if timing is None or timing.depth:
+            return fn(*args, **kwargs)
+        timing.depth += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timing.depth -= 1
+            timing.sections[section] += time.perf_counter() - start
+    return wrapper
+
+def _timed_response(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        timing = _current.get()
+        if timing is None or self._parent is not timing.interaction:
+            return await method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            now = time.perf_counter()
+            timing.sections['discord'] += now - start
+            if timing.acked is None and self.is_done():
+                timing.acked = now
+                timing.alert.cancel()
+    return wrapper
+
+def _on_http_request(upstream, seconds):
+    timing = _current.get()
+    if timing is not None:
+        timing.sections['http'] += seconds
+
+def instrument():
+    """Wrap config, database, translations, HTTP and interaction responses (once)"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    for module, section in ((config, 'config'), (database, 'database'), (translations, 'translations')):
+        for name, fn in list(vars(module).items()):
+            if (inspect.isfunction(fn) and fn.__module__ == module.__name__ and not name.startswith('_')
+                    and not inspect.iscoroutinefunction(fn)):
+                setattr(module, name, _timed(fn, section))
+    for name in RESPONSE_METHODS:
+        method = getattr(discord.InteractionResponse, name, None)
+        if method is not None:
+            setattr(discord.InteractionResponse, name, _timed_response(method))
+    http_clients.add_request_listener(_on_http_request)
+
+def summary(command, metric='total'):
+    """LatencyHistogram summary of one metric of a command, or None if it never ran"""
+    histograms = _histograms.get(command)
+    return histograms[metric].summary() if histograms is not None else None
+
+def get_stats():
+    """Counters plus {command: {metric: summary}} with p50/p95/p99 in milliseconds"""
+    stats = dict(_stats)
+    stats['by_command'] = {
+        name: {metric: histogram.summary() for metric, histogram in histograms.items()}
+        for name, histograms in _histograms.items()
+    }
+    return stats
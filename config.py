@@ -1,12 +1,36 @@
+import asyncio
+import atexit
+import concurrent.futures
+import copy
 import json
 import os
-import tempfile
+import socket
 import threading
+import time
+import uuid
 from datetime import datetime
 
+import config_store
+import config_migrate
+
+# Legacy single-file config; imported into the store once, then no longer written
 CONFIG_FILE = 'bot_config.json'
 CONFIG_BACKUP_FILE = 'bot_config.backup.json'
 
+# Seconds between background flushes; saves in between are coalesced into one write
+CONFIG_FLUSH_INTERVAL = float(os.getenv('CONFIG_FLUSH_INTERVAL', '5'))
+# Seconds between checks for changes committed by other processes (e.g. the dashboard)
+CONFIG_RELOAD_INTERVAL = float(os.getenv('CONFIG_RELOAD_INTERVAL', '1'))
+
+# Append-only journal of mutate()/update_path() changes, enabled by the bot
+# process with enable_journal(). Pending entries are appended every
+# CONFIG_JOURNAL_INTERVAL seconds; the journal is compacted into the store every
+# CONFIG_COMPACT_INTERVAL seconds or once it grows past CONFIG_JOURNAL_MAX_BYTES.
+CONFIG_JOURNAL_FILE = os.getenv('CONFIG_JOURNAL_FILE', 'bot_config.journal')
+CONFIG_JOURNAL_INTERVAL = float(os.getenv('CONFIG_JOURNAL_INTERVAL', '0.5'))
+CONFIG_COMPACT_INTERVAL = float(os.getenv('CONFIG_COMPACT_INTERVAL', '60'))
+CONFIG_JOURNAL_MAX_BYTES = int(os.getenv('CONFIG_JOURNAL_MAX_BYTES', str(8 * 1024 * 1024)))
+
 DEFAULT_CONFIG = {
     'log_channel_id': None,
     'guild_log_channels': {},
@@ -27,78 +51,891 @@ DEFAULT_CONFIG = {
     'last_saved': None
 }
 
-# Global config cache for faster access
+# Global config cache. This is the authoritative copy: reads are served from
+# memory, save_config() only marks it dirty, and the background thread writes
+# the changed shards to config_store at most once per CONFIG_FLUSH_INTERVAL and
+# reloads when another process commits to the store.
 _config_cache = None
-_cache_lock = threading.Lock()
+_config_version = 0
+_store_data_version = None
+_cache_lock = threading.RLock()
+# _dirty: the whole document was replaced by save_config() and must be diffed;
+# _dirty_keys: (namespace, key) shards touched through mutate()/update_path()
+_dirty = False
+_dirty_keys = set()
 
-def load_config():
-    """Load config from file with fallback to backup"""
-    global _config_cache
-    
-    if os.path.exists(CONFIG_FILE):
+# (namespace, key) -> sub-paths changed locally since the last flush, () meaning
+# the whole entry; used to rebase local edits onto rows another process changed
+_dirty_paths = {}
+
+# Per-entry locks for mutate()/update_path(), striped to bound memory
+_KEY_LOCK_STRIPES = 64
+_key_locks = [threading.RLock() for _ in range(_KEY_LOCK_STRIPES)]
+
+# Hashes of what is currently in the store, used to write only changed shards:
+# namespace -> hash of its JSON (None for sharded dict namespaces), and
+# namespace -> {key: hash of the entry's JSON}
+_namespace_hashes = {}
+_entry_hashes = {}
+_MISSING = object()
+
+# Store row versions we last read or wrote, (namespace, key) -> version (key None
+# for namespace rows), and our position in the store's change feed
+_shard_versions = {}
+_last_change_seq = 0
+# Identifies this process in the change feed so it skips its own writes
+_origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# fn(namespace, key) callbacks run whenever a cached entry changes; key None
+# means the whole namespace, namespace None the whole config (see
+# add_change_listener() for (None, SAVED))
+_change_listeners = []
+SAVED = 'saved'
+# The bot's event loop, see set_event_loop()
+_loop = None
+
+_journal = None
+_journal_pending = set()
+
+# All store writes happen on the writer thread (ConfigFlusher) or under
+# _flush_lock; save_async() callers are resolved through _flush_waiters.
+_flush_lock = threading.Lock()
+_flusher_thread = None
+_flusher_stop = threading.Event()
+_flush_wakeup = threading.Event()
+_flush_waiters = []
+
+# Persistence instrumentation, see get_persistence_stats()
+_stats = {
+    'saves': 0,
+    'mutations': 0,
+    'caller_seconds': 0.0,
+    'flushes': 0,
+    'flush_seconds': 0.0,
+    'flush_seconds_max': 0.0,
+    'last_flush_seconds': 0.0,
+    'shards_written': 0,
+    'bytes_written': 0,
+    'journal_appends': 0,
+    'journal_seconds': 0.0,
+    'journal_bytes': 0,
+}
+
+def _import_legacy_file():
+    """Stream bot_config.json into the store (first start after upgrading)"""
+    if config_store.get_meta('legacy_imported') or not os.path.exists(CONFIG_FILE):
+        return
+    if not config_store.is_empty() and not config_migrate.in_progress():
+        # The store is already in use; migrate explicitly with config_migrate.py --sync
+        return
+    for path in (CONFIG_FILE, CONFIG_BACKUP_FILE):
+        if not os.path.exists(path):
+            continue
         try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                _config_cache = config
-                return config
-        except (json.JSONDecodeError, EOFError):
-            print(f"⚠️  Warning: {CONFIG_FILE} corrupted, attempting to recover from backup")
-            if os.path.exists(CONFIG_BACKUP_FILE):
-                try:
-                    with open(CONFIG_BACKUP_FILE, 'r') as f:
-                        config = json.load(f)
-                        _config_cache = config
-                        return config
-                except:
-                    pass
-            print(f"❌ Config recovery failed, returning default config")
-            return DEFAULT_CONFIG.copy()
-    return DEFAULT_CONFIG.copy()
+            if not config_migrate.migrate(path, sync=path != CONFIG_FILE):
+                return
+        except ValueError as e:
+            print(f"⚠️  Warning: {path} corrupted ({e}), attempting to recover from backup")
+    print(f"❌ Config recovery failed, returning default config")
+
+def _reload_from_store():
+    """Replace the cache with the store contents (caller holds _cache_lock)"""
+    global _config_cache, _config_version, _store_data_version, _last_change_seq
+    _import_legacy_file()
+    data_version = config_store.get_data_version()
+    namespace_rows, entry_rows, last_seq = config_store.load_rows()
+
+    _namespace_hashes.clear()
+    _entry_hashes.clear()
+    _shard_versions.clear()
+    if namespace_rows:
+        config = {}
+        for namespace, value, version in namespace_rows:
+            if value is None:
+                config[namespace] = {}
+                _namespace_hashes[namespace] = None
+                _entry_hashes[namespace] = {}
+            else:
+                config[namespace] = json.loads(value)
+                _namespace_hashes[namespace] = hash(value)
+            _shard_versions[(namespace, None)] = version
+        for namespace, key, value, version in entry_rows:
+            section = config.get(namespace)
+            if isinstance(section, dict):
+                section[key] = json.loads(value)
+                _entry_hashes[namespace][key] = hash(value)
+                _shard_versions[(namespace, key)] = version
+    else:
+        config = copy.deepcopy(DEFAULT_CONFIG)
+
+    _config_cache = config
+    _store_data_version = data_version
+    _last_change_seq = last_seq
+    _config_version += 1
+    _call_on_loop(_notify_change, None, None)
+    return config
+
+def load_config():
+    """Return the in-memory config; only the first call touches the disk"""
+    config = _config_cache
+    if config is not None:
+        return config
+    with _flush_lock, _cache_lock:
+        if _config_cache is None:
+            _reload_from_store()
+        _ensure_flusher()
+        return _config_cache
+
+def add_change_listener(fn):
+    """Call fn(namespace, key) whenever a config entry changes, locally or in another process.
+
+    (None, None) means the config was reloaded from the store. (None, SAVED)
+    means save_config() replaced the document; the shards that actually
+    changed are reported one by one once the flush has diffed them, so
+    listeners with expensive caches can ignore it.
+    """
+    _change_listeners.append(fn)
+
+def _notify_change(namespace, key):
+    for fn in _change_listeners:
+        fn(namespace, key)
+
+def set_event_loop(loop):
+    """Apply changes from other processes on loop instead of the writer thread.
+
+    Cogs iterate the cached dicts without locks, so they must not change size
+    under them; with the bot's loop set, remote rows and their listeners run
+    there, between callbacks.
+    """
+    global _loop
+    _loop = loop
+
+def _call_on_loop(fn, *args):
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return fn(*args)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return fn(*args)
+    loop.call_soon_threadsafe(fn, *args)
+
+def get_config_version():
+    """Counter bumped whenever the cached config is saved or reloaded"""
+    return _config_version
 
 def save_config(config_data):
-    """Save config atomically to prevent corruption"""
-    global _config_cache
-    
+    """Mark config as changed; the background flusher writes it to the store"""
+    global _config_cache, _config_version, _dirty
+
+    start = time.perf_counter()
+    if _config_cache is None:
+        # Populate the stored-state hashes so the flush can diff against them
+        load_config()
+    with _cache_lock:
+        _config_cache = config_data
+        _config_version += 1
+        _dirty = True
+        _stats['saves'] += 1
+        _stats['caller_seconds'] += time.perf_counter() - start
+    _notify_change(None, SAVED)
+    _ensure_flusher()
+
+async def save_async(config_data=None):
+    """Save (if config_data is given) and wait until the writer thread has persisted it.
+
+    Serialization and fsync run on the writer thread, so awaiting this never
+    blocks the event loop.
+    """
+    if config_data is not None:
+        save_config(config_data)
+    await asyncio.wrap_future(request_flush())
+
+def request_flush():
+    """Ask the writer thread to persist pending changes now; returns a concurrent Future"""
+    future = concurrent.futures.Future()
+    with _cache_lock:
+        _flush_waiters.append(future)
+    _ensure_flusher()
+    _flush_wakeup.set()
+    return future
+
+def _key_lock(namespace, key):
+    return _key_locks[hash((namespace, key)) % _KEY_LOCK_STRIPES]
+
+def _mark_dirty(namespace, key, path=None):
+    global _config_version
+    with _cache_lock:
+        _dirty_keys.add((namespace, key))
+        _dirty_paths.setdefault((namespace, key), set()).add(
+            tuple(path[2:]) if path is not None and key is not None else ())
+        _stats['mutations'] += 1
+        if _journal is not None:
+            if path is None:
+                path = (namespace,) if key is None else (namespace, key)
+            _journal_pending.add(tuple(path))
+        _config_version += 1
+    _notify_change(namespace, key)
+    _ensure_flusher()
+
+def _shard_key(key):
+    return None if key is None else str(key)
+
+def mutate(namespace, key, fn, default=dict, _path=None):
+    """Apply fn to one config entry in place and schedule it for persistence.
+
+    The entry is config[namespace][str(key)], or config[namespace] itself if key
+    is None. Missing entries start as default() (or a copy of default). fn may
+    change the entry in place or return a replacement; a non-None return value
+    replaces it. Only this entry is rewritten on the next flush, and concurrent
+    mutations of the same entry are serialized. Returns the resulting entry.
+    """
+    start = time.perf_counter()
+    key = _shard_key(key)
+    with _key_lock(namespace, key):
+        cfg = load_config()
+        if key is None:
+            entry = cfg.get(namespace, _MISSING)
+        else:
+            section = cfg.get(namespace)
+            if not isinstance(section, dict):
+                section = cfg[namespace] = {}
+            entry = section.get(key, _MISSING)
+        if entry is _MISSING:
+            entry = default() if callable(default) else copy.deepcopy(default)
+        result = fn(entry)
+        if result is not None:
+            entry = result
+        if key is None:
+            cfg[namespace] = entry
+        else:
+            section[key] = entry
+        _mark_dirty(namespace, key, _path)
+        _stats['caller_seconds'] += time.perf_counter() - start
+        return entry
+
+def update_path(path, value):
+    """Set a nested config value, e.g. update_path(("user_xp", gid, uid), data).
+
+    Intermediate dicts are created as needed; only the affected entry
+    (path[0], path[1]) is rewritten on the next flush.
+    """
+    path = [str(part) for part in path]
+    namespace = path[0]
+    if len(path) == 1:
+        return mutate(namespace, None, lambda _: value, default=None)
+
+    def _set(entry):
+        if len(path) == 2:
+            return value
+        node = entry
+        for part in path[2:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+        node[path[-1]] = value
+
+    mutate(namespace, path[1], _set, _path=path)
+    return value
+
+def delete_path(path):
+    """Remove a nested config value if present. Returns True if something was removed."""
+    path = [str(part) for part in path]
+    namespace = path[0]
+    key = path[1] if len(path) > 1 else None
+    with _key_lock(namespace, key):
+        cfg = load_config()
+        if key is None:
+            removed = cfg.pop(namespace, _MISSING) is not _MISSING
+        else:
+            node = cfg.get(namespace)
+            for part in path[1:-1]:
+                node = node.get(part) if isinstance(node, dict) else None
+            removed = isinstance(node, dict) and node.pop(path[-1], _MISSING) is not _MISSING
+        if removed:
+            _mark_dirty(namespace, key, path)
+        return removed
+
+def get_path(path, default=None):
+    """Read a nested config value without copying"""
+    node = load_config()
+    for part in path:
+        if not isinstance(node, dict):
+            return default
+        node = node.get(str(part), _MISSING)
+        if node is _MISSING:
+            return default
+    return node
+
+def transact(namespace, key, fn, default=dict, retries=5):
+    """Read-modify-write one entry directly in the store with compare-and-swap.
+
+    For processes that do not keep the whole config in memory (the dashboard):
+    only this row is read and written, and if another process changes it in
+    between, fn is re-run on the fresh value instead of overwriting it. The bot
+    picks the change up from the change feed. Returns the written entry.
+    """
+    global _config_version
+    key = _shard_key(key)
+    for attempt in range(retries):
+        stored = config_store.load_row(namespace, key)
+        version = stored[1] if stored else 0
+        if stored is not None and stored[0] is not None:
+            entry = json.loads(stored[0])
+        else:
+            entry = default() if callable(default) else copy.deepcopy(default)
+        result = fn(entry)
+        if result is not None:
+            entry = result
+        payload = json.dumps(entry)
+        if key is None:
+            changes = ([(namespace, payload)], [], [], [])
+        else:
+            namespace_row = config_store.load_row(namespace, None)
+            marker = [] if namespace_row is not None and namespace_row[0] is None else [(namespace, None)]
+            changes = (marker, [(namespace, key, payload)], [], [])
+        try:
+            versions = config_store.write_changes(*changes, expected={(namespace, key): version}, origin=_origin)
+        except config_store.ConflictError:
+            continue
+        # Keep this process's cache (if any) in step, since the feed skips our own writes
+        with _flush_lock:
+            if _config_cache is not None:
+                _apply_hashes(changes)
+                _shard_versions.update(versions)
+                with _cache_lock:
+                    if key is None:
+                        _config_cache[namespace] = entry
+                    else:
+                        section = _config_cache.get(namespace)
+                        if not isinstance(section, dict):
+                            section = _config_cache[namespace] = {}
+                        _replace_entry(section, key, entry)
+                    _config_version += 1
+                _notify_change(namespace, key)
+        return entry
+    raise config_store.ConflictError([(namespace, key)])
+
+def _check_external_change():
+    """Apply rows other processes committed since we last looked at the change feed"""
+    global _store_data_version, _last_change_seq
+    if config_store.get_data_version() == _store_data_version:
+        return False
+    with _flush_lock:
+        data_version = config_store.get_data_version()
+        if data_version == _store_data_version or _dirty:
+            # A whole-document save is pending; its flush decides per row
+            return False
+        changes, first_seq = config_store.get_changes_since(_last_change_seq)
+        if changes and first_seq > _last_change_seq + 1:
+            # We fell behind the retained change log
+            with _cache_lock:
+                if _dirty or _dirty_keys:
+                    return False
+                _reload_from_store()
+            print("🔄 Reloaded config after missing part of the change log")
+            return True
+
+        remote = {}
+        for seq, namespace, key, version, origin in changes:
+            if origin != _origin:
+                remote[(namespace, key)] = version
+        # Read here, off the loop; the cache itself is changed on the loop
+        rows = [(row, config_store.load_row(*row)) for row, version in remote.items()
+                if not (version and _shard_versions.get(row, 0) >= version)]
+        _store_data_version = data_version
+        if changes:
+            _last_change_seq = changes[-1][0]
+    if rows:
+        _call_on_loop(_apply_remote_rows, rows)
+    return bool(rows)
+
+def _apply_remote_rows(rows):
+    global _config_version
+    # Locally dirty rows are reconciled by the compare-and-swap at flush time
+    applied = sum(_apply_remote_row(row, stored) for row, stored in rows)
+    if applied:
+        _config_version += 1
+        print(f"🔄 Reloaded {applied} config row(s) changed by another process")
+
+def _apply_remote_row(row, stored):
+    """Put one store row into the cache; stored is (json, version) or None if deleted"""
+    namespace, key = row
+    with _cache_lock:
+        cfg = _config_cache
+        if cfg is None or _dirty or row in _dirty_keys:
+            return False
+        if stored is not None and _shard_versions.get(row, 0) >= stored[1]:
+            # Our own flush overtook it while it waited for the loop
+            return False
+        if key is None:
+            if stored is None:
+                cfg.pop(namespace, None)
+                _namespace_hashes.pop(namespace, None)
+                _entry_hashes.pop(namespace, None)
+            elif stored[0] is None:
+                if not isinstance(cfg.get(namespace), dict):
+                    cfg[namespace] = {}
+                _namespace_hashes[namespace] = None
+                _entry_hashes.setdefault(namespace, {})
+            else:
+                cfg[namespace] = json.loads(stored[0])
+                _namespace_hashes[namespace] = hash(stored[0])
+        else:
+            section = cfg.get(namespace)
+            if not isinstance(section, dict):
+                section = cfg[namespace] = {}
+                _namespace_hashes[namespace] = None
+                _entry_hashes[namespace] = {}
+            hashes = _entry_hashes.setdefault(namespace, {})
+            if stored is None:
+                section.pop(key, None)
+                hashes.pop(key, None)
+            else:
+                _replace_entry(section, key, json.loads(stored[0]))
+                hashes[key] = hash(stored[0])
+        _shard_versions[row] = stored[1] if stored else 0
+    _notify_change(namespace, key)
+    return True
+
+def _replace_entry(section, key, value):
+    """Set section[key], updating an existing dict in place so cogs holding it see the change"""
+    current = section.get(key)
+    if isinstance(current, dict) and isinstance(value, dict):
+        current.clear()
+        current.update(value)
+    else:
+        section[key] = value
+
+def _set_at(node, path, value):
+    """Set (or delete, if value is _MISSING) a nested value, creating dicts on the way"""
+    for part in path[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            child = node[part] = {}
+        node = child
+    if value is _MISSING:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = value
+
+def _rebase_conflicts(data, conflicts, dirty_paths):
+    """Resolve rows another process changed while we had unflushed edits to them.
+
+    Edits made through update_path()/delete_path() are re-applied on top of
+    the other process's value. Whole-entry edits (mutate(), save_config())
+    cannot be merged, so ours win and the other write is overwritten.
+
+    Runs on the writer thread, so the merged entry replaces ours by reference
+    (same key, no resize) rather than being rewritten in place under readers.
+    """
+    for row in conflicts:
+        namespace, key = row
+        stored = config_store.load_row(namespace, key)
+        paths = dirty_paths.get(row, {()}) if dirty_paths is not None else {()}
+        section = data.get(namespace)
+        if key is not None and () not in paths and stored is not None and isinstance(section, dict):
+            with _key_lock(namespace, key):
+                local = section.get(key, _MISSING)
+                merged = json.loads(stored[0])
+                for path in paths:
+                    _set_at(merged, path, _get_at(local, path))
+                section[key] = merged
+            _entry_hashes.setdefault(namespace, {})[key] = hash(stored[0])
+            _call_on_loop(_notify_change, namespace, key)
+            print(f"🔀 Merged concurrent change to config row {namespace}/{key}")
+        else:
+            print(f"⚠️  Overwriting concurrent change to config row {namespace}/{key or ''}")
+        _shard_versions[row] = stored[1] if stored else 0
+
+def _expected_versions(changes):
+    namespaces, entries, deleted_entries, deleted_namespaces = changes
+    rows = ([(namespace, None) for namespace in deleted_namespaces]
+            + [(namespace, None) for namespace, _ in namespaces]
+            + list(deleted_entries)
+            + [(namespace, key) for namespace, key, _ in entries])
+    return {row: _shard_versions.get(row, 0) for row in rows}
+
+def _json_key(key):
+    return key if isinstance(key, str) else json.dumps(key).strip('"')
+
+def _diff_namespace(namespace, value, keys, changes):
+    """Add the changed shards of one namespace to the changes batch.
+
+    keys limits the diff to those entries of a dict namespace (None = all).
+    Snapshots are taken with list() and each shard is dumped by the C encoder,
+    so this is safe to run while the event loop keeps mutating the same dicts.
+    """
+    namespaces, entries, deleted_entries, deleted_namespaces = changes
+    stored = _namespace_hashes.get(namespace, _MISSING)
+    if value is _MISSING:
+        if stored is not _MISSING:
+            deleted_namespaces.append(namespace)
+    elif isinstance(value, dict):
+        if stored is not None:
+            # New namespace, or it used to hold a non-dict value
+            if stored is not _MISSING:
+                deleted_namespaces.append(namespace)
+            namespaces.append((namespace, None))
+            stored_entries = {}
+            keys = None
+        else:
+            stored_entries = _entry_hashes.get(namespace, {})
+        current = value
+        for key in (list(value) if keys is None else keys):
+            entry = value.get(key, _MISSING)
+            if not isinstance(key, str):
+                # JSON turns int keys (guild ids) into strings; store them that way
+                key = _json_key(key)
+                current = None
+            if entry is _MISSING:
+                if key in stored_entries:
+                    deleted_entries.append((namespace, key))
+                continue
+            payload = json.dumps(entry)
+            if stored_entries.get(key) != hash(payload):
+                entries.append((namespace, key, payload))
+        if keys is None:
+            if current is None:
+                current = {_json_key(key) for key in list(value)}
+            deleted_entries.extend((namespace, key) for key in list(stored_entries) if key not in current)
+    else:
+        payload = json.dumps(value)
+        if stored != hash(payload):
+            if stored is None:
+                deleted_namespaces.append(namespace)
+            namespaces.append((namespace, payload))
+
+def _collect_changes(data, dirty_keys=None):
+    """Diff data against the hashes of what is stored.
+
+    dirty_keys: (namespace, key) pairs touched by mutate()/update_path(), key
+    None for a whole namespace. Without it every namespace is diffed.
+    """
+    changes = ([], [], [], [])
+    if dirty_keys is None:
+        seen = set()
+        for namespace, value in list(data.items()):
+            seen.add(namespace)
+            _diff_namespace(namespace, value, None, changes)
+        changes[3].extend(namespace for namespace in list(_namespace_hashes) if namespace not in seen)
+        return changes
+
+    by_namespace = {}
+    for namespace, key in dirty_keys:
+        keys = by_namespace.setdefault(namespace, set())
+        if key is None or keys is None:
+            by_namespace[namespace] = None
+        else:
+            keys.add(key)
+    for namespace, keys in by_namespace.items():
+        _diff_namespace(namespace, data.get(namespace, _MISSING), keys, changes)
+    return changes
+
+def _apply_hashes(changes):
+    """Record a successfully written batch in the stored-state hashes"""
+    namespaces, entries, deleted_entries, deleted_namespaces = changes
+    for namespace in deleted_namespaces:
+        _namespace_hashes.pop(namespace, None)
+        _entry_hashes.pop(namespace, None)
+    for namespace, payload in namespaces:
+        if payload is None:
+            _namespace_hashes[namespace] = None
+            _entry_hashes.setdefault(namespace, {})
+        else:
+            _namespace_hashes[namespace] = hash(payload)
+    for namespace, key in deleted_entries:
+        _entry_hashes.get(namespace, {}).pop(key, None)
+    for namespace, key, payload in entries:
+        _entry_hashes[namespace][key] = hash(payload)
+
+def flush():
+    """Write pending config changes to the store now. Returns True if anything was written."""
+    with _flush_lock:
+        return _flush_locked()
+
+def _flush_locked():
+    """Snapshot dirty shards into the store and truncate the journal (caller holds _flush_lock)"""
+    global _dirty, _dirty_keys, _dirty_paths, _journal_pending
+
+    with _cache_lock:
+        if not (_dirty or _dirty_keys) or _config_cache is None:
+            return False
+        data = _config_cache
+        dirty_keys = None if _dirty else _dirty_keys
+        dirty_paths = None if _dirty else _dirty_paths
+        mutated = _dirty_keys
+        _dirty = False
+        _dirty_keys = set()
+        _dirty_paths = {}
+        # Everything pending for the journal is covered by this snapshot
+        _journal_pending = set()
+
+    start = time.perf_counter()
     try:
         # Update timestamp
-        config_data['last_saved'] = datetime.now().isoformat()
-        
-        # Create backup first
-        if os.path.exists(CONFIG_FILE):
+        data['last_saved'] = datetime.now().isoformat()
+        if dirty_keys is not None:
+            dirty_keys.add(('last_saved', None))
+        for attempt in range(3):
+            changes = _collect_changes(data, dirty_keys)
             try:
-                with open(CONFIG_FILE, 'r') as f:
-                    backup_data = json.load(f)
-                with open(CONFIG_BACKUP_FILE, 'w') as f:
-                    json.dump(backup_data, f, indent=4)
-            except:
-                pass
-        
-        # Create a temporary file in the same directory
-        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(CONFIG_FILE)), prefix='config_tmp_')
-        try:
-            with os.fdopen(fd, 'w') as f:
-                json.dump(config_data, f, indent=4)
-                f.flush()
-                os.fsync(f.fileno())
-            # Atomic rename
-            os.replace(temp_path, CONFIG_FILE)
-            _config_cache = config_data
-            print(f"✅ Config saved successfully at {config_data['last_saved']}")
-        except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+                # The journal is truncated below, so the commit must not be lost on power failure
+                versions = config_store.write_changes(*changes, expected=_expected_versions(changes), origin=_origin,
+                                                      durable=_journal is not None)
+                break
+            except config_store.ConflictError as e:
+                if attempt == 2:
+                    raise
+                _rebase_conflicts(data, e.conflicts, dirty_paths)
+        _apply_hashes(changes)
+        for namespace in changes[3]:
+            for row in [row for row in _shard_versions if row[0] == namespace]:
+                del _shard_versions[row]
+        _shard_versions.update(versions)
+        if _journal is not None:
+            _journal.seek(0)
+            _journal.truncate()
+            os.fsync(_journal.fileno())
+        if dirty_keys is None:
+            _notify_saved_changes(changes, mutated)
+        written = sum(len(part) for part in changes)
+        elapsed = time.perf_counter() - start
+        _record_flush(changes, written, elapsed)
+        print(f"✅ Config saved successfully at {data['last_saved']} ({written} shard(s) changed, {elapsed * 1000:.1f} ms)")
+        return True
     except Exception as e:
+        with _cache_lock:
+            _dirty = True
+            if dirty_keys is not None and _journal is not None:
+                _journal_pending |= {(namespace,) if key is None else (namespace, key) for namespace, key in dirty_keys}
         print(f"❌ Failed to save config: {e}")
+        return False
+
+def _notify_saved_changes(changes, mutated):
+    """Report the shards a save_config() diff found changed, except those mutate() already reported"""
+    namespaces, entries, deleted_entries, deleted_namespaces = changes
+    rows = ([(namespace, None) for namespace in deleted_namespaces]
+            + [(namespace, None) for namespace, _ in namespaces]
+            + list(deleted_entries)
+            + [(namespace, key) for namespace, key, _ in entries])
+    for namespace, key in rows:
+        if namespace != 'last_saved' and (namespace, key) not in mutated:
+            _call_on_loop(_notify_change, namespace, key)
+
+def _record_flush(changes, written, elapsed):
+    namespaces, entries, _, _ = changes
+    _stats['flushes'] += 1
+    _stats['flush_seconds'] += elapsed
+    _stats['last_flush_seconds'] = elapsed
+    _stats['flush_seconds_max'] = max(_stats['flush_seconds_max'], elapsed)
+    _stats['shards_written'] += written
+    _stats['bytes_written'] += (sum(len(payload) for _, payload in namespaces if payload)
+                                + sum(len(payload) for _, _, payload in entries))
+
+def get_persistence_stats():
+    """Counters describing config persistence cost.
+
+    caller_seconds is what save_config()/mutate() cost the event loop; each
+    flush_seconds sample is serialization + write time that, before the writer
+    thread, the loop spent blocked inside every single save_config() call.
+    """
+    stats = dict(_stats)
+    changes = stats['saves'] + stats['mutations']
+    stats['avg_caller_us'] = stats['caller_seconds'] / changes * 1e6 if changes else 0.0
+    stats['avg_flush_ms'] = stats['flush_seconds'] / stats['flushes'] * 1000 if stats['flushes'] else 0.0
+    stats['changes_per_flush'] = changes / stats['flushes'] if stats['flushes'] else 0.0
+    stats['dirty'] = bool(_dirty or _dirty_keys)
+    stats['journal_enabled'] = _journal is not None
+    return stats
+
+def _get_at(data, path):
+    node = data
+    for part in path:
+        if not isinstance(node, dict):
+            return _MISSING
+        node = node.get(part, _MISSING)
+        if node is _MISSING:
+            break
+    return node
+
+def _append_journal():
+    """Append the current value at every path mutated since the last append.
+
+    Records are [path, value] lines, or [path] for a removed value. Paths are as
+    precise as the mutation (e.g. one user's XP for update_path). All values are
+    read at the same moment, so the order of records within a batch does not
+    matter on replay. Returns the number of records written.
+    """
+    global _journal_pending
+
+    with _flush_lock:
+        with _cache_lock:
+            if _journal is None or not _journal_pending:
+                return 0
+            pending, _journal_pending = _journal_pending, set()
+            data = _config_cache
+
+        try:
+            lines = []
+            for path in pending:
+                value = _get_at(data, path)
+                record = [path] if value is _MISSING else [path, value]
+                lines.append(json.dumps(record, separators=(',', ':')))
+            start = time.perf_counter()
+            payload = '\n'.join(lines) + '\n'
+            _journal.write(payload)
+            _journal.flush()
+            os.fsync(_journal.fileno())
+            _stats['journal_appends'] += 1
+            _stats['journal_seconds'] += time.perf_counter() - start
+            _stats['journal_bytes'] += len(payload)
+            return len(lines)
+        except Exception as e:
+            with _cache_lock:
+                _journal_pending |= pending
+            print(f"❌ Failed to append config journal: {e}")
+            return 0
+
+def _replay_journal():
+    """Apply journal records on top of the loaded snapshot (caller holds both locks)"""
+    if not os.path.exists(CONFIG_JOURNAL_FILE):
+        return 0
+    cfg = _config_cache
+    count = 0
+    with open(CONFIG_JOURNAL_FILE, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn write from a crash; nothing after it was acknowledged
+                print(f"⚠️  Ignoring truncated record at the end of {CONFIG_JOURNAL_FILE}")
+                break
+            path = record[0]
+            namespace = path[0]
+            key = path[1] if len(path) > 1 else None
+            node = cfg
+            for part in path[:-1]:
+                child = node.get(part)
+                if not isinstance(child, dict):
+                    child = node[part] = {}
+                node = child
+            if len(record) > 1:
+                node[path[-1]] = record[1]
+            else:
+                node.pop(path[-1], None)
+            _dirty_keys.add((namespace, key))
+            count += 1
+    return count
+
+def enable_journal(path=None):
+    """Journal mutations to disk between snapshots, replaying any journal left by a crash.
+
+    Only one process may journal to a given file; the bot calls this at startup.
+    Whole-document save_config() calls are not journaled and become durable at
+    the next snapshot.
+    """
+    global _journal, CONFIG_JOURNAL_FILE
+    load_config()
+    with _flush_lock:
+        if _journal is not None:
+            return
+        if path:
+            CONFIG_JOURNAL_FILE = path
+        with _cache_lock:
+            replayed = _replay_journal()
+        if replayed:
+            print(f"🔁 Replayed {replayed} record(s) from {CONFIG_JOURNAL_FILE}")
+        _journal = open(CONFIG_JOURNAL_FILE, 'a')
+        # Fold the replayed records into the snapshot so the journal starts empty
+        _flush_locked()
+    _ensure_flusher()
+
+def _resolve_waiters(waiters):
+    for future in waiters:
+        if not future.done():
+            future.set_result(None)
+
+def _flush_loop():
+    """Writer thread: journal appends, snapshots, save_async() requests and reload polling"""
+    global _flush_waiters
+    last_flush = time.monotonic()
+    tick = min(CONFIG_FLUSH_INTERVAL, CONFIG_RELOAD_INTERVAL, CONFIG_JOURNAL_INTERVAL)
+    while not _flusher_stop.is_set():
+        _flush_wakeup.wait(tick)
+        _flush_wakeup.clear()
+        if _flusher_stop.is_set():
+            # shutdown() does the final append and flush and resolves the waiters
+            break
+        with _cache_lock:
+            waiters, _flush_waiters = _flush_waiters, []
+        try:
+            since_flush = time.monotonic() - last_flush
+            if _journal is not None:
+                _append_journal()
+                due = (since_flush >= CONFIG_COMPACT_INTERVAL
+                       or (_dirty and (waiters or since_flush >= CONFIG_FLUSH_INTERVAL))
+                       or _journal_size() >= CONFIG_JOURNAL_MAX_BYTES)
+            else:
+                due = waiters or since_flush >= CONFIG_FLUSH_INTERVAL
+            # With the journal enabled, appended records are already durable
+            if due:
+                last_flush = time.monotonic()
+                flush()
+            _resolve_waiters(waiters)
+            _check_external_change()
+        except Exception as e:
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            print(f"❌ Config background task error: {e}")
+
+def _journal_size():
+    with _flush_lock:
+        return 0 if _journal is None else _journal.tell()
+
+def _ensure_flusher():
+    """Start the background flush/reload thread on first use"""
+    global _flusher_thread
+    if _flusher_thread is not None and _flusher_thread.is_alive():
+        return
+    with _cache_lock:
+        if _flusher_thread is not None and _flusher_thread.is_alive():
+            return
+        _flusher_stop.clear()
+        _flusher_thread = threading.Thread(target=_flush_loop, name='ConfigFlusher', daemon=True)
+        _flusher_thread.start()
+
+def shutdown():
+    """Stop the flusher thread and write any pending changes"""
+    global _journal, _flush_waiters
+    _flusher_stop.set()
+    _flush_wakeup.set()
+    thread = _flusher_thread
+    if thread is not None and thread is not threading.current_thread():
+        # Let a flush or reload in progress finish before the journal is closed
+        thread.join(timeout=30)
+    _append_journal()
+    flush()
+    with _cache_lock:
+        waiters, _flush_waiters = _flush_waiters, []
+    _resolve_waiters(waiters)
+    with _flush_lock:
+        if _journal is not None:
+            _journal.close()
+            _journal = None
+
+atexit.register(shutdown)
 
 def get_config():
     return load_config()
 
 def update_config(key, value):
-    config = load_config()
-    config[key] = value
-    save_config(config)
-    return config
+    update_path((key,), value)
+    return load_config()
 
 def get_guild_prefix(guild_id):
     """Get the prefix for a specific guild"""
@@ -108,22 +945,16 @@ def get_guild_prefix(guild_id):
 
 def set_guild_prefix(guild_id, prefix):
     """Set the prefix for a specific guild"""
-    config = load_config()
-    if 'guild_prefixes' not in config:
-        config['guild_prefixes'] = {}
-    config['guild_prefixes'][str(guild_id)] = prefix
-    save_config(config)
+    update_path(('guild_prefixes', guild_id), prefix)
     return prefix
 def refresh_config_cache():
-    """Force reload config from disk to sync with external changes (e.g., dashboard updates)"""
-    global _config_cache
-    with _cache_lock:
-        _config_cache = None  # Clear cache
-        return load_config()  # Reload from disk
+    """Force reload config from the store to sync with external changes (e.g., dashboard updates)"""
+    with _flush_lock, _cache_lock:
+        if _dirty or _dirty_keys:
+            # Unflushed local changes are authoritative until written
+            return _config_cache
+        return _reload_from_store()
 
 def get_cached_config():
     """Get config from cache without reloading (fast access)"""
-    global _config_cache
-    if _config_cache is None:
-        return load_config()
-    return _config_cache
\ No newline at end of file
+    return load_config()
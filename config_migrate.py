@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Streaming migration of bot_config.json into the config store (bot_config.db)
+
+The file is read incrementally: only one namespace entry (usually one guild's
+data) is decoded at a time, so memory stays flat however large the file is.
+Dict namespaces (warnings, user_xp, economy, giveaways, ...) are written one
+row per entry, everything else as a single namespace row, in batched
+transactions. Progress is checkpointed in the store, so an interrupted run
+resumes where it stopped, and entry counts are verified at the end.
+
+Run: python config_migrate.py [--file bot_config.json]
+     python config_migrate.py --sync     # re-read the file, write only what differs
+     python config_migrate.py --verify   # only compare entry counts
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import config_store
+
+CHUNK_SIZE = 1 << 20
+BATCH_ROWS = 500
+BATCH_BYTES = 4 << 20
+ORIGIN = 'config_migrate'
+PROGRESS_KEY = 'migrate_progress'
+
+# Marks the start of a dict namespace in iter_legacy()
+SECTION = object()
+
+class _Stream:
+    """Incremental reader over a JSON text file"""
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        # Read at least as much as is buffered, so a huge value is re-decoded
+        # only O(log n) times
+        chunk = self._file.read(max(self._chunk_size, len(self._buf) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self._offset += self._pos
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message):
+        return ValueError(f"{message} at character {self._offset + self._pos}")
+
+    def peek(self):
+        """Next non-whitespace character, '' at end of file"""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self._error(f"Expected {char!r}")
+        self._pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise self._error(e.msg) from None
+            self._fill()
+
+def iter_legacy(f):
+    """Yield (namespace, key, value) from a config file without loading it whole.
+
+    Dict namespaces yield (namespace, SECTION, None) first, then one item per
+    entry; other namespaces yield (namespace, None, value).
+    """
+    stream = _Stream(f)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        namespace = stream.value()
+        stream.expect(':')
+        if stream.peek() == '{':
+            stream.expect('{')
+            yield namespace, SECTION, None
+            if stream.peek() != '}':
+                while True:
+                    key = stream.value()
+                    stream.expect(':')
+                    yield namespace, key, stream.value()
+                    if stream.peek() != ',':
+                        break
+                    stream.expect(',')
+            stream.expect('}')
+        else:
+            yield namespace, None, stream.value()
+        if stream.peek() != ',':
+            break
+        stream.expect(',')
+    stream.expect('}')
+
+def _file_signature(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def _load_progress(path):
+    """Checkpoint of an interrupted run of this same file, or None"""
+    raw = config_store.get_meta(PROGRESS_KEY)
+    if raw is None:
+        return None
+    progress = json.loads(raw)
+    if progress.get('file') != _file_signature(path):
+        return None
+    return progress
+
+def in_progress():
+    """True if a migration was started and has not completed"""
+    return config_store.get_meta(PROGRESS_KEY) is not None
+
+class _Batch:
+    """Rows waiting to be written in one transaction"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.namespaces = []
+        self.entries = []
+        self.deleted_entries = []
+        self.deleted_namespaces = []
+        self.size = 0
+
+    def __len__(self):
+        return len(self.namespaces) + len(self.entries) + len(self.deleted_entries) + len(self.deleted_namespaces)
+
+    def write(self):
+        config_store.write_changes(self.namespaces, self.entries, self.deleted_entries,
+                                   self.deleted_namespaces, origin=ORIGIN)
+        self.clear()
+
+def migrate(path, sync=False, log=print):
+    """Stream path into the store and verify entry counts.
+
+    Without sync an interrupted run of the same file resumes from its
+    checkpoint. With sync every entry is compared with the store and only
+    differences are written, including deletions of entries no longer in
+    the file; use it to catch up while an old bot version still writes the
+    file. Returns the list of count mismatches (empty on success).
+    """
+    start = time.perf_counter()
+    progress = None if sync else _load_progress(path)
+    if progress is None:
+        progress = {'file': _file_signature(path), 'done': {}}
+    elif progress['done']:
+        log(f"🔁 Resuming migration of {path} ({sum(progress['done'].values())} entries already written)")
+    done = progress['done']
+
+    counts = {}
+    stored = None
+    seen = None
+    written = 0
+    batch = _Batch()
+
+    def commit():
+        nonlocal written
+        written += len(batch)
+        batch.write()
+        progress['done'] = dict(counts)
+        config_store.set_meta(PROGRESS_KEY, json.dumps(progress))
+
+    def end_section(namespace):
+        # Entries of this namespace that vanished from the file
+        if stored is not None:
+            batch.deleted_entries.extend((namespace, key) for key in stored if key not in seen)
+
+    current = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for namespace, key, value in iter_legacy(f):
+            if namespace != current:
+                if current is not None:
+                    end_section(current)
+                current = namespace
+                stored = seen = None
+
+            if key is SECTION:
+                counts[namespace] = 0
+                row = config_store.load_row(namespace, None) if sync else None
+                if not sync or row is None or row[0] is not None:
+                    batch.namespaces.append((namespace, None))
+                if sync:
+                    stored = {k: hash(v) for k, v in config_store.iter_entries(namespace)}
+                    seen = set()
+            elif key is None:
+                payload = json.dumps(value)
+                row = config_store.load_row(namespace, None)
+                if row is not None and row[0] is None:
+                    # Used to be a dict namespace
+                    batch.deleted_namespaces.append(namespace)
+                if not sync or row is None or row[0] != payload:
+                    batch.namespaces.append((namespace, payload))
+                    batch.size += len(payload)
+            else:
+                counts[namespace] += 1
+                if counts[namespace] <= done.get(namespace, 0):
+                    continue
+                payload = json.dumps(value)
+                if sync:
+                    seen.add(key)
+                    if stored.get(key) == hash(payload):
+                        continue
+                batch.entries.append((namespace, key, payload))
+                batch.size += len(payload)
+
+            if len(batch) >= BATCH_ROWS or batch.size >= BATCH_BYTES:
+                commit()
+        if current is not None:
+            end_section(current)
+    commit()
+
+    mismatches = verify(counts, log=log)
+    if mismatches:
+        log(f"❌ Migration of {path} wrote {written} row(s) but {len(mismatches)} namespace(s) do not match")
+        return mismatches
+    config_store.delete_meta(PROGRESS_KEY)
+    config_store.set_meta('legacy_imported', datetime.now().isoformat())
+    entries = sum(counts.values())
+    log(f"✅ Migrated {path} into {config_store.STORE_FILE}: {entries} entries in {len(counts)} sharded "
+        f"namespace(s), {written} row(s) written, {time.perf_counter() - start:.1f}s")
+    return []
+
+def count_legacy(path):
+    """Entries per dict namespace in the file, streamed"""
+    counts = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for namespace, key, _ in iter_legacy(f):
+            if key is SECTION:
+                counts[namespace] = 0
+            elif key is not None:
+                counts[namespace] += 1
+    return counts
+
+def verify(counts, log=print):
+    """Compare expected entry counts with the store; returns [(namespace, expected, stored)]"""
+    stored = config_store.count_entries()
+    mismatches = [(namespace, expected, stored.get(namespace, 0))
+                  for namespace, expected in counts.items() if stored.get(namespace, 0) != expected]
+    for namespace, expected, actual in mismatches:
+        log(f"⚠️  {namespace}: {expected} entries in the file, {actual} in the store")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--file', default='bot_config.json')
+    parser.add_argument('--store', default=config_store.STORE_FILE)
+    parser.add_argument('--sync', action='store_true', help='write only entries that differ, delete removed ones')
+    parser.add_argument('--verify', action='store_true', help='only compare entry counts')
+    args = parser.parse_args()
+
+    config_store.STORE_FILE = args.store
+    if not os.path.exists(args.file):
+        print(f"❌ {args.file} not found")
+        sys.exit(1)
+    if args.verify:
+        mismatches = verify(count_legacy(args.file))
+        if not mismatches:
+            print(f"✅ Entry counts of {args.file} match {config_store.STORE_FILE}")
+    else:
+        mismatches = migrate(args.file, sync=args.sync)
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
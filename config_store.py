@@ -0,0 +1,244 @@
+"""
+Sharded SQLite persistence for the bot config
+Each top-level config key is a namespace. Dict namespaces (warnings, user_xp,
+economy, ...) are stored one row per entry, usually one per guild, so a
+change only rewrites the rows that actually changed.
+
+Every row carries a version used for compare-and-swap writes, and every
+write is recorded in config_changes so other processes (the bot and the
+dashboard) can reload just the rows that changed.
+"""
+import sqlite3
+from threading import RLock
+
+STORE_FILE = 'bot_config.db'
+store_lock = RLock()
+
+# How many change records to keep; a reader that falls further behind reloads everything
+CHANGE_LOG_RETENTION = 10000
+
+class ConflictError(Exception):
+    """A compare-and-swap write found rows changed by someone else"""
+    def __init__(self, conflicts):
+        super().__init__(f"{len(conflicts)} config row(s) changed concurrently")
+        # (namespace, key) pairs; key is None for namespace rows
+        self.conflicts = conflicts
+
+_conn = None
+
+def _get_connection():
+    """Return the shared connection, opening it on first use (caller holds store_lock)"""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(STORE_FILE, check_same_thread=False, isolation_level=None)
+        _conn.execute('PRAGMA journal_mode=WAL')
+        _conn.execute('PRAGMA synchronous=NORMAL')
+        _init_schema(_conn)
+    return _conn
+
+def _init_schema(conn):
+    # Non-dict namespaces keep their JSON value here; dict namespaces have
+    # value NULL and their entries in config_entries
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config_namespaces (
+            namespace TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config_entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (namespace, key)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            key TEXT,
+            version INTEGER NOT NULL,
+            origin TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Stores created before versioning
+    for table in ('config_namespaces', 'config_entries'):
+        try:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        except sqlite3.OperationalError:
+            pass
+
+def close_store():
+    """Close the shared connection (a new one is opened on next use)"""
+    global _conn
+    with store_lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+def get_meta(key, default=None):
+    with store_lock:
+        row = _get_connection().execute('SELECT value FROM config_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+def set_meta(key, value):
+    with store_lock:
+        _get_connection().execute('INSERT OR REPLACE INTO config_meta (key, value) VALUES (?, ?)', (key, value))
+
+def delete_meta(key):
+    with store_lock:
+        _get_connection().execute('DELETE FROM config_meta WHERE key = ?', (key,))
+
+def is_empty():
+    """True if no namespace has ever been written"""
+    with store_lock:
+        return _get_connection().execute('SELECT 1 FROM config_namespaces LIMIT 1').fetchone() is None
+
+def load_rows():
+    """Return (namespace_rows, entry_rows, last_change_seq); rows carry raw JSON and version"""
+    with store_lock:
+        conn = _get_connection()
+        conn.execute('BEGIN')
+        try:
+            namespace_rows = conn.execute('SELECT namespace, value, version FROM config_namespaces').fetchall()
+            entry_rows = conn.execute('SELECT namespace, key, value, version FROM config_entries').fetchall()
+            seq = _last_seq(conn)
+        finally:
+            conn.execute('COMMIT')
+        return namespace_rows, entry_rows, seq
+
+def load_row(namespace, key):
+    """Return (json, version) of one row, or None if it does not exist.
+
+    key None reads the namespace row (json is None for sharded namespaces).
+    """
+    with store_lock:
+        conn = _get_connection()
+        if key is None:
+            return conn.execute('SELECT value, version FROM config_namespaces WHERE namespace = ?',
+                                (namespace,)).fetchone()
+        return conn.execute('SELECT value, version FROM config_entries WHERE namespace = ? AND key = ?',
+                            (namespace, key)).fetchone()
+
+def load_entries(namespace, keys):
+    """Return {key: json} of the given entries of a sharded namespace (missing ones are left out)"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    with store_lock:
+        rows = _get_connection().execute(
+            f'SELECT key, value FROM config_entries WHERE namespace = ? AND key IN ({",".join("?" * len(keys))})',
+            [namespace] + keys).fetchall()
+        return dict(rows)
+
+def iter_entries(namespace):
+    """Return (key, json) of every entry of a sharded namespace"""
+    with store_lock:
+        return _get_connection().execute('SELECT key, value FROM config_entries WHERE namespace = ?',
+                                         (namespace,)).fetchall()
+
+def count_entries():
+    """Return {namespace: number of entries} for sharded namespaces"""
+    with store_lock:
+        rows = _get_connection().execute('SELECT namespace, COUNT(*) FROM config_entries GROUP BY namespace').fetchall()
+        return dict(rows)
+
+def _last_seq(conn):
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM config_changes').fetchone()[0]
+
+def _row_version(conn, namespace, key):
+    row = load_row(namespace, key)
+    return row[1] if row else 0
+
+def write_changes(namespaces=(), entries=(), deleted_entries=(), deleted_namespaces=(),
+                  expected=None, origin=None, durable=False):
+    """Apply one batch of changes in a single transaction
+
+    namespaces: (namespace, json_or_None) - None marks a sharded dict namespace
+    entries: (namespace, key, json) rows of sharded namespaces
+    deleted_entries: (namespace, key) rows to drop
+    deleted_namespaces: namespace names to drop with all their entries
+    expected: {(namespace, key): version} the caller last saw; rows whose
+        current version differs raise ConflictError and nothing is written.
+        Rows not listed are written unconditionally.
+    origin: identifies the writer in config_changes
+    durable: fsync the WAL on commit (synchronous=FULL), so the batch survives
+        power loss once this returns; NORMAL commits may be rolled back
+
+    Returns {(namespace, key): new_version} for every row written or deleted
+    (deleted rows map to 0).
+    """
+    with store_lock:
+        conn = _get_connection()
+        if durable:
+            # Cannot be changed inside a transaction
+            conn.execute('PRAGMA synchronous=FULL')
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            touched = ([(namespace, None) for namespace in deleted_namespaces]
+                       + [(namespace, None) for namespace, _ in namespaces]
+                       + list(deleted_entries)
+                       + [(namespace, key) for namespace, key, _ in entries])
+            current = {row: _row_version(conn, *row) for row in touched}
+            if expected:
+                conflicts = [row for row in current if row in expected and current[row] != expected[row]]
+                if conflicts:
+                    raise ConflictError(conflicts)
+
+            versions = {}
+            for namespace in deleted_namespaces:
+                conn.execute('DELETE FROM config_entries WHERE namespace = ?', (namespace,))
+                conn.execute('DELETE FROM config_namespaces WHERE namespace = ?', (namespace,))
+                versions[(namespace, None)] = 0
+            for namespace, value in namespaces:
+                version = current[(namespace, None)] + 1
+                conn.execute('INSERT OR REPLACE INTO config_namespaces (namespace, value, version) VALUES (?, ?, ?)',
+                             (namespace, value, version))
+                versions[(namespace, None)] = version
+            for namespace, key in deleted_entries:
+                conn.execute('DELETE FROM config_entries WHERE namespace = ? AND key = ?', (namespace, key))
+                versions[(namespace, key)] = 0
+            for namespace, key, value in entries:
+                version = current[(namespace, key)] + 1
+                conn.execute('INSERT OR REPLACE INTO config_entries (namespace, key, value, version) VALUES (?, ?, ?, ?)',
+                             (namespace, key, value, version))
+                versions[(namespace, key)] = version
+
+            conn.executemany('INSERT INTO config_changes (namespace, key, version, origin) VALUES (?, ?, ?, ?)',
+                             [(namespace, key, version, origin) for (namespace, key), version in versions.items()])
+            seq = _last_seq(conn)
+            if seq % 1000 < len(versions):
+                conn.execute('DELETE FROM config_changes WHERE seq <= ?', (seq - CHANGE_LOG_RETENTION,))
+            conn.execute('COMMIT')
+            return versions
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            if durable:
+                conn.execute('PRAGMA synchronous=NORMAL')
+
+def get_changes_since(seq):
+    """Return (changes, first_seq): changes are (seq, namespace, key, version, origin) after seq.
+
+    If first_seq > seq + 1 records were pruned and the caller missed changes.
+    """
+    with store_lock:
+        conn = _get_connection()
+        changes = conn.execute('SELECT seq, namespace, key, version, origin FROM config_changes '
+                               'WHERE seq > ? ORDER BY seq', (seq,)).fetchall()
+        first_seq = conn.execute('SELECT COALESCE(MIN(seq), 0) FROM config_changes').fetchone()[0]
+        return changes, first_seq
+
+def get_data_version():
+    """Changes whenever another connection commits to the store"""
+    with store_lock:
+        return _get_connection().execute('PRAGMA data_version').fetchone()[0]
@@ -4,12 +4,17 @@ Database management for guild settings and user sessions
 import sqlite3
 import json
 import os
+import time
 from datetime import datetime, timezone
 from threading import Lock
 
 DB_FILE = 'dashboard.db'
 db_lock = Lock()
 
+# Seconds get_cached_guild_settings() serves a row before reading it again
+SETTINGS_CACHE_TTL = 60
+_settings_cache = {}  # guild_id -> (read_at, settings)
+
 def init_db():
     """Initialize SQLite database with schema"""
     with db_lock:
@@ -112,13 +117,41 @@ def get_guild_settings(guild_id):
                 'updated_at': row['updated_at']
             }
         
-        return {
-            'guild_id': guild_id,
-            'moderation': {}, 'automod': {}, 'logging': {}, 'welcome': {},
-            'bad_words': [], 'whitelisted_links': [], 'custom_commands': {},
-            'role_settings': {}, 'music_settings': {}, 'games_settings': {},
-            'language': 'en', 'prefix': '!'
-        }
+        return _default_guild_settings(guild_id)
+
+def _default_guild_settings(guild_id):
+    return {
+        'guild_id': guild_id,
+        'moderation': {}, 'automod': {}, 'logging': {}, 'welcome': {},
+        'bad_words': [], 'whitelisted_links': [], 'custom_commands': {},
+        'role_settings': {}, 'music_settings': {}, 'games_settings': {},
+        'language': 'en', 'prefix': '!'
+    }
+
+def get_cached_guild_settings(guild_id):
+    """get_guild_settings() for the message hot path, re-read at most every SETTINGS_CACHE_TTL.
+
+    The returned dict is shared and must not be modified. While the row is
+    unchanged the same dict is returned, so callers can cache what they
+    derive from it by identity.
+    """
+    guild_id = str(guild_id)
+    cached = _settings_cache.get(guild_id)
+    now = time.monotonic()
+    if cached is not None and now - cached[0] < SETTINGS_CACHE_TTL:
+        return cached[1]
+    try:
+        settings = get_guild_settings(guild_id)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not read dashboard settings of guild {guild_id}: {e}")
+        settings = cached[1] if cached is not None else _default_guild_settings(guild_id)
+    if cached is not None and cached[1] == settings:
+        settings = cached[1]
+    _settings_cache[guild_id] = (now, settings)
+    return settings
+
+def invalidate_cached_guild_settings(guild_id):
+    _settings_cache.pop(str(guild_id), None)
 
 def update_guild_settings(guild_id, settings_dict):
     """Update guild settings"""
@@ -150,6 +183,7 @@ def update_guild_settings(guild_id, settings_dict):
         
         conn.commit()
         conn.close()
+    invalidate_cached_guild_settings(guild_id)
 
 def save_user_session(user_id, access_token, refresh_token, username, avatar_url, expires_in):
     """Save user session from Discord OAuth"""
@@ -0,0 +1,84 @@
+"""
+Typed per-guild settings
+Each cog registers a frozen, slotted dataclass for its config namespace. A
+guild's settings object is built once from its config entry and shared until
+that entry changes, so listeners read attributes of a cached object instead
+of rebuilding default dicts on every event. Guilds without an entry share a
+single defaults instance.
+"""
+from dataclasses import fields
+from types import MappingProxyType
+import config
+
+_registry = {}   # namespace -> settings type
+_cache = {}      # namespace -> {guild key: settings object}
+_defaults = {}   # namespace -> shared defaults instance
+_generation = 0  # bumped on invalidation, so a build racing a change is not cached
+
+def register(namespace):
+    """Class decorator registering a frozen dataclass as the settings type of a namespace"""
+    def wrap(cls):
+        cls.namespace = namespace
+        cls.field_names = tuple(f.name for f in fields(cls))
+        _registry[namespace] = cls
+        _cache[namespace] = {}
+        _defaults[namespace] = cls()
+        return cls
+    return wrap
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+def build(cls, entry):
+    """Build a settings object from a config entry, ignoring unknown keys"""
+    if not isinstance(entry, dict):
+        return _defaults[cls.namespace]
+    return cls(**{name: _freeze(entry[name]) for name in cls.field_names if name in entry})
+
+def get_settings(namespace, guild_id):
+    """Return the cached, read-only settings of a guild"""
+    key = str(guild_id)
+    guilds = _cache[namespace]
+    settings = guilds.get(key)
+    if settings is None:
+        generation = _generation
+        settings = build(_registry[namespace], config.get_path((namespace, key)))
+        if generation == _generation:
+            guilds[key] = settings
+    return settings
+
+def default_dict(cls):
+    """A fresh, mutable dict of a settings type's defaults (for commands that edit settings)"""
+    defaults = _defaults[cls.namespace]
+    return {name: _thaw(getattr(defaults, name)) for name in cls.field_names}
+
+def invalidate(namespace=None, key=None):
+    """Drop cached settings; called by config whenever an entry changes"""
+    global _generation
+    if namespace is None:
+        for guilds in _cache.values():
+            guilds.clear()
+    elif namespace not in _cache:
+        return
+    elif key is None:
+        _cache[namespace].clear()
+    else:
+        _cache[namespace].pop(key, None)
+    _generation += 1
+
+def get_stats():
+    """Number of cached settings objects per namespace"""
+    return {namespace: len(guilds) for namespace, guilds in _cache.items()}
+
+config.add_change_listener(invalidate)
@@ -0,0 +1,178 @@
+"""
+Shared HTTP clients for outbound calls
+One aiohttp session per upstream (OpenAI, meme API, Discord webhooks, ...)
+lives for the whole run, so connections are kept alive and reused instead of
+paying TCP and TLS setup on every call. Each upstream has its own connection
+limits, default timeout and retry policy, and keeps metrics: requests,
+errors, retries, latency percentiles and how often a pooled connection was
+reused.
+
+Usage:
+    async with http_clients.request('openai', 'POST', url, json=data) as resp:
+        ...
+    session = http_clients.get_session('discord_webhook')
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+# Statuses worth another attempt; everything else is returned to the caller
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+LATENCY_SAMPLES = 512
+
+class Upstream:
+    """Settings and metrics of one upstream; created by register()"""
+    def __init__(self, name, limit=20, limit_per_host=10, timeout=15, retries=2, backoff=0.25,
+                 keepalive_timeout=60):
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.stats = {'requests': 0, 'errors': 0, 'retries': 0, 'status_4xx': 0, 'status_5xx': 0,
+                      'connections_created': 0, 'connections_reused': 0, 'seconds': 0.0}
+
+    def _trace_config(self):
+        trace = aiohttp.TraceConfig()
+        stats = self.stats
+
+        async def created(session, context, params):
+            stats['connections_created'] += 1
+
+        async def reused(session, context, params):
+            stats['connections_reused'] += 1
+
+        trace.on_connection_create_end.append(created)
+        trace.on_connection_reuseconn.append(reused)
+        return trace
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                 trace_configs=[self._trace_config()])
+        return self.session
+
+    def delay(self, attempt, response=None):
+        """Seconds before retry number attempt: Retry-After if given, else exponential backoff with full jitter"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.timeout)
+                except ValueError:
+                    pass
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+_upstreams = {}
+_request_listeners = []
+
+def register(name, **settings):
+    """Configure an upstream (see Upstream for the settings); call before its first request"""
+    upstream = _upstreams.get(name)
+    if upstream is not None and upstream.session is not None:
+        return upstream
+    upstream = _upstreams[name] = Upstream(name, **settings)
+    return upstream
+
+def _upstream(name):
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        upstream = _upstreams[name] = Upstream(name)
+    return upstream
+
+def add_request_listener(fn):
+    """Call fn(upstream_name, seconds) after every attempt, failed ones included"""
+    _request_listeners.append(fn)
+
+def _notify_request(name, seconds):
+    for fn in _request_listeners:
+        fn(name, seconds)
+
+def get_session(name):
+    """The shared session of an upstream, for APIs that take a session (discord.Webhook, ...)"""
+    return _upstream(name).get_session()
+
+@asynccontextmanager
+async def request(name, method, url, retries=None, **kwargs):
+    """session.request() on the upstream's shared session, with retries.
+
+    Connection errors, timeouts and RETRY_STATUSES are retried up to the
+    upstream's retries (or the retries given); the last response is yielded
+    whatever its status, the last exception is raised.
+    """
+    upstream = _upstream(name)
+    stats = upstream.stats
+    attempts = (upstream.retries if retries is None else retries) + 1
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        start = time.perf_counter()
+        stats['requests'] += 1
+        try:
+            response = await upstream.get_session().request(method, url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats['errors'] += 1
+            _notify_request(name, time.perf_counter() - start)
+            if last:
+                raise
+            stats['retries'] += 1
+            await asyncio.sleep(upstream.delay(attempt))
+            continue
+        elapsed = time.perf_counter() - start
+        stats['seconds'] += elapsed
+        upstream.latencies.append(elapsed)
+        _notify_request(name, elapsed)
+        if response.status >= 500:
+            stats['status_5xx'] += 1
+        elif response.status >= 400:
+            stats['status_4xx'] += 1
+        if response.status in RETRY_STATUSES and not last:
+            delay = upstream.delay(attempt, response)
+            response.release()
+            stats['retries'] += 1
+            await asyncio.sleep(delay)
+            continue
+        try:
+            yield response
+        finally:
+            response.release()
+        return
+
+async def close_all():
+    """Close every session (on bot shutdown)"""
+    for upstream in _upstreams.values():
+        if upstream.session is not None and not upstream.session.closed:
+            await upstream.session.close()
+        upstream.session = None
+
+def get_stats():
+    """Metrics per upstream; latency percentiles cover the last LATENCY_SAMPLES requests"""
+    result = {}
+    for name, upstream in _upstreams.items():
+        stats = dict(upstream.stats)
+        samples = sorted(upstream.latencies)
+        responses = stats['requests'] - stats['errors']
+        stats['avg_ms'] = stats['seconds'] / responses * 1000 if responses else 0.0
+        stats['p50_ms'] = samples[len(samples) // 2] * 1000 if samples else 0.0
+        stats['p99_ms'] = samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000 if samples else 0.0
+        stats['error_rate'] = (stats['errors'] + stats['status_5xx']) / stats['requests'] if stats['requests'] else 0.0
+        connections = stats['connections_created'] + stats['connections_reused']
+        stats['reuse_rate'] = stats['connections_reused'] / connections if connections else 0.0
+        result[name] = stats
+    return result
+
+# The upstreams the bot calls; others get Upstream defaults on first use
+register('openai', limit_per_host=8, timeout=30, retries=2, backoff=0.5)
+register('meme', limit_per_host=4, timeout=5, retries=1)
+# discord.Webhook handles its own rate limits
+register('discord_webhook', limit_per_host=4, timeout=10, retries=0)
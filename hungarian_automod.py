@@ -2,7 +2,12 @@
 Hungarian and Multilingual AutoMod Support
 Contains Hungarian-specific content filtering and language-aware moderation
 """
+import weakref
 import config
+import database
+import message_features
+import re
+import text_normalize
 
 def get_bad_words_for_language(language_code):
     """Get bad words list for a specific language (from config first, then defaults)"""
@@ -53,6 +58,15 @@ ENGLISH_BAD_WORDS = [
     'nigga', 'nigger', 'faggot', 'retard'
 ]
 
+# Ordinary words that begin with a listed word. A match at the start of one
+# of these (or of a longer word starting with one) is not reported
+ALLOWED_WORDS = [
+    'hello', 'assess', 'asset', 'assign', 'assist', 'assume', 'assemble', 'assembly',
+    'associate', 'assert', 'assure', 'assault', 'assort', 'dickens', 'cocktail',
+    'cockpit', 'cockroach', 'cockatoo', 'hellas', 'shitake',
+    'szarv', 'szárny', 'szarka', 'faszén', 'barométer',
+]
+
 # Language-specific configurations
 LANGUAGE_FILTERS = {
     'hu': {
@@ -84,28 +98,244 @@ def merge_bad_words(language_code, custom_bad_words):
 
 def detect_language(text):
     """Simple language detection based on text characteristics"""
-    text_lower = text.lower()
-    
-    # Hungarian specific characters
-    hungarian_chars = ['á', 'é', 'í', 'ó', 'ö', 'ő', 'ú', 'ü', 'ű']
-    hungarian_count = sum(1 for char in text_lower if char in hungarian_chars)
-    
-    # Determine dominant language
-    if hungarian_count > hungarian_count > 0:
-        return 'hu'
-    elif hungarian_count > 0:
-        return 'hu'
-    else:
-        return 'en'
+    return message_features.extract(text).language
+
+# A maximal run of one character
+_RUN = re.compile(r'(.)\1*', re.DOTALL)
+
+class _Automaton:
+    """Aho-Corasick automaton: one pass over the text whatever the number of words"""
+    def __init__(self, words):
+        goto = [{}]
+        out = [None]
+        depth = [0]
+        for word in words:
+            state = 0
+            for char in word:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    out.append(None)
+                    depth.append(depth[state] + 1)
+                    goto[state][char] = nxt
+                state = nxt
+            out[state] = word
+
+        # Failure links, breadth first; out[state] becomes the shortest word
+        # ending at that state, including those reached through failure links
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, nxt in goto[state].items():
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(char, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[nxt] is None:
+                    out[nxt] = out[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._depth = depth
+        # Transitions resolved through failure links are memoized here, so
+        # the automaton becomes a DFA only for characters that actually occur
+        self._delta = [dict(edges) for edges in goto]
+
+    def _resolve(self, state, char):
+        goto, fail = self._goto, self._fail
+        s = state
+        while s and char not in goto[s]:
+            s = fail[s]
+        nxt = goto[s].get(char, 0)
+        self._delta[state][char] = nxt
+        return nxt
+
+    def words_at(self, state):
+        """Every word ending at state, longest first"""
+        fail = self._fail
+        while state:
+            # A state is a word's end if that word is exactly its path
+            word = self._out[state]
+            if word is not None and len(word) == self._depth[state]:
+                yield word
+            state = fail[state]
+
+    def find(self, text):
+        """First match as (word, start, end), or None"""
+        delta, out = self._delta, self._out
+        state = 0
+        for index, char in enumerate(text):
+            nxt = delta[state].get(char)
+            state = self._resolve(state, char) if nxt is None else nxt
+            word = out[state]
+            if word is not None:
+                return word, index + 1 - len(word), index + 1
+        return None
+
+class BadWordMatcher:
+    """Bad-word matcher over the normalized text (see text_normalize).
+
+    Words and messages are folded the same way, so accents, leetspeak,
+    homoglyphs and separators do not evade the list, and a second automaton
+    catches stretched words ("kuuurva") on the run-collapsed view. A
+    collapsed hit only counts if every run of the text is at least as long
+    as in the word, so "hell" matches "heeelll" but not "help". Words
+    shorter than COLLAPSED_MIN_LENGTH once collapsed ("ass" -> "as") are left
+    out of that view. Words shorter than SUBSTRING_MIN_LENGTH must start a
+    word ("Michelle" is not "hell"); longer ones match anywhere, like the old
+    `word in text` scan. Matches at the start of an ALLOWED_WORDS word
+    ("hello", "asset") are ignored.
+    """
+    COLLAPSED_MIN_LENGTH = 3
+    SUBSTRING_MIN_LENGTH = 5
+
+    def __init__(self, words):
+        self.words = frozenset(word.lower() for word in words if word)
+        allowed = [text_normalize.fold(word) for word in ALLOWED_WORDS]
+        folded = {}
+        collapsed = {}
+        # folded form -> (listed word, run lengths, collapsed allowed words it begins)
+        self._info = {}
+        for word in sorted(self.words):
+            form = text_normalize.fold(word)
+            if not form or form in self._info:
+                continue
+            runs = tuple(len(match.group()) for match in _RUN.finditer(form))
+            exceptions = tuple(text_normalize.collapse(a) for a in allowed if a.startswith(form) and a != form)
+            self._info[form] = (word, runs, exceptions)
+            folded[form] = word
+            short = text_normalize.collapse(form)
+            if len(short) >= self.COLLAPSED_MIN_LENGTH:
+                collapsed.setdefault(short, []).append(form)
+        self._collapsed_forms = collapsed
+        self._plain = _Automaton(folded)
+        self._collapsed = _Automaton(collapsed)
+
+    def __len__(self):
+        return len(self.words)
+
+    def _accepts(self, view, form, start):
+        """Whether form, found at view[start:], is a real hit"""
+        at_word_start = start == 0 or not view[start - 1].isalnum()
+        if not at_word_start:
+            return len(form) >= self.SUBSTRING_MIN_LENGTH
+        exceptions = self._info[form][2]
+        if exceptions:
+            end = start
+            while end < len(view) and view[end].isalnum():
+                end += 1
+            enclosing = text_normalize.collapse(view[start:end])
+            if any(enclosing.startswith(allowed) for allowed in exceptions):
+                return False
+        return True
+
+    def find(self, text):
+        """First match in text as (listed word, start, end), the span indexing text, or None"""
+        view = text_normalize.fold(text)
+        # Both automata advance in the same pass; the collapsed one skips a
+        # character equal to the one before it, which is the collapsed view
+        plain, collapsed = self._plain, self._collapsed
+        plain_delta, plain_out = plain._delta, plain._out
+        short_delta, short_out = collapsed._delta, collapsed._out
+        state = short_state = 0
+        previous = None
+        run = -1
+        runs = None
+        for index, char in enumerate(view):
+            nxt = plain_delta[state].get(char)
+            state = plain._resolve(state, char) if nxt is None else nxt
+            if plain_out[state] is not None:
+                for form in plain.words_at(state):
+                    start = index + 1 - len(form)
+                    if self._accepts(view, form, start):
+                        start, end = text_normalize.original_span(text, start, index + 1)
+                        return self._info[form][0], start, end
+            if char != previous:
+                previous = char
+                run += 1
+                nxt = short_delta[short_state].get(char)
+                short_state = collapsed._resolve(short_state, char) if nxt is None else nxt
+                if short_out[short_state] is not None:
+                    if runs is None:
+                        runs = [match.span() for match in _RUN.finditer(view)]
+                    found = self._collapsed_hit(view, runs, run, collapsed.words_at(short_state))
+                    if found is not None:
+                        form, start, end = found
+                        start, end = text_normalize.original_span(text, start, end)
+                        return self._info[form][0], start, end
+        return None
+
+    def _collapsed_hit(self, view, runs, last, shorts):
+        """(form, start, end) in view of a collapsed match ending at run `last`, or None"""
+        for short in shorts:
+            first = last + 1 - len(short)
+            span = runs[first:last + 1]
+            for form in self._collapsed_forms[short]:
+                needed = self._info[form][1]
+                if (all(end - start >= length for (start, end), length in zip(span, needed))
+                        and self._accepts(view, form, span[0][0])):
+                    return form, span[0][0], span[-1][1]
+        return None
+
+# Automata are shared by every guild with the same word list
+_automata = weakref.WeakValueDictionary()
+
+def get_matcher(words):
+    """Compiled matcher for a word list, reusing one already built for the same words"""
+    key = frozenset(word.lower() for word in words if word)
+    matcher = _automata.get(key)
+    if matcher is None:
+        matcher = _automata[key] = BadWordMatcher(key)
+    return matcher
+
+_dashboard_words = {}   # guild_id -> (dashboard settings, words tuple)
+_guild_matchers = {}    # (guild_id, language) -> (custom words, dashboard words, matcher)
+
+def get_dashboard_bad_words(guild_id):
+    """The dashboard's bad_words for a guild (dashboard.db, cached by the database module)"""
+    guild_id = str(guild_id)
+    settings = database.get_cached_guild_settings(guild_id)
+    cached = _dashboard_words.get(guild_id)
+    if cached is not None and cached[0] is settings:
+        return cached[1]
+    words = tuple(settings.get('bad_words') or ())
+    if cached is not None and cached[1] == words:
+        # Keep the old tuple so the guild's matcher stays valid
+        words = cached[1]
+    _dashboard_words[guild_id] = (settings, words)
+    return words
+
+def get_guild_matcher(guild_id, language, custom_bad_words=()):
+    """Matcher for a guild's language list + AutoMod bad_words + dashboard bad_words.
+
+    Cached per guild and rebuilt only when one of the lists changes; pass the
+    guild's (cached, immutable) settings tuple as custom_bad_words.
+    """
+    dashboard = get_dashboard_bad_words(guild_id)
+    key = (str(guild_id), language)
+    cached = _guild_matchers.get(key)
+    if cached is not None and cached[0] is custom_bad_words and cached[1] is dashboard:
+        return cached[2]
+    matcher = get_matcher(list(get_bad_words_for_language(language)) + list(custom_bad_words) + list(dashboard))
+    _guild_matchers[key] = (custom_bad_words, dashboard, matcher)
+    return matcher
+
+def invalidate_guild(guild_id):
+    """Forget cached word lists of a guild (after its dashboard settings changed)"""
+    guild_id = str(guild_id)
+    database.invalidate_cached_guild_settings(guild_id)
+    _dashboard_words.pop(guild_id, None)
+    for key in [key for key in _guild_matchers if key[0] == guild_id]:
+        del _guild_matchers[key]
 
 def has_bad_words(text, language='en', custom_bad_words=None):
     """Check if text contains bad words for a given language"""
-    bad_words = merge_bad_words(language, custom_bad_words)
-    text_lower = text.lower()
-    
-    for word in bad_words:
-        # Check for exact word match and word boundary variations
-        if word in text_lower:
-            return True, word
-    
+    matcher = get_matcher(merge_bad_words(language, list(custom_bad_words or [])))
+    found = matcher.find(text)
+    if found:
+        return True, found[0]
     return False, None
@@ -0,0 +1,72 @@
+"""
+Fixed-bucket latency histograms
+Buckets grow by BUCKET_GROWTH from MIN_SECONDS up to MAX_SECONDS (plus one
+overflow bucket), so recording a sample is one bisect and one increment, and
+memory stays constant however many samples are recorded. Percentiles are
+interpolated within a bucket, good to about BUCKET_GROWTH relative error.
+"""
+from bisect import bisect_left
+
+MIN_SECONDS = 0.0001
+MAX_SECONDS = 120.0
+BUCKET_GROWTH = 1.2
+
+def _bounds():
+    bounds = []
+    bound = MIN_SECONDS
+    while bound < MAX_SECONDS:
+        bounds.append(bound)
+        bound *= BUCKET_GROWTH
+    bounds.append(MAX_SECONDS)
+    return tuple(bounds)
+
+# Upper bound of every bucket but the overflow one
+BOUNDS = _bounds()
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Estimated q-quantile (0 < q <= 1) in seconds; 0.0 if empty"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = BOUNDS[i - 1] if i else 0.0
+                high = BOUNDS[i] if i < len(BOUNDS) else self.max
+                return min(low + (high - low) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        """count, avg/p50/p95/p99/max in milliseconds"""
+        return {
+            'count': self.count,
+            'avg_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
@@ -0,0 +1,205 @@
+"""
+Order-statistics leaderboards
+A Leaderboard keeps (user id -> score) plus an index sorted by score, so a
+score change, "rank #k of n" and a top-N page cost O(log n) instead of a
+sort of the whole guild. The index is a list of sorted buckets (at most
+2 * BUCKET_SIZE keys each) with a Fenwick tree over the bucket sizes for
+position lookups; ties are ordered by user id.
+
+ConfigLeaderboards serves the boards of a per-guild config namespace
+(economy, reputation): each guild's board is built from config on first use,
+kept current through save(), and dropped when the namespace is changed by
+anyone else (dashboard, another process).
+"""
+from bisect import bisect_left, insort
+
+import config
+
+BUCKET_SIZE = 512
+
+class RankedIndex:
+    """Sorted keys with O(log n) insert, delete, position and lookup by position"""
+    __slots__ = ('_lists', '_maxes', '_tree', '_len')
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._lists = [keys[i:i + BUCKET_SIZE] for i in range(0, len(keys), BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._lists]
+        self._len = len(keys)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self._len
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self._lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket, delta):
+        tree = self._tree
+        i = bucket + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _before(self, bucket):
+        """Number of keys in the buckets before bucket"""
+        tree = self._tree
+        total = 0
+        i = bucket
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        """(bucket, offset) of the key at position"""
+        tree = self._tree
+        bucket = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = bucket + step
+            if nxt < len(tree) and tree[nxt] <= position:
+                bucket = nxt
+                position -= tree[nxt]
+            step >>= 1
+        return bucket, position
+
+    def add(self, key):
+        if not self._lists:
+            self._lists.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            self._rebuild_tree()
+            return
+        bucket = bisect_left(self._maxes, key)
+        if bucket == len(self._maxes):
+            bucket -= 1
+            self._lists[bucket].append(key)
+            self._maxes[bucket] = key
+        else:
+            insort(self._lists[bucket], key)
+        self._len += 1
+        if len(self._lists[bucket]) > 2 * BUCKET_SIZE:
+            keys = self._lists[bucket]
+            self._lists[bucket:bucket + 1] = [keys[:BUCKET_SIZE], keys[BUCKET_SIZE:]]
+            self._maxes[bucket:bucket + 1] = [keys[BUCKET_SIZE - 1], keys[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(bucket, 1)
+
+    def remove(self, key):
+        """Remove key; raises KeyError if it is not there"""
+        bucket = bisect_left(self._maxes, key)
+        keys = self._lists[bucket] if bucket < len(self._lists) else ()
+        offset = bisect_left(keys, key)
+        if offset == len(keys) or keys[offset] != key:
+            raise KeyError(key)
+        del keys[offset]
+        self._len -= 1
+        if keys:
+            self._maxes[bucket] = keys[-1]
+            self._tree_add(bucket, -1)
+        else:
+            del self._lists[bucket]
+            del self._maxes[bucket]
+            self._rebuild_tree()
+
+    def index(self, key):
+        """Number of keys smaller than key"""
+        bucket = bisect_left(self._maxes, key)
+        if bucket == len(self._maxes):
+            return self._len
+        return self._before(bucket) + bisect_left(self._lists[bucket], key)
+
+    def slice(self, start, count):
+        """Up to count keys from position start"""
+        if start >= self._len or count <= 0:
+            return []
+        bucket, offset = self._locate(max(start, 0))
+        result = []
+        while bucket < len(self._lists) and len(result) < count:
+            result.extend(self._lists[bucket][offset:offset + count - len(result)])
+            bucket += 1
+            offset = 0
+        return result
+
+class Leaderboard:
+    """user id -> score, ranked highest score first"""
+    __slots__ = ('scores', 'index')
+
+    def __init__(self, scores=None):
+        self.scores = dict(scores or {})
+        self.index = RankedIndex((-score, user_id) for user_id, score in self.scores.items())
+
+    def __len__(self):
+        return len(self.scores)
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.index.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.index.add((-score, user_id))
+
+    def discard(self, user_id):
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            self.index.remove((-old, user_id))
+
+    def rank(self, user_id):
+        """1-based rank of a user, or None if unranked"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.index.index((-score, user_id)) + 1
+
+    def page(self, start, count):
+        """[(user_id, score)] ranked start + 1 to start + count"""
+        return [(user_id, -score) for score, user_id in self.index.slice(start, count)]
+
+class ConfigLeaderboards:
+    """Leaderboards of one config namespace of {guild_id: {user_id: data}}"""
+    def __init__(self, namespace, score):
+        self.namespace = namespace
+        self.score = score
+        self._boards = {}
+        self._writing = False
+        config.add_change_listener(self._on_config_change)
+
+    def _on_config_change(self, namespace, key):
+        if self._writing or (namespace is None and key == config.SAVED):
+            # A whole-document save: the flush reports the entries it changed
+            return
+        if namespace is None or (namespace == self.namespace and key is None):
+            self._boards.clear()
+        elif namespace == self.namespace and str(key).isdigit():
+            self._boards.pop(int(key), None)
+
+    def get(self, guild_id):
+        """Leaderboard of a guild, built from config on first use"""
+        board = self._boards.get(guild_id)
+        if board is None:
+            stored = config.get_path((self.namespace, guild_id)) or {}
+            board = self._boards[guild_id] = Leaderboard({
+                int(user_id): self.score(data) for user_id, data in stored.items()
+                if isinstance(data, dict) and str(user_id).isdigit()
+            })
+        return board
+
+    def save(self, guild_id, user_id, data):
+        """Write a user's entry to config and move them on the leaderboard"""
+        self._writing = True
+        try:
+            config.update_path((self.namespace, guild_id, user_id), data)
+        finally:
+            self._writing = False
+        board = self._boards.get(guild_id)
+        if board is not None:
+            board.update(user_id, self.score(data))
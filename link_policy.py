@@ -0,0 +1,138 @@
+"""
+Link policy for AutoMod
+Allowed and blocked domains are compiled into a trie over reversed domain
+labels (com -> example -> www), so judging a link costs one step per label
+of its domain however long the lists are. The most specific matching entry
+wins, so a guild can allow a site and still block one of its subdomains.
+Discord invites are judged by their code, which lets a guild allow its own.
+
+List entries can be domains ("example.com" covers its subdomains too,
+"*.example.com" only the subdomains), URLs, or invite links.
+"""
+import database
+
+ALLOW = 'allow'
+DENY = 'deny'
+
+# Rule keys inside trie nodes; labels are strings, so these never collide
+_SELF = 0
+_SUBDOMAINS = 1
+
+INVITE_HOSTS = ('discord.gg', 'discord.com', 'discordapp.com')
+
+class DomainTrie:
+    """Domain patterns stored by reversed labels"""
+    def __init__(self):
+        self._root = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pattern, rule):
+        subdomains_only = pattern.startswith('*.')
+        if subdomains_only:
+            pattern = pattern[2:]
+        node = self._root
+        for label in reversed(pattern.split('.')):
+            node = node.setdefault(label, {})
+        key = _SUBDOMAINS if subdomains_only else _SELF
+        if key not in node:
+            self._size += 1
+        # The same pattern both allowed and blocked stays blocked
+        if node.get(key) != DENY:
+            node[key] = rule
+
+    def lookup(self, domain):
+        """Rule of the most specific pattern covering domain, or None"""
+        labels = domain.split('.')
+        node = self._root
+        rule = None
+        for index in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[index])
+            if node is None:
+                break
+            own = node.get(_SELF)
+            # *.example.com applies only while more labels follow
+            sub = node.get(_SUBDOMAINS) if index else None
+            if own is not None or sub is not None:
+                rule = DENY if DENY in (own, sub) else ALLOW
+        return rule
+
+def parse_entry(entry):
+    """('invite', code) or ('domain', pattern) for a list entry, or None if it is unusable"""
+    entry = entry.strip()
+    if '://' in entry:
+        entry = entry.split('://', 1)[1]
+    host, _, path = entry.partition('/')
+    host = host.rsplit('@', 1)[-1].split(':', 1)[0].lower().rstrip('.')
+    if host in INVITE_HOSTS:
+        # Invite codes are case-sensitive
+        parts = path.split('/')
+        if host == 'discord.gg' and parts[0]:
+            return 'invite', parts[0]
+        if len(parts) > 1 and parts[0] == 'invite' and parts[1]:
+            return 'invite', parts[1]
+    if not host or host == '*.':
+        return None
+    return 'domain', host
+
+class LinkPolicy:
+    """Allow/deny decisions for the links of a message.
+
+    With block_unlisted every link must be allowed (AutoMod's link_filter);
+    without it only blocked entries are removed.
+    """
+    def __init__(self, allowed=(), blocked=(), block_unlisted=True):
+        self.block_unlisted = block_unlisted
+        self.domains = DomainTrie()
+        self.allowed_invites = set()
+        self.blocked_invites = set()
+        for entries, rule in ((allowed, ALLOW), (blocked, DENY)):
+            invites = self.allowed_invites if rule == ALLOW else self.blocked_invites
+            for entry in entries:
+                parsed = parse_entry(entry)
+                if parsed is None:
+                    continue
+                kind, value = parsed
+                if kind == 'invite':
+                    invites.add(value)
+                else:
+                    self.domains.add(value, rule)
+
+    def check(self, features):
+        """First link of a message_features.MessageFeatures that is not allowed,
+        as (start, end, domain or invite), or None"""
+        invite_spans = set()
+        for start, end, code in features.invites:
+            invite_spans.add(start)
+            if code in self.blocked_invites or (self.block_unlisted and code not in self.allowed_invites):
+                return start, end, f"discord.gg/{code}"
+        for start, end, domain in features.urls:
+            if start in invite_spans:
+                continue
+            rule = self.domains.lookup(domain)
+            if rule == DENY or (rule is None and self.block_unlisted):
+                return start, end, domain
+        return None
+
+_guild_policies = {}  # guild_id -> (dashboard settings, automod settings, vanity code, policy)
+
+def get_guild_policy(guild, settings):
+    """Policy of a guild: dashboard whitelisted_links and its vanity invite are
+    allowed, AutoMod blocked_links are denied.
+
+    Rebuilt only when one of them changes; settings is the guild's cached
+    AutoModSettings.
+    """
+    dashboard = database.get_cached_guild_settings(guild.id)
+    vanity = getattr(guild, 'vanity_url_code', None)
+    cached = _guild_policies.get(guild.id)
+    if cached is not None and cached[0] is dashboard and cached[1] is settings and cached[2] == vanity:
+        return cached[3]
+    allowed = list(dashboard.get('whitelisted_links') or ())
+    if vanity:
+        allowed.append(f"discord.gg/{vanity}")
+    policy = LinkPolicy(allowed, settings.blocked_links, block_unlisted=settings.link_filter)
+    _guild_policies[guild.id] = (dashboard, settings, vanity, policy)
+    return policy
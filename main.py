@@ -15,6 +15,11 @@ from dotenv import load_dotenv
 from datetime import datetime, timezone
 import json
 import config
+import http_clients
+import command_timing
+# Before anything does "from config/database/translations import ..."
+command_timing.instrument()
+import message_pipeline
 import sys
 
 print("[*] Loading environment variables...", flush=True)
@@ -35,11 +40,20 @@ class DiscordBot(commands.Bot):
         super().__init__(
             command_prefix=lambda x, y: None,  # Slash commands only
             intents=intents,
-            help_command=None
+            help_command=None,
+            tree_cls=command_timing.TimedCommandTree
         )
         self.start_time = datetime.now(timezone.utc)
         
     async def setup_hook(self):
+        # Replay any config journal left by a crash before cogs read config
+        config.enable_journal()
+        # Changes from the dashboard are applied between loop callbacks, not under the cogs' feet
+        config.set_event_loop(asyncio.get_running_loop())
+        
+        # One on_message listener runs the stages the cogs register
+        self.add_listener(message_pipeline.dispatch, 'on_message')
+        
         cogs_to_load = [
             'cogs.tickets',
             'cogs.antialt',
@@ -120,6 +134,11 @@ class DiscordBot(commands.Bot):
         """This method is now replaced by the standalone event handler"""
         pass
     
+    async def close(self):
+        await super().close()
+        # Cogs are unloaded by now, nothing sends requests anymore
+        await http_clients.close_all()
+    
     def update_stats_file(self):
         """Update bot stats for web server"""
         total_members = sum(guild.member_count or 0 for guild in self.guilds)
@@ -130,7 +149,8 @@ class DiscordBot(commands.Bot):
             'guilds': len(self.guilds),
             'users': total_members,
             'channels': total_channels,
-            'status': 'online'
+            'status': 'online',
+            'command_latency': command_timing.get_stats()
         }
         
         try:
@@ -151,6 +171,25 @@ async def keep_alive():
         if bot.user:
             current_time = datetime.now(timezone.utc).isoformat()
             print(f"[*] [HEARTBEAT] Bot is alive at {current_time} | Latency: {round(bot.latency * 1000)}ms | Guilds: {len(bot.guilds)}")
+            persistence = config.get_persistence_stats()
+            print(f"[*] [HEARTBEAT] Config: {persistence['flushes']} flushes, avg {persistence['avg_flush_ms']:.1f}ms off-loop "
+                  f"(max {persistence['flush_seconds_max'] * 1000:.1f}ms), {persistence['avg_caller_us']:.1f}us per change on-loop")
+            pipeline = message_pipeline.get_stats()
+            slowest = sorted(message_pipeline.get_stage_stats().items(), key=lambda item: -item[1]['avg_us'])[:3]
+            print(f"[*] [HEARTBEAT] Messages: {pipeline['messages']} dispatched, avg {pipeline['avg_us']:.0f}us, "
+                  f"{pipeline['stopped']} stopped early | slowest stages: "
+                  + ", ".join(f"{name} {stats['avg_us']:.0f}us" for name, stats in slowest))
+            for name, stats in http_clients.get_stats().items():
+                if stats['requests']:
+                    print(f"[*] [HEARTBEAT] HTTP {name}: {stats['requests']} requests, p50 {stats['p50_ms']:.0f}ms "
+                          f"p99 {stats['p99_ms']:.0f}ms, {stats['error_rate']:.1%} errors, {stats['retries']} retries, "
+                          f"{stats['reuse_rate']:.0%} connections reused")
+            timing = command_timing.get_stats()
+            if timing['commands']:
+                slowest = sorted(timing['by_command'].items(), key=lambda item: -item[1]['ack']['p95_ms'])[:3]
+                print(f"[*] [HEARTBEAT] Slash commands: {timing['commands']} run, {timing['alerts']} near the ack deadline, "
+                      f"{timing['late_acks']} acked late, {timing['unacknowledged']} never acked | slowest p95 ack: "
+                      + ", ".join(f"/{name} {metrics['ack']['p95_ms']:.0f}ms" for name, metrics in slowest))
             bot.update_stats_file()
         else:
             print("[!] [HEARTBEAT] Warning: Bot user not initialized yet")
@@ -234,8 +273,7 @@ async def save_config_on_close():
     """Save all config data before bot closes"""
     print("[*] Saving configuration before shutdown...")
     try:
-        cfg = config.load_config()
-        config.save_config(cfg)
+        await config.save_async()
         print("[OK] Configuration saved successfully!")
     except Exception as e:
         print(f"[FAIL] Failed to save configuration on shutdown: {e}")
@@ -462,16 +500,14 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         print("\n⏹️  Bot interrupted by user. Saving configuration...", flush=True)
         try:
-            cfg = config.load_config()
-            config.save_config(cfg)
+            config.flush()
             print("[OK] Configuration saved on shutdown!", flush=True)
         except Exception as e:
             print(f"[FAIL] Failed to save config on shutdown: {e}", flush=True)
     except Exception as e:
         print(f"[FAIL] Bot crashed: {e}", flush=True)
         try:
-            cfg = config.load_config()
-            config.save_config(cfg)
+            config.flush()
             print("[OK] Configuration saved after crash!", flush=True)
         except Exception as e2:
             print(f"[FAIL] Failed to save config after crash: {e2}", flush=True)
\ No newline at end of file
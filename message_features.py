@@ -0,0 +1,104 @@
+"""
+Content features of a message, extracted in one pass
+The content filters used to scan every message separately (a character loop
+for caps, a regex per check, compiled at call time, another loop for language
+detection). extract() runs a single precompiled regex over the content and
+collects everything they need; the pipeline keeps the result on the message
+context as ctx.features, so it is computed at most once per message.
+"""
+import re
+
+HUNGARIAN_LOWER = 'áéíóöőúüű'
+HUNGARIAN_UPPER = 'ÁÉÍÓÖŐÚÜŰ'
+
+# The lookahead lists every character a token can start with, so most
+# positions are rejected without trying the alternatives
+_TOKENS = re.compile(r'''
+    (?=[hHdD<@\U0001F300-\U0001FAFF☀-➿A-Z''' + HUNGARIAN_LOWER + HUNGARIAN_UPPER + r'''])
+    (?:
+    (?P<url>(?i:https?://)(?:[^\s/?#<>@]*@)?(?P<domain>[^\s/?#<>:@]+)[^\s<>]*)
+  | (?P<invite>(?i:discord\.gg|discord(?:app)?\.com/invite)/(?P<code>[\w-]+))
+  | (?P<custom_emoji><a?:\w+:\d+>)
+  | (?P<role_mention><@&\d+>)
+  | (?P<user_mention><@!?\d+>)
+  | (?P<everyone>@everyone|@here)
+  | (?P<emoji>[\U0001F300-\U0001FAFF☀-➿])
+  | (?P<hungarian>[''' + HUNGARIAN_LOWER + r'''])
+  | (?P<upper>[A-Z''' + HUNGARIAN_UPPER + r''']+)
+    )
+''', re.VERBOSE)
+
+INVITE_DOMAINS = ('discord.gg', 'discord.com', 'discordapp.com')
+
+class MessageFeatures:
+    """What the filters look at; spans index the original content"""
+    __slots__ = ('length', 'upper', 'emoji', 'custom_emoji', 'urls', 'invites',
+                 'user_mentions', 'role_mentions', 'mention_everyone', 'hungarian_chars')
+
+    def __init__(self, length):
+        self.length = length
+        self.upper = 0
+        self.emoji = 0
+        self.custom_emoji = 0
+        self.urls = []       # (start, end, domain)
+        self.invites = []    # (start, end, invite code)
+        self.user_mentions = 0
+        self.role_mentions = 0
+        self.mention_everyone = False
+        self.hungarian_chars = 0
+
+    @property
+    def caps_ratio(self):
+        return self.upper / self.length if self.length else 0.0
+
+    @property
+    def emoji_count(self):
+        """Unicode and custom emojis"""
+        return self.emoji + self.custom_emoji
+
+    @property
+    def mention_count(self):
+        return self.user_mentions + self.role_mentions
+
+    @property
+    def has_links(self):
+        return bool(self.urls or self.invites)
+
+    @property
+    def language(self):
+        """Language hint: 'hu' if any Hungarian accented letter occurs, else 'en'"""
+        return 'hu' if self.hungarian_chars else 'en'
+
+def extract(content):
+    """Features of a message's content"""
+    features = MessageFeatures(len(content))
+    for match in _TOKENS.finditer(content):
+        kind = match.lastgroup
+        if kind == 'upper':
+            run = match.group()
+            features.upper += len(run)
+            if not run.isascii():
+                features.hungarian_chars += sum(1 for char in run if char in HUNGARIAN_UPPER)
+        elif kind == 'hungarian':
+            features.hungarian_chars += 1
+        elif kind == 'emoji':
+            features.emoji += 1
+        elif kind == 'url':
+            url = match.group()
+            domain = match.group('domain').lower().rstrip('.')
+            features.urls.append((match.start(), match.end(), domain))
+            # https://discord.gg/<code>, https://discord.com/invite/<code>
+            if domain == 'discord.gg' or (domain in INVITE_DOMAINS and '/invite/' in url):
+                code = url.rstrip('/').rsplit('/', 1)[-1]
+                features.invites.append((match.start(), match.end(), code))
+        elif kind == 'invite':
+            features.invites.append((match.start(), match.end(), match.group('code')))
+        elif kind == 'custom_emoji':
+            features.custom_emoji += 1
+        elif kind == 'user_mention':
+            features.user_mentions += 1
+        elif kind == 'role_mention':
+            features.role_mentions += 1
+        else:
+            features.mention_everyone = True
+    return features
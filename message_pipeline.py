@@ -0,0 +1,199 @@
+"""
+Single on_message dispatcher shared by the cogs
+Instead of one listener per cog, each re-checking author.bot and loading its
+own config, cogs register stages here. For every message one MessageContext is
+built, and the stages run in priority order on it. A stage can stop the
+pipeline (AutoMod does when it deletes a message). Stages that wait on
+external APIs run as background tasks once the inline stages are done, so
+they never delay the rest. Per-stage timing is kept for the heartbeat and
+benchmarks.
+"""
+import asyncio
+import time
+
+import config
+import guild_settings
+import message_features
+from translations import get_guild_language
+
+# Stage priorities, lower runs first; stages with equal priority run in
+# registration order
+STATS = 0
+MODERATION = 10
+COMMANDS = 20
+FEATURES = 30
+RESPONSES = 40
+
+class MessageContext:
+    """Per-message data shared by all stages; derived values are computed once, on first use"""
+    __slots__ = ('message', 'guild', 'guild_id', 'author', 'stopped', 'stopped_by',
+                 '_can_manage_messages', '_language', '_prefix', '_settings', '_content_lower',
+                 '_features')
+
+    def __init__(self, message):
+        self.message = message
+        self.guild = message.guild
+        self.guild_id = message.guild.id if message.guild else None
+        self.author = message.author
+        self.stopped = False
+        self.stopped_by = None
+        self._can_manage_messages = None
+        self._language = None
+        self._prefix = None
+        self._settings = None
+        self._content_lower = None
+        self._features = None
+
+    def stop(self, stage):
+        """Skip the remaining stages (e.g. the message was deleted)"""
+        self.stopped = True
+        self.stopped_by = stage
+
+    @property
+    def can_manage_messages(self):
+        if self._can_manage_messages is None:
+            permissions = getattr(self.author, 'guild_permissions', None)
+            self._can_manage_messages = bool(permissions and permissions.manage_messages)
+        return self._can_manage_messages
+
+    @property
+    def language(self):
+        if self._language is None:
+            self._language = get_guild_language(self.guild_id) if self.guild_id else 'en'
+        return self._language
+
+    @property
+    def prefix(self):
+        if self._prefix is None:
+            self._prefix = config.get_guild_prefix(self.guild_id) if self.guild_id else '!'
+        return self._prefix
+
+    @property
+    def content_lower(self):
+        if self._content_lower is None:
+            self._content_lower = (self.message.content or '').lower()
+        return self._content_lower
+
+    @property
+    def features(self):
+        """message_features.MessageFeatures of the content (caps, emojis, links, mentions, ...)"""
+        if self._features is None:
+            self._features = message_features.extract(self.message.content or '')
+        return self._features
+
+    def settings(self, namespace):
+        """The guild's typed settings for a namespace, snapshotted for this message"""
+        if self._settings is None:
+            self._settings = {}
+        settings = self._settings.get(namespace)
+        if settings is None:
+            settings = self._settings[namespace] = guild_settings.get_settings(namespace, self.guild_id)
+        return settings
+
+class _Stage:
+    __slots__ = ('name', 'handler', 'priority', 'guild_only', 'background', 'accepts',
+                 'calls', 'seconds', 'max_seconds', 'errors', 'stops', 'skipped')
+
+    def __init__(self, name, handler, priority, guild_only, background, accepts):
+        self.name = name
+        self.handler = handler
+        self.priority = priority
+        self.guild_only = guild_only
+        self.background = background
+        self.accepts = accepts
+        self.skipped = 0
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.errors = 0
+        self.stops = 0
+
+# Sorted by priority; replaced (never mutated) so dispatch can iterate it safely
+_stages = ()
+_stats = {'messages': 0, 'skipped_bots': 0, 'stopped': 0, 'seconds': 0.0}
+# Strong references to running background stages
+_background_tasks = set()
+
+def register_stage(name, handler, priority, guild_only=True, background=False, accepts=None):
+    """Run `await handler(ctx)` for every non-bot message.
+
+    guild_only stages are skipped for DMs. background stages are started as
+    tasks after the inline stages (unless one stopped the pipeline); use it
+    for stages that wait on external APIs. accepts(ctx), if given, is a cheap
+    synchronous filter: messages it rejects never reach the handler, and no
+    task is started for them. Registering a name again replaces the previous
+    stage.
+    """
+    global _stages
+    stages = [stage for stage in _stages if stage.name != name]
+    stages.append(_Stage(name, handler, priority, guild_only, background, accepts))
+    _stages = tuple(sorted(stages, key=lambda stage: stage.priority))
+
+def unregister_stage(name):
+    global _stages
+    _stages = tuple(stage for stage in _stages if stage.name != name)
+
+async def _run(stage, ctx):
+    start = time.perf_counter()
+    try:
+        await stage.handler(ctx)
+    except Exception as e:
+        stage.errors += 1
+        print(f"❌ Error in message stage {stage.name}: {type(e).__name__}: {e}")
+    elapsed = time.perf_counter() - start
+    stage.calls += 1
+    stage.seconds += elapsed
+    if elapsed > stage.max_seconds:
+        stage.max_seconds = elapsed
+
+async def dispatch(message):
+    """on_message listener: build the context once and run the registered stages"""
+    if message.author.bot:
+        _stats['skipped_bots'] += 1
+        return None
+    start = time.perf_counter()
+    ctx = MessageContext(message)
+    background = []
+    for stage in _stages:
+        if stage.guild_only and ctx.guild is None:
+            continue
+        if stage.accepts is not None and not stage.accepts(ctx):
+            stage.skipped += 1
+            continue
+        if stage.background:
+            background.append(stage)
+            continue
+        await _run(stage, ctx)
+        if ctx.stopped:
+            stage.stops += 1
+            _stats['stopped'] += 1
+            break
+    else:
+        for stage in background:
+            task = asyncio.create_task(_run(stage, ctx))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+    _stats['messages'] += 1
+    _stats['seconds'] += time.perf_counter() - start
+    return ctx
+
+def get_stage_stats():
+    """Counters per stage (inline stage time is what a message waits for)"""
+    return {
+        stage.name: {
+            'priority': stage.priority,
+            'background': stage.background,
+            'calls': stage.calls,
+            'skipped': stage.skipped,
+            'avg_us': stage.seconds / stage.calls * 1e6 if stage.calls else 0.0,
+            'max_ms': stage.max_seconds * 1000,
+            'errors': stage.errors,
+            'stops': stage.stops,
+        }
+        for stage in _stages
+    }
+
+def get_stats():
+    stats = dict(_stats)
+    stats['avg_us'] = stats['seconds'] / stats['messages'] * 1e6 if stats['messages'] else 0.0
+    return stats
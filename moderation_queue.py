@@ -0,0 +1,180 @@
+"""
+Batched AI toxicity checks for AIMod
+Messages from all guilds and channels are collected for up to BATCH_WINDOW
+seconds (or until MAX_BATCH of them are waiting) and classified with one
+chat-completion request over the shared 'openai' HTTP client. Verdicts are cached by the
+normalized content, so repeated messages ("gg", copy-pasted spam) cost one
+classification. Messages a local pre-filter finds trivially safe never reach
+the API, and requests are limited both in concurrency and per second.
+
+The endpoint defaults to OpenAI and can be pointed elsewhere (e.g. a local
+stub server) with OPENAI_BASE_URL.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+import http_clients
+import text_normalize
+import ttl_cache
+
+API_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/') + '/chat/completions'
+MODEL = 'gpt-3.5-turbo'
+BATCH_WINDOW = 0.05
+MAX_BATCH = 20
+MAX_CONCURRENCY = 2
+MAX_QPS = 5
+CACHE_SIZE = 10_000
+CACHE_TTL = 3600
+REQUEST_TIMEOUT = 15
+UPSTREAM = 'openai'
+
+SYSTEM_PROMPT = ('You are a content moderation assistant. You get numbered messages, one per line. '
+                 'For each, answer on its own line with its number and only "toxic" or "safe", e.g. "1: safe".')
+
+def content_key(text):
+    """Cache key of a message: case, accents, leetspeak, spacing and repeats do not matter"""
+    return hash(text_normalize.collapse(' '.join(text_normalize.fold(text).split())))
+
+def is_trivially_safe(text):
+    """Messages not worth a classification: very short, or without any letters"""
+    if len(text) < 5:
+        return True
+    return not any(char.isalpha() for char in text)
+
+class ModerationQueue:
+    """check(text) resolves to True (toxic) or False; failures count as safe"""
+    def __init__(self, api_key, url=API_URL, model=MODEL, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH,
+                 max_concurrency=MAX_CONCURRENCY, max_qps=MAX_QPS, cache=None):
+        self.api_key = api_key
+        self.url = url
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_concurrency = max_concurrency
+        self.max_qps = max_qps
+        self.cache = cache if cache is not None else ttl_cache.TTLCache(CACHE_SIZE, CACHE_TTL)
+        self._pending = OrderedDict()   # content key -> (text, future)
+        self._flusher = None
+        self._full = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._next_request_at = 0.0
+        self._requests = set()
+        self._stats = {'checks': 0, 'prefiltered': 0, 'cache_hits': 0, 'coalesced': 0,
+                       'batches': 0, 'batched_messages': 0, 'toxic': 0, 'errors': 0}
+
+    async def check(self, text):
+        self._stats['checks'] += 1
+        if not self.api_key or is_trivially_safe(text):
+            self._stats['prefiltered'] += 1
+            return False
+        key = content_key(text)
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            self._stats['cache_hits'] += 1
+            return verdict
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Same content already waiting for the next batch
+            self._stats['coalesced'] += 1
+            return await asyncio.shield(pending[1])
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = (text, future)
+        if self._flusher is None:
+            self._full = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_after_window())
+        elif len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await asyncio.shield(future)
+
+    async def _flush_after_window(self):
+        try:
+            await asyncio.wait_for(self._full.wait(), self.batch_window)
+        except asyncio.TimeoutError:
+            pass
+        # A batch is taken only once a request may start, so messages that
+        # arrive while the budget is used up join it instead of queueing
+        # behind small batches
+        while self._pending:
+            await self._semaphore.acquire()
+            await self._wait_for_budget()
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False))
+            task = asyncio.create_task(self._send(batch))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+        self._flusher = None
+
+    async def _wait_for_budget(self):
+        # Requests are spaced at least 1 / max_qps seconds apart
+        now = time.monotonic()
+        start_at = max(now, self._next_request_at)
+        self._next_request_at = start_at + 1 / self.max_qps
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    async def _send(self, batch):
+        """Classify a batch; the caller acquired the semaphore"""
+        verdicts = {}
+        try:
+            verdicts = await self._classify([text for _, (text, _) in batch])
+            self._stats['batches'] += 1
+            self._stats['batched_messages'] += len(batch)
+        except Exception as e:
+            self._stats['errors'] += 1
+            print(f"⚠️ AI moderation request failed ({len(batch)} messages): {type(e).__name__}: {e}")
+        finally:
+            self._semaphore.release()
+        for index, (key, (_, future)) in enumerate(batch, 1):
+            verdict = verdicts.get(index)
+            if verdict is not None:
+                self.cache.put(key, verdict)
+                if verdict:
+                    self._stats['toxic'] += 1
+            if not future.done():
+                future.set_result(bool(verdict))
+
+    async def _classify(self, texts):
+        """{message number: toxic} for one request; numbers missing from the answer are left out"""
+        lines = '\n'.join(f"{i}: {' '.join(text.split())}" for i, text in enumerate(texts, 1))
+        data = {
+            'model': self.model,
+            'messages': [
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': f'Are these messages toxic, hateful, or inappropriate?\n{lines}'}
+            ],
+            'max_tokens': 8 * len(texts),
+            'temperature': 0.3
+        }
+        headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
+        # No retries here: the next batch is due soon and failures count as safe
+        async with http_clients.request(UPSTREAM, 'POST', self.url, retries=0, headers=headers, json=data,
+                                        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            result = await resp.json()
+        answer = result['choices'][0]['message']['content'].lower()
+        verdicts = {}
+        for line in answer.splitlines():
+            number, _, label = line.partition(':')
+            number = number.strip().lstrip('#')
+            if number.isdigit() and 1 <= int(number) <= len(texts):
+                verdicts[int(number)] = 'toxic' in label
+        return verdicts
+
+    async def close(self):
+        if self._flusher is not None:
+            self._full.set()
+            await self._flusher
+        if self._requests:
+            await asyncio.gather(*self._requests, return_exceptions=True)
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['cached_verdicts'] = len(self.cache)
+        stats['avg_batch'] = stats['batched_messages'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
@@ -0,0 +1,118 @@
+"""
+Per-(guild, user) message rate tracking for spam detection
+Each active user gets a small fixed-size record: a ring buffer of their last
+message times, the hash of their last message with a repeat count, and a
+token bucket for mentions. Every update is O(1). Records of users idle for
+longer than idle_seconds are evicted as new messages come in, and the
+number of records is capped, so memory follows active users rather than
+every user ever seen.
+"""
+import time
+from collections import OrderedDict, deque
+
+SPAM = 'spam'
+DUPLICATE = 'duplicate'
+MENTIONS = 'mentions'
+
+class _Activity:
+    __slots__ = ('times', 'last_seen', 'content', 'content_at', 'repeats', 'tokens', 'tokens_at')
+
+    def __init__(self, size, now):
+        self.times = deque(maxlen=size)
+        self.last_seen = now
+        self.content = None
+        self.content_at = now
+        self.repeats = 0
+        self.tokens = None
+        self.tokens_at = now
+
+class RateTracker:
+    """Sliding-window limits for messages, repeated content and mentions.
+
+    record() takes the limits as an object with the attributes max_messages,
+    time_window, duplicate_limit, duplicate_window, mention_limit and
+    mention_window (AutoModSettings has them); a limit of 0 disables that
+    check.
+    """
+    def __init__(self, idle_seconds=600, max_users=100_000):
+        self.idle_seconds = idle_seconds
+        self.max_users = max_users
+        self._activity = OrderedDict()
+        self._stats = {'records': 0, 'evicted': 0, SPAM: 0, DUPLICATE: 0, MENTIONS: 0}
+
+    def __len__(self):
+        return len(self._activity)
+
+    def record(self, guild_id, user_id, limits, content=None, mentions=0, now=None):
+        """Count one message; returns SPAM, DUPLICATE or MENTIONS if it breaks a limit, else None"""
+        if now is None:
+            now = time.monotonic()
+        key = (guild_id, user_id)
+        activity = self._activity.pop(key, None)
+        size = limits.max_messages + 1
+        if activity is None:
+            activity = _Activity(size, now)
+        elif activity.times.maxlen != size:
+            # The guild changed max_messages
+            activity.times = deque(activity.times, maxlen=size)
+        self._activity[key] = activity
+        activity.last_seen = now
+        self._stats['records'] += 1
+        self._evict(now)
+
+        verdict = None
+        times = activity.times
+        times.append(now)
+        # More than max_messages within time_window: the oldest of the last
+        # max_messages + 1 messages is still inside the window
+        if limits.max_messages and len(times) == size and now - times[0] < limits.time_window:
+            verdict = SPAM
+
+        if content and limits.duplicate_limit:
+            digest = hash(content)
+            if digest == activity.content and now - activity.content_at < limits.duplicate_window:
+                activity.repeats += 1
+            else:
+                activity.content = digest
+                activity.repeats = 1
+            activity.content_at = now
+            if verdict is None and activity.repeats >= limits.duplicate_limit:
+                verdict = DUPLICATE
+
+        if limits.mention_limit:
+            # Token bucket: mention_limit mentions, refilled over mention_window
+            capacity = limits.mention_limit
+            if activity.tokens is None:
+                activity.tokens = capacity
+            else:
+                refill = (now - activity.tokens_at) * capacity / limits.mention_window
+                activity.tokens = min(capacity, activity.tokens + refill)
+            activity.tokens_at = now
+            if mentions:
+                activity.tokens -= mentions
+                if verdict is None and activity.tokens < 0:
+                    verdict = MENTIONS
+
+        if verdict is not None:
+            self._stats[verdict] += 1
+        return verdict
+
+    def reset(self, guild_id, user_id):
+        """Forget a user's activity (after they were punished)"""
+        self._activity.pop((guild_id, user_id), None)
+
+    def _evict(self, now):
+        # Records are kept in last_seen order, so idle ones are at the front
+        activity = self._activity
+        cutoff = now - self.idle_seconds
+        while activity:
+            key, oldest = next(iter(activity.items()))
+            if oldest.last_seen >= cutoff and len(activity) <= self.max_users:
+                break
+            del activity[key]
+            self._stats['evicted'] += 1
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['tracked'] = len(self._activity)
+        return stats
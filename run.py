@@ -39,8 +39,7 @@ def save_config_before_restart():
     try:
         print("[*] [BOT] Saving configuration before restart...", flush=True)
         import config
-        cfg = config.load_config()
-        config.save_config(cfg)
+        config.flush()
         print("[OK] [BOT] Configuration saved successfully before restart", flush=True)
         
         # Also flush database
@@ -0,0 +1,133 @@
+"""
+Text normalization for content filters
+Folds the usual filter evasions into one canonical form, so a word list only
+needs the plain spelling:
+- case and accents (Hungarian ő/ű included) folded to ASCII
+- homoglyphs (Cyrillic/Greek lookalikes, fullwidth letters) and leetspeak,
+  the latter only in tokens that also have letters ("455" stays a number)
+- separators inside words stripped ("k.u.r.v.a", zero-width characters) and
+  spaced-out letters joined ("k u r v a")
+- runs of a repeated character collapsed ("kuuurva"), as a second view
+
+The translation tables are built once at import, so fold() is a
+str.translate plus a few regexes, all in C. Offsets back into the original text
+are only computed when a caller needs them, e.g. for a match.
+"""
+import re
+import unicodedata
+
+# Stripped wherever they occur
+SEPARATORS = ".-_*~`'\"^+­​‌‍⁠﻿"
+
+LEET = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b',
+    '@': 'a', '$': 's', '€': 'e', '!': 'i',
+}
+
+# Lookalikes NFKD does not fold to ASCII
+HOMOGLYPHS = {
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o',
+    'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ї': 'i', 'ј': 'j',
+    'ѕ': 's', 'ԁ': 'd', 'ɡ': 'g', 'ı': 'i', 'ł': 'l', 'ø': 'o', 'đ': 'd', 'ß': 'ss', 'ƒ': 'f',
+    'α': 'a', 'β': 'b', 'ε': 'e', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p',
+    'τ': 't', 'υ': 'u', 'χ': 'x',
+}
+
+def _build_table():
+    table = {}
+    ranges = (range(0x41, 0x5B), range(0xC0, 0x250), range(0x370, 0x530),
+              range(0x1E00, 0x1F00), range(0xFF01, 0xFF5F))
+    for block in ranges:
+        for code in block:
+            char = chr(code)
+            lower = char.lower()
+            if len(lower) != 1:
+                continue
+            lower = HOMOGLYPHS.get(lower, lower)
+            decomposed = unicodedata.normalize('NFKD', lower)
+            folded = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+            if folded and folded.isascii():
+                lower = folded
+            if lower != char:
+                table[code] = lower
+    for char, replacement in HOMOGLYPHS.items():
+        table[ord(char)] = replacement
+    for char in SEPARATORS:
+        table[ord(char)] = None
+    return table
+
+TABLE = _build_table()
+LEET_TABLE = str.maketrans(LEET)
+
+_LEET_CLASS = '[' + re.escape(''.join(LEET)) + ']'
+# A single character followed by a space and another single character: "k u r v a"
+_SPACED_LETTERS = re.compile(rf'(?<!\S)(\w|{_LEET_CLASS}) (?=(?:\w|{_LEET_CLASS})(?!\S))')
+_LEET_CHAR = re.compile(_LEET_CLASS)
+# A whitespace-delimited token with at least one letter
+_WORD_TOKEN = re.compile(r'(?<!\S)(?=\S*[^\W\d_])\S+')
+_RUNS = re.compile(r'(.)\1+', re.DOTALL)
+
+def _leet_token(match):
+    return match.group().translate(LEET_TABLE)
+
+def _map_leet(text):
+    """Leet mapped in tokens that have letters; same length as text"""
+    # search() is cheaper than a sub() that finds nothing
+    if _LEET_CHAR.search(text):
+        text = _WORD_TOKEN.sub(_leet_token, text)
+    return text
+
+def fold(text):
+    """Canonical form of text: folded, leet mapped, separators and letter spacing removed"""
+    text = text.translate(TABLE)
+    if _SPACED_LETTERS.search(text):
+        text = _SPACED_LETTERS.sub(r'\1', text)
+    return _map_leet(text)
+
+def collapse(text):
+    """Collapse runs of one character ("kuuurva" -> "kurva"); apply to fold() output"""
+    return _RUNS.sub(r'\1', text)
+
+def _sub_keeping_offsets(regex, text, offsets):
+    # Every substitution used here keeps group 1 and drops the rest of the match
+    out, out_offsets, last = [], [], 0
+    for match in regex.finditer(text):
+        start, end = match.span(1)
+        out.append(text[last:match.start()])
+        out_offsets.extend(offsets[last:match.start()])
+        out.append(text[start:end])
+        out_offsets.extend(offsets[start:end])
+        last = match.end()
+    out.append(text[last:])
+    out_offsets.extend(offsets[last:])
+    return ''.join(out), out_offsets
+
+def normalize_with_offsets(text, collapse_runs=False):
+    """Return (normalized, offsets): offsets[i] is the index in text of normalized[i].
+
+    normalized equals fold(text), or collapse(fold(text)) with collapse_runs.
+    """
+    out, offsets = [], []
+    get = TABLE.get
+    for index, char in enumerate(text):
+        replacement = get(ord(char), char)
+        if replacement:
+            out.append(replacement)
+            offsets.extend([index] * len(replacement))
+    normalized, offsets = _sub_keeping_offsets(_SPACED_LETTERS, ''.join(out), offsets)
+    # Leet maps one character to one, so offsets stay valid
+    normalized = _map_leet(normalized)
+    if collapse_runs:
+        normalized, offsets = _sub_keeping_offsets(_RUNS, normalized, offsets)
+    return normalized, offsets
+
+def original_span(text, start, end, collapse_runs=False):
+    """Map a [start, end) span of the normalized text back to a span of text"""
+    _, offsets = normalize_with_offsets(text, collapse_runs)
+    if collapse_runs:
+        # The last kept character of a collapsed run stands for the whole run
+        original_end = offsets[end - 1] + 1
+        while original_end < len(text) and text[original_end].lower() == text[offsets[end - 1]].lower():
+            original_end += 1
+        return offsets[start], original_end
+    return offsets[start], offsets[end - 1] + 1
@@ -257,10 +257,5 @@ def set_guild_language(guild_id, lang):
     if lang not in TRANSLATIONS:
         return False
     
-    cfg = config.load_config()
-    if 'guild_languages' not in cfg:
-        cfg['guild_languages'] = {}
-    
-    cfg['guild_languages'][str(guild_id)] = lang
-    config.save_config(cfg)
+    config.update_path(('guild_languages', guild_id), lang)
     return True
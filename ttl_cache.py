@@ -0,0 +1,32 @@
+"""
+Small LRU cache whose entries also expire after a fixed time
+Used for results of slow external calls (AI verdicts, AI chat answers).
+"""
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """LRU of at most size entries; an entry older than ttl seconds counts as missing"""
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
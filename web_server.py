@@ -2,6 +2,7 @@ from flask import Flask, render_template, jsonify, redirect, request, session
 from flask_cors import CORS
 from datetime import datetime, timezone
 import json
+import math
 import os
 import requests
 import secrets
@@ -196,19 +197,12 @@ def api_update_settings(guild_id):
         data = request.get_json()
         update_guild_settings(guild_id, data)
         
-        # Also update bot_config.json to keep settings in sync with bot runtime
-        import config
-        bot_config = config.load_config()
-        
-        # Merge new settings into bot config
+        # Also update the bot config store to keep settings in sync with bot runtime.
+        # Only this guild's row is written, with compare-and-swap, so a concurrent
+        # change from the bot is never overwritten; the bot reloads just this row.
         if 'moderation' in data:
-            if 'moderation_settings' not in bot_config:
-                bot_config['moderation_settings'] = {}
-            bot_config['moderation_settings'][guild_id] = data['moderation']
-        
-        # Save updated config back to file
-        with open('bot_config.json', 'w') as f:
-            json.dump(bot_config, f, indent=2)
+            import config
+            config.transact('moderation_settings', guild_id, lambda _: data['moderation'])
         
         print(f"✅ Settings synced to bot config for guild {guild_id}", flush=True)
         return jsonify({'success': True, 'message': 'Settings updated and synced'})
@@ -216,6 +210,34 @@ def api_update_settings(guild_id):
         print(f"❌ Error updating settings: {e}", flush=True)
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/activity/<guild_id>')
+@login_required
+def api_activity(guild_id):
+    """Message counts over time, e.g. ?resolution=hour&days=7&by=channel"""
+    user_id = session.get('user_id')
+    if not guild_exists_in_cache(user_id, guild_id): return jsonify({'error': 'Unauthorized'}), 403
+    import activity_metrics
+    resolution = request.args.get('resolution', 'hour')
+    dimension = request.args.get('by', 'guild')
+    if resolution not in activity_metrics.RESOLUTIONS or resolution not in activity_metrics.DIMENSIONS.get(dimension, ()):
+        return jsonify({'error': 'Unsupported resolution/by combination'}), 400
+    try:
+        days = float(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'error': 'days must be a number'}), 400
+    if not math.isfinite(days) or days <= 0:
+        return jsonify({'error': 'days must be a positive number'}), 400
+    # Nothing older than the resolution's retention is kept anyway
+    days = min(days, activity_metrics.RESOLUTIONS[resolution][2] / 86400)
+    since = datetime.now(timezone.utc).timestamp() - days * 86400
+    series = activity_metrics.query(guild_id, dimension, resolution, since=since, entity_id=request.args.get('id'),
+                                    store=True)
+    return jsonify({
+        'resolution': resolution,
+        'by': dimension,
+        'series': {entity_id: [[bucket, count] for bucket, count in points] for entity_id, points in series.items()}
+    })
+
 @app.route('/api/servers')
 @login_required
 def api_servers():
@@ -273,6 +295,13 @@ def api_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/commands')
+@login_required
+def api_command_latency():
+    """Slash command latency (ack/total/config/database/http... p50/p95/p99), refreshed every heartbeat"""
+    stats = get_bot_stats()
+    return jsonify(stats.get('command_latency', {'commands': 0, 'by_command': {}}))
+
 # --- WEB SERVER ONLY ---
 # Note: Discord bot is now run as a separate process (python run_bot.py)
 # This ensures better stability and proper error handling
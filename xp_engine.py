@@ -0,0 +1,418 @@
+"""
+In-memory XP engine for the leveling system
+Each guild's XP lives in three parallel arrays indexed through a user id ->
+slot dict, so awarding XP is a handful of O(1) array updates instead of a
+config read and write per message. Changed users are marked dirty and
+written to config (user_xp) in batches every flush_interval seconds, one
+update_path() per user so concurrent edits from other processes merge per
+user. Message cooldowns live in a bounded structure that drops expired
+entries as it goes. A guild's ranking by total XP (leaderboard_index) is
+built on the first rank or leaderboard query and kept current from then on.
+
+Bulk operations (import, reset, scale, recompute levels after a change of
+the level curve) rebuild a guild's arrays in one pass, deriving level and
+in-level XP from total XP with the closed-form inverse of the curve, and
+persist the guild with a single write. run_bulk() does the rebuild in a
+worker thread so commands stay responsive on large guilds.
+"""
+import asyncio
+import math
+import time
+from array import array
+from collections import OrderedDict
+
+import config
+import leaderboard_index
+
+FLUSH_INTERVAL = 10
+COOLDOWN_CAPACITY = 200_000
+
+class LevelCurve:
+    """Levelling up from level - 1 to level takes a * level² + b * level + c XP (a > 0)"""
+    __slots__ = ('a', 'b', 'c', '_shift', '_p', '_q0', '_q1')
+
+    def __init__(self, a, b, c):
+        self.a, self.b, self.c = a, b, c
+        # 6 * total_for_level(L) = 2a L³ + 3(a + b) L² + (a + 3b + 6c) L; solving
+        # it for L = t - shift gives the depressed cubic t³ + p t + q = 0 with
+        # q = q0 - 6 * total / (2a)
+        ca, cb, cc = 2 * a, 3 * (a + b), a + 3 * b + 6 * c
+        self._shift = cb / (3 * ca)
+        self._p = (3 * ca * cc - cb * cb) / (3 * ca * ca)
+        self._q0 = (2 * cb ** 3 - 9 * ca * cb * cc) / (27 * ca ** 3)
+        self._q1 = 6 / ca
+
+    def xp_for_level(self, level):
+        """XP needed to go from level - 1 to level"""
+        return self.a * level * level + self.b * level + self.c
+
+    def total_for_level(self, level):
+        """Total XP needed to reach level from level 0"""
+        return (self.a * level * (level + 1) * (2 * level + 1) // 6
+                + self.b * level * (level + 1) // 2 + self.c * level)
+
+    def level_for_total(self, total):
+        """Highest level whose total_for_level() is at most total"""
+        if total <= 0:
+            return 0
+        p, q = self._p, self._q0 - self._q1 * total
+        d = q * q / 4 + p * p * p / 27
+        if d >= 0:
+            root = math.sqrt(d)
+            t = math.cbrt(-q / 2 + root) + math.cbrt(-q / 2 - root)
+        else:
+            # Three real roots: take the largest
+            t = 2 * math.sqrt(-p / 3) * math.cos(math.acos(3 * q / (2 * p) * math.sqrt(-3 / p)) / 3)
+        level = max(int(t - self._shift), 0)
+        # Floating point can be off by one near a level boundary
+        while self.total_for_level(level + 1) <= total:
+            level += 1
+        while level and self.total_for_level(level) > total:
+            level -= 1
+        return level
+
+    def levels_for_totals(self, totals):
+        """level_for_total() of every total, in one pass"""
+        if not totals:
+            return array('l')
+        # One spare threshold: the float estimate can overshoot by a level
+        thresholds = [self.total_for_level(level) for level in range(self.level_for_total(max(totals)) + 3)]
+        cbrt, sqrt = math.cbrt, math.sqrt
+        shift, q0, q1, p3 = self._shift, self._q0 / 2, self._q1 / 2, self._p ** 3 / 27
+        levels = array('l', [
+            int(cbrt(h + sqrt(h * h + p3)) + cbrt(h - sqrt(h * h + p3)) - shift)
+            if total > 0 and (h := q1 * total - q0) * h + p3 >= 0 else 0
+            for total in totals
+        ])
+        off = [i for i, (total, level) in enumerate(zip(totals, levels))
+               if total > 0 and not thresholds[level] <= total < thresholds[level + 1]]
+        for i in off:
+            levels[i] = self.level_for_total(totals[i])
+        return levels
+
+CURVE = LevelCurve(5, 50, 100)
+
+def xp_for_level(level):
+    """XP needed to go from level - 1 to level"""
+    return CURVE.xp_for_level(level)
+
+class GuildXP:
+    """XP of one guild: user id -> slot in the xp / level / total arrays"""
+    __slots__ = ('slots', 'user_ids', 'xp', 'level', 'total', 'dirty', 'ranking')
+
+    def __init__(self, stored=None):
+        self.slots = {}
+        self.user_ids = array('q')
+        self.xp = array('q')
+        self.level = array('l')
+        self.total = array('q')
+        self.dirty = set()
+        self.ranking = None
+        for user_id, data in (stored or {}).items():
+            if isinstance(data, dict):
+                self.set(int(user_id), data.get('xp', 0), data.get('level', 0), data.get('total_xp', 0))
+        self.dirty.clear()
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def slot(self, user_id):
+        slot = self.slots.get(user_id)
+        if slot is None:
+            slot = self.slots[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.xp.append(0)
+            self.level.append(0)
+            self.total.append(0)
+        return slot
+
+    def set(self, user_id, xp, level, total_xp):
+        slot = self.slot(user_id)
+        self.xp[slot] = xp
+        self.level[slot] = level
+        self.total[slot] = total_xp
+        self.dirty.add(slot)
+        if self.ranking is not None:
+            self.ranking.update(user_id, total_xp)
+        return slot
+
+    def leaderboard(self):
+        if self.ranking is None:
+            self.ranking = leaderboard_index.Leaderboard(zip(self.user_ids, self.total))
+        return self.ranking
+
+    def entry(self, slot):
+        return {'xp': self.xp[slot], 'level': self.level[slot], 'total_xp': self.total[slot]}
+
+class Cooldowns:
+    """Last reward time per (guild, user), oldest first; entries past the
+    longest cooldown in use are dropped, and at most capacity are kept"""
+    def __init__(self, capacity=COOLDOWN_CAPACITY):
+        self.capacity = capacity
+        self.longest = 0
+        self._last = OrderedDict()
+
+    def __len__(self):
+        return len(self._last)
+
+    def hit(self, key, cooldown, now):
+        """True if key is still cooling down; otherwise start a new cooldown and return False"""
+        last = self._last.get(key)
+        if last is not None and now - last < cooldown:
+            return True
+        self._last[key] = now
+        self._last.move_to_end(key)
+        if cooldown > self.longest:
+            self.longest = cooldown
+        last_map = self._last
+        cutoff = now - self.longest
+        while last_map:
+            oldest_key = next(iter(last_map))
+            if last_map[oldest_key] >= cutoff and len(last_map) <= self.capacity:
+                break
+            del last_map[oldest_key]
+        return False
+
+# Bulk operations: (user_ids, totals, *args) -> new (user_ids, totals). They
+# only read their arguments, so run_bulk() can run them off the event loop
+
+def plan_import(user_ids, totals, imported, replace=False):
+    merged = {} if replace else dict(zip(user_ids, totals))
+    for user_id, total in imported.items():
+        user_id = int(user_id)
+        merged[user_id] = max(merged.get(user_id, 0) + int(total), 0)
+    return merged.keys(), list(merged.values())
+
+def plan_reset(user_ids, totals, reset_ids=None):
+    if reset_ids is None:
+        return (), []
+    drop = set(reset_ids)
+    keep = [slot for slot, user_id in enumerate(user_ids) if user_id not in drop]
+    return [user_ids[slot] for slot in keep], [totals[slot] for slot in keep]
+
+def plan_scale(user_ids, totals, factor):
+    return user_ids, [max(int(total * factor), 0) for total in totals]
+
+def plan_recompute(user_ids, totals):
+    return user_ids, list(totals)
+
+class XPEngine:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, curve=CURVE):
+        self.flush_interval = flush_interval
+        self.curve = curve
+        self.cooldowns = Cooldowns()
+        self._guilds = {}
+        # Guilds changed in config by someone else (dashboard, other process)
+        self._stale = set()
+        self._persisting = False
+        # guild id -> {user id: XP awarded} while a run_bulk() of the guild is in flight
+        self._bulk_gains = {}
+        self._task = None
+        self._stats = {'awards': 0, 'level_ups': 0, 'cooldown_skips': 0, 'persisted_users': 0,
+                       'persist_batches': 0, 'persist_seconds': 0.0, 'reloads': 0,
+                       'bulk_operations': 0}
+        config.add_change_listener(self._on_config_change)
+
+    def _on_config_change(self, namespace, key):
+        # Our own writes come back through here too; may run on the config thread
+        if self._persisting or (namespace is None and key == config.SAVED):
+            # A whole-document save: the flush reports the user_xp shards it changed
+            return
+        if namespace is None:
+            self._stale.update(self._guilds)
+        elif namespace == 'user_xp':
+            if key is None:
+                self._stale.update(self._guilds)
+            elif str(key).isdigit():
+                self._stale.add(int(key))
+
+    def guild(self, guild_id):
+        """GuildXP of a guild, loaded from config on first use"""
+        guild = self._guilds.get(guild_id)
+        if guild is None or guild_id in self._stale:
+            guild = self._load(guild_id, guild)
+        return guild
+
+    def _load(self, guild_id, previous):
+        self._stale.discard(guild_id)
+        guild = GuildXP(config.get_path(('user_xp', guild_id)))
+        if previous is not None:
+            # Gains not persisted yet win over the reloaded values
+            for slot in previous.dirty:
+                guild.set(previous.user_ids[slot], previous.xp[slot], previous.level[slot], previous.total[slot])
+            self._stats['reloads'] += 1
+        self._guilds[guild_id] = guild
+        return guild
+
+    def get(self, guild_id, user_id):
+        """{'xp', 'level', 'total_xp'} of a user (zeros if unknown)"""
+        guild = self.guild(guild_id)
+        slot = guild.slots.get(user_id)
+        if slot is None:
+            return {'xp': 0, 'level': 0, 'total_xp': 0}
+        return guild.entry(slot)
+
+    def set(self, guild_id, user_id, xp, level, total_xp):
+        self.guild(guild_id).set(user_id, xp, level, total_xp)
+
+    def top(self, guild_id, count, start=0):
+        """[(user_id, entry)] ranked start + 1 to start + count by total XP"""
+        guild = self.guild(guild_id)
+        return [(user_id, guild.entry(guild.slots[user_id]))
+                for user_id, _ in guild.leaderboard().page(start, count)]
+
+    def rank(self, guild_id, user_id):
+        """(rank, ranked users) of a user by total XP; rank is None if they have no XP yet"""
+        ranking = self.guild(guild_id).leaderboard()
+        return ranking.rank(user_id), len(ranking)
+
+    def _rebuild(self, user_ids, totals):
+        """GuildXP holding these users and totals, levels derived in one pass, and its config entry.
+
+        Reads nothing but the curve, so it can run in a worker thread.
+        """
+        guild = GuildXP()
+        levels = self.curve.levels_for_totals(totals)
+        bases = {level: self.curve.total_for_level(level) for level in set(levels)}
+        guild.user_ids = array('q', user_ids)
+        guild.total = array('q', totals)
+        guild.level = levels
+        guild.xp = array('q', [total - bases[level] for total, level in zip(totals, levels)])
+        guild.slots = {user_id: slot for slot, user_id in enumerate(guild.user_ids)}
+        stored = {str(user_id): {'xp': xp, 'level': level, 'total_xp': total}
+                  for user_id, xp, level, total in zip(guild.user_ids, guild.xp, guild.level, guild.total)}
+        return guild, stored
+
+    def _install(self, guild_id, guild, stored, start):
+        """Swap in a rebuilt guild and persist it with a single write"""
+        self._guilds[guild_id] = guild
+        self._stale.discard(guild_id)
+        self._persisting = True
+        try:
+            config.update_path(('user_xp', guild_id), stored)
+        finally:
+            self._persisting = False
+        self._stats['bulk_operations'] += 1
+        return {'users': len(guild), 'seconds': time.perf_counter() - start}
+
+    def _bulk(self, guild_id, plan, *args):
+        start = time.perf_counter()
+        guild = self.guild(guild_id)
+        return self._install(guild_id, *self._rebuild(*plan(guild.user_ids, guild.total, *args)), start)
+
+    def bulk_import(self, guild_id, totals, replace=False):
+        """Add to the total XP of many users ({user_id: total_xp}); replace=True drops everyone else's XP first"""
+        return self._bulk(guild_id, plan_import, totals, replace)
+
+    def bulk_reset(self, guild_id, user_ids=None):
+        """Forget the XP of the given users, or of everyone in the guild"""
+        return self._bulk(guild_id, plan_reset, user_ids)
+
+    def bulk_scale(self, guild_id, factor):
+        """Multiply everyone's total XP by factor (rounded down)"""
+        return self._bulk(guild_id, plan_scale, factor)
+
+    def recompute_levels(self, guild_id):
+        """Re-derive levels from total XP, e.g. after the level curve changed"""
+        return self._bulk(guild_id, plan_recompute)
+
+    async def run_bulk(self, guild_id, plan, *args):
+        """Run a bulk operation (plan_import, plan_reset, ...) in a worker thread.
+
+        Only the snapshot of the guild and the final swap run on the event
+        loop. XP awarded in the guild meanwhile is added on top of the
+        result. Returns None if a bulk operation of the guild is running.
+        """
+        if guild_id in self._bulk_gains:
+            return None
+        start = time.perf_counter()
+        guild = self.guild(guild_id)
+        user_ids, totals = array('q', guild.user_ids), array('q', guild.total)
+        gains = self._bulk_gains[guild_id] = {}
+        try:
+            rebuilt, stored = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self._rebuild(*plan(user_ids, totals, *args)))
+        finally:
+            del self._bulk_gains[guild_id]
+        result = self._install(guild_id, rebuilt, stored, start)
+        for user_id, amount in gains.items():
+            self.award(guild_id, user_id, amount)
+        return result
+
+    def on_cooldown(self, guild_id, user_id, cooldown, now=None):
+        if self.cooldowns.hit((guild_id, user_id), cooldown, time.monotonic() if now is None else now):
+            self._stats['cooldown_skips'] += 1
+            return True
+        return False
+
+    def award(self, guild_id, user_id, amount):
+        """Add XP; returns the new level if the user levelled up, else None"""
+        if self._bulk_gains:
+            gains = self._bulk_gains.get(guild_id)
+            if gains is not None:
+                gains[user_id] = gains.get(user_id, 0) + amount
+        guild = self.guild(guild_id)
+        slot = guild.slot(user_id)
+        xp = guild.xp[slot] + amount
+        guild.total[slot] += amount
+        if guild.ranking is not None:
+            guild.ranking.update(user_id, guild.total[slot])
+        level = guild.level[slot]
+        needed = self.curve.xp_for_level(level + 1)
+        new_level = None
+        if xp >= needed:
+            xp -= needed
+            new_level = guild.level[slot] = level + 1
+            self._stats['level_ups'] += 1
+        guild.xp[slot] = xp
+        guild.dirty.add(slot)
+        self._stats['awards'] += 1
+        return new_level
+
+    def persist(self):
+        """Write every dirty user to config; returns the number written"""
+        start = time.perf_counter()
+        written = 0
+        self._persisting = True
+        try:
+            for guild_id, guild in self._guilds.items():
+                if not guild.dirty:
+                    continue
+                dirty, guild.dirty = guild.dirty, set()
+                for slot in dirty:
+                    config.update_path(('user_xp', guild_id, guild.user_ids[slot]), guild.entry(slot))
+                written += len(dirty)
+        finally:
+            self._persisting = False
+        if written:
+            self._stats['persisted_users'] += written
+            self._stats['persist_batches'] += 1
+            self._stats['persist_seconds'] += time.perf_counter() - start
+        return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.persist()
+            except Exception as e:
+                print(f"❌ Error persisting XP: {type(e).__name__}: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background writer and persist what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.persist()
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['guilds'] = len(self._guilds)
+        stats['users'] = sum(len(guild) for guild in self._guilds.values())
+        stats['dirty'] = sum(len(guild.dirty) for guild in self._guilds.values())
+        stats['cooldowns'] = len(self.cooldowns)
+        return stats